@@ -0,0 +1,201 @@
+"""消息分类微基准：MsgItemShape + MessageClassifier 对比旧版 _split 中逐项的控件查找
+
+用模拟控件代替微信界面：每次跨进程调用（属性读取、树导航、快照）计数一次并等待 LATENCY 秒，
+旧版的 Exists(0.1) 未找到时与uiautomation一样等待超时后再查找一次。
+消息取自手工编写的语料 fixtures/msgitem_shapes.json（见 test_classifier.py），两种方式的分类结果必须一致。
+输出每种方式的总耗时、每秒处理的消息数和每条消息的跨进程调用次数
+
+    python tests/bench_classifier.py [消息数，默认1000] [每次调用延迟毫秒，默认0.05]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wxauto import uiautomation as uia
+from wxauto.elements import MsgItemShape, MessageClassifier, WxParam
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'msgitem_shapes.json')
+LATENCY = 0.00005
+CALLS = [0]
+
+
+def _call():
+    CALLS[0] += 1
+    if LATENCY:
+        time.sleep(LATENCY)
+
+
+class FakeNode:
+    """模拟的控件，属性与子节点都在内存中"""
+    def __init__(self, controltype, name, rect, children=(), runtimeid=()):
+        self.controltype = controltype
+        self.name = name
+        self.rect = tuple(rect)
+        self.children = list(children)
+        self.runtimeid = tuple(runtimeid)
+
+
+class FakeControl:
+    """旧版用到的Control接口，每次属性读取计为一次跨进程调用"""
+    def __init__(self, node):
+        self.node = node
+
+    @property
+    def Name(self):
+        _call()
+        return self.node.name
+
+    @property
+    def BoundingRectangle(self):
+        _call()
+        return uia.Rect(*self.node.rect)
+
+    def GetRuntimeId(self):
+        _call()
+        return list(self.node.runtimeid)
+
+    def ButtonControl(self, foundIndex=1):
+        return FakeLocator(self.node, uia.ControlType.ButtonControl, foundIndex)
+
+    def TextControl(self, foundIndex=1):
+        return FakeLocator(self.node, uia.ControlType.TextControl, foundIndex)
+
+    def Snapshot(self):
+        """一次BuildUpdatedCache取回整个子树"""
+        _call()
+        nodes = []
+        stack = [(self.node, 0, -1)]
+        while stack:
+            node, depth, parent = stack.pop()
+            snapnode = uia.SnapshotNode(node.controltype, '', node.name, node.rect, node.runtimeid, depth, parent)
+            if parent >= 0:
+                nodes[parent].children.append(len(nodes))
+            nodes.append(snapnode)
+            index = len(nodes) - 1
+            for child in reversed(node.children):
+                stack.append((child, depth + 1, index))
+        return uia.ControlSnapshot(nodes)
+
+
+class FakeLocator(FakeControl):
+    """与uiautomation一样在第一次访问时深度优先查找，每访问一个控件读取一次导航和一次ControlType"""
+    def __init__(self, root, controltype, foundIndex):
+        self.root = root
+        self.controltype = controltype
+        self.foundIndex = foundIndex
+        self._node = None
+
+    def _find(self):
+        count = 0
+        stack = list(reversed(self.root.children))
+        while stack:
+            node = stack.pop()
+            _call()
+            _call()
+            if node.controltype == self.controltype:
+                count += 1
+                if count == self.foundIndex:
+                    return node
+            stack.extend(reversed(node.children))
+
+    @property
+    def node(self):
+        if self._node is None:
+            self._node = self._find()
+            if self._node is None:
+                raise LookupError('Find Control Timeout')
+        return self._node
+
+    def Exists(self, maxSearchSeconds=5):
+        self._node = self._find()
+        if self._node is None and maxSearchSeconds:
+            time.sleep(maxSearchSeconds)
+            self._node = self._find()
+        return self._node is not None
+
+
+def build_item(record):
+    """按记录构造一个消息控件子树，结构与微信3.9的消息列表项一致"""
+    left, top, right, bottom = record['rect']
+    content = FakeNode(uia.ControlType.TextControl, record['name'], (left + 60, top + 8, right - 60, bottom - 8))
+    children = []
+    if record['user']:
+        name, rect = record['user']
+        children.append(FakeNode(uia.ControlType.ButtonControl, '', rect))
+        bubble = [content]
+        if record['text']:
+            bubble.insert(0, FakeNode(uia.ControlType.TextControl, record['text'][0], record['text'][1]))
+        children.append(FakeNode(uia.ControlType.PaneControl, '', (left + 60, top, right - 60, bottom), bubble))
+        children.append(FakeNode(uia.ControlType.ButtonControl, name, rect))
+    else:
+        children.append(content)
+    pane = FakeNode(uia.ControlType.PaneControl, '', record['rect'], children)
+    runtimeid = [int(i) for i in record['msgid'].split('.')]
+    return FakeControl(FakeNode(uia.ControlType.ListItemControl, record['name'], record['rect'], [pane], runtimeid))
+
+
+def old_sender(MsgItem):
+    """旧版 WeChatBase._split 中确定发送方的部分"""
+    MsgItemName = MsgItem.Name
+    if MsgItem.BoundingRectangle.height() == WxParam.SYS_TEXT_HEIGHT:
+        sender = 'SYS'
+    elif MsgItem.BoundingRectangle.height() == WxParam.TIME_TEXT_HEIGHT:
+        sender = 'Time'
+    elif MsgItem.BoundingRectangle.height() == WxParam.RECALL_TEXT_HEIGHT:
+        sender = 'Recall' if '撤回' in MsgItemName else 'SYS'
+    else:
+        Index = 1
+        User = MsgItem.ButtonControl(foundIndex=Index)
+        try:
+            while True:
+                if User.Name == '':
+                    Index += 1
+                    User = MsgItem.ButtonControl(foundIndex=Index)
+                else:
+                    break
+            winrect = MsgItem.BoundingRectangle
+            mid = (winrect.left + winrect.right)/2
+            if User.BoundingRectangle.left < mid:
+                if MsgItem.TextControl().Exists(0.1) and MsgItem.TextControl().BoundingRectangle.top < User.BoundingRectangle.top:
+                    sender = (User.Name, MsgItem.TextControl().Name)
+                else:
+                    sender = (User.Name, User.Name)
+            else:
+                sender = 'Self'
+        except LookupError:
+            sender = 'SYS'
+    MsgItem.GetRuntimeId()
+    return sender
+
+
+def new_sender(classifier, MsgItem):
+    return classifier.Classify(MsgItemShape.FromControl(MsgItem))
+
+
+def run(name, func, items):
+    CALLS[0] = 0
+    t0 = time.perf_counter()
+    senders = [func(item) for item in items]
+    seconds = time.perf_counter() - t0
+    print(f'{name:<24}{seconds:>10.3f}s{len(items) / seconds:>12.0f}条/秒{CALLS[0]:>12}次调用{CALLS[0] / len(items):>10.1f}次/条')
+    return senders
+
+
+def main(count=1000, latency=0.05):
+    global LATENCY
+    LATENCY = latency / 1000
+    with open(FIXTURE, encoding='utf-8') as f:
+        corpus = json.load(f)
+    records = [corpus[i % len(corpus)] for i in range(count)]
+    print(f'{count}条消息，每次跨进程调用延迟{latency}ms')
+    old = run('旧版逐项控件查找', old_sender, [build_item(i) for i in records])
+    classifier = MessageClassifier()
+    new = run('MessageClassifier', lambda item: new_sender(classifier, item), [build_item(i) for i in records])
+    assert old == new, '两种方式的分类结果不一致'
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000, float(sys.argv[2]) if len(sys.argv) > 2 else 0.05)
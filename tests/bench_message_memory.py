@@ -0,0 +1,95 @@
+"""消息对象内存对比：__slots__消息类与旧版使用__dict__的消息类
+
+用tracemalloc统计创建N条消息对象新分配的内存，info列表在统计前创建，只计算消息对象本身（包括创建列表本身的开销，两者相同）
+
+    python tests/bench_message_memory.py [消息数，默认100000]
+"""
+import logging
+import os
+import sys
+import tracemalloc
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wxauto.elements import FriendMessage, SysMessage
+from wxauto.utils import MessageId
+
+
+class UnslottedMessage:
+    """旧版消息基类"""
+    type = 'message'
+
+    def __getitem__(self, index):
+        return self.info[index]
+
+
+class UnslottedSysMessage(UnslottedMessage):
+    """旧版SysMessage，去掉日志"""
+    type = 'sys'
+
+    def __init__(self, info, control, wx):
+        self.info = info
+        self.control = control
+        self.wx = wx
+        self.sender = info[0]
+        self.content = info[1]
+        self.id = info[-1]
+
+
+class UnslottedFriendMessage(UnslottedMessage):
+    """旧版FriendMessage，去掉日志"""
+    type = 'friend'
+
+    def __init__(self, info, control, obj):
+        self.info = info
+        self.control = control
+        self._winobj = obj
+        self.sender = info[0][0]
+        self.sender_remark = info[0][1]
+        self.content = info[1]
+        self.id = info[-1]
+        self.info[0] = info[0][0]
+        self.chatbox = obj.ChatBox if hasattr(obj, 'ChatBox') else obj.UiaAPI
+
+
+def make_infos(count):
+    """每10条中1条系统消息、9条好友消息，其中一半带群昵称"""
+    infos = []
+    for i in range(count):
+        msgid = MessageId((42, 1180466, 4, i))
+        if i % 10 == 0:
+            infos.append(['SYS', '以下为新消息', msgid])
+        else:
+            sender = f'好友{i % 50}'
+            infos.append([(sender, sender if i % 2 else f'群昵称{i % 50}'), f'第{i}条消息', msgid])
+    return infos
+
+
+def measure(sysclass, friendclass, count):
+    """返回 (消息对象列表, 新分配的字节数)，统计期间关闭日志"""
+    wx = types.SimpleNamespace(ChatBox=None)
+    infos = make_infos(count)
+    logging.disable(logging.CRITICAL)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        msgs = [(sysclass if info[0] == 'SYS' else friendclass)(info, None, wx) for info in infos]
+        size = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+        logging.disable(logging.NOTSET)
+    return msgs, size
+
+
+def main(count=100000):
+    _, unslotted = measure(UnslottedSysMessage, UnslottedFriendMessage, count)
+    _, slotted = measure(SysMessage, FriendMessage, count)
+    print(f'{count}条消息')
+    print(f'{"__dict__（旧版）":<16}{unslotted / 1024 / 1024:>10.2f}MB{unslotted / count:>10.1f}字节/条')
+    print(f'{"__slots__":<16}{slotted / 1024 / 1024:>10.2f}MB{slotted / count:>10.1f}字节/条')
+    print(f'节省{1 - slotted / unslotted:.0%}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
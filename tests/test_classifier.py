@@ -0,0 +1,52 @@
+"""消息分类规则的回放测试
+
+fixtures/msgitem_shapes.json 是手工编写的语料，不是从真实微信界面录制的：按微信3.9消息列表项的布局
+（系统消息、时间、撤回的高度，头像与群昵称的位置）为每类消息构造一条，格式与 MsgItemShape.ToDict() 相同，
+另加 case（说明）与 expected（期望的发送方）两个字段。可用 MsgItemShape.FromControl(item).ToDict() 录制真实消息补充
+"""
+import json
+import os
+
+import pytest
+
+elements = pytest.importorskip('wxauto.elements')
+MsgItemShape = elements.MsgItemShape
+MessageClassifier = elements.MessageClassifier
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'msgitem_shapes.json')
+
+with open(FIXTURE, encoding='utf-8') as f:
+    CORPUS = json.load(f)
+
+
+def _expected(record):
+    expected = record['expected']
+    return tuple(expected) if isinstance(expected, list) else expected
+
+
+@pytest.mark.parametrize('record', CORPUS, ids=[i['case'] for i in CORPUS])
+def test_classify_corpus(record):
+    shape = MsgItemShape.FromDict(record)
+    assert MessageClassifier().Classify(shape) == _expected(record)
+
+
+@pytest.mark.parametrize('record', CORPUS, ids=[i['case'] for i in CORPUS])
+def test_dict_roundtrip(record):
+    shape = MsgItemShape.FromDict(record)
+    data = shape.ToDict()
+    assert MsgItemShape.FromDict(data).ToDict() == data
+    assert data['msgid'] == record['msgid']
+
+
+def test_rule_error_is_sys():
+    shape = MsgItemShape('消息', (310, 0, 1000, 52), user=('张三', ()))
+    assert MessageClassifier().Classify(shape) == 'SYS'
+
+
+def test_add_and_remove_rule():
+    classifier = MessageClassifier()
+    classifier.AddRule('pat', lambda shape: 'SYS' if '拍了拍' in shape.name else None, before='self')
+    shape = MsgItemShape('"张三" 拍了拍我', (310, 0, 1000, 52), user=('张三', (324, 8, 360, 44)))
+    assert classifier.Classify(shape) == 'SYS'
+    classifier.RemoveRule('pat')
+    assert classifier.Classify(shape) == ('张三', '张三')
@@ -0,0 +1,135 @@
+import pytest
+
+from wxauto.clipboard import (
+    CF_HDROP, CF_UNICODETEXT, Clipboard, EncodeFiles, IsByValueFormat, MemoryClipboardBackend,
+)
+
+CF_BITMAP = 2
+CF_ENHMETAFILE = 14
+CF_HTML = 0xC0F1  # 注册的格式，编号因系统而异
+
+
+def _clipboard(busy=0, **kwargs):
+    kwargs.setdefault('backoff', 0.001)
+    kwargs.setdefault('maxbackoff', 0.004)
+    return Clipboard(MemoryClipboardBackend(busy=busy), **kwargs)
+
+
+def test_settext_gettext():
+    cb = _clipboard()
+    cb.settext('hello')
+    assert cb.gettext() == 'hello'
+    assert cb.getfiles() is None
+    with pytest.raises(TypeError):
+        cb.settext(1)
+
+
+def test_setfiles_getfiles():
+    cb = _clipboard()
+    cb.setfiles(['C:/a.txt', 'D:\\文件\\b.png'])
+    assert cb.getfiles() == ('C:\\a.txt', 'D:\\文件\\b.png')
+    assert cb.gettext() is None
+
+
+def test_backoff_retries_until_open():
+    cb = _clipboard(busy=3)
+    cb.settext('hello')
+    stats = cb.stats()
+    assert stats['transactions'] == 1
+    assert stats['contended'] == 1
+    assert stats['retries'] == 3
+    assert stats['timeouts'] == 0
+    assert stats['wait'] > 0 and stats['max_wait'] == stats['wait']
+    assert cb.backend.opens == 1
+
+
+def test_uncontended_has_no_retries():
+    cb = _clipboard()
+    cb.settext('a')
+    cb.gettext()
+    stats = cb.stats()
+    assert (stats['transactions'], stats['contended'], stats['retries'], stats['wait']) == (2, 0, 0, 0)
+
+
+def test_timeout():
+    cb = _clipboard(busy=10 ** 6, timeout=0.02)
+    with pytest.raises(TimeoutError):
+        cb.settext('hello')
+    assert cb.stats()['timeouts'] == 1
+    assert cb.stats()['transactions'] == 0
+
+
+def test_nested_transactions_open_once():
+    cb = _clipboard()
+    with cb.transaction() as outer:
+        cb.settext('hello')
+        assert cb.gettext() == 'hello'
+        with cb.transaction() as inner:
+            assert inner is outer
+            inner.set(CF_HDROP, EncodeFiles(['C:/a.txt']))
+    assert cb.backend.opens == 1
+    assert cb.stats()['transactions'] == 1
+    assert not cb.backend._opened
+
+
+def test_transaction_closes_on_error():
+    cb = _clipboard()
+    with pytest.raises(ValueError):
+        with cb.transaction():
+            raise ValueError
+    assert not cb.backend._opened
+    cb.settext('hello')
+    assert cb.gettext() == 'hello'
+
+
+def test_preserve_restores_text_and_files():
+    cb = _clipboard()
+    with cb.transaction() as backend:
+        backend.set(CF_UNICODETEXT, '原有内容')
+        backend.set(CF_HDROP, EncodeFiles(['C:/a.txt']))
+        backend.set(CF_HTML, b'<b>html</b>')
+    with cb.preserve():
+        cb.settext('临时内容')
+        assert cb.gettext() == '临时内容'
+    assert cb.gettext() == '原有内容'
+    assert cb.getfiles() == ('C:\\a.txt',)
+    assert cb.read() == {CF_UNICODETEXT: '原有内容', CF_HDROP: ('C:\\a.txt',), CF_HTML: b'<b>html</b>'}
+
+
+def test_preserve_disabled():
+    cb = _clipboard()
+    cb.settext('原有内容')
+    with cb.preserve(enabled=False):
+        cb.settext('临时内容')
+    assert cb.gettext() == '临时内容'
+
+
+def test_preserve_restores_on_error():
+    cb = _clipboard()
+    cb.settext('原有内容')
+    with pytest.raises(ValueError):
+        with cb.preserve():
+            cb.settext('临时内容')
+            raise ValueError
+    assert cb.gettext() == '原有内容'
+
+
+def test_snapshot_skips_handle_formats():
+    cb = _clipboard()
+    with cb.transaction() as backend:
+        backend.set(CF_UNICODETEXT, 'text')
+        backend.set(CF_BITMAP, 0x1234)
+        backend.set(CF_ENHMETAFILE, 0x5678)
+    snapshot = cb.snapshot()
+    assert snapshot == {CF_UNICODETEXT: 'text'}
+    cb.restore({CF_UNICODETEXT: 'text', CF_BITMAP: 0x1234})
+    assert cb.formats() == [CF_UNICODETEXT]
+    assert set(cb.read()) == {CF_UNICODETEXT}
+
+
+def test_by_value_formats():
+    assert IsByValueFormat(CF_UNICODETEXT)
+    assert IsByValueFormat(CF_HDROP)
+    assert IsByValueFormat(CF_HTML)
+    assert not IsByValueFormat(CF_BITMAP)
+    assert not IsByValueFormat(CF_ENHMETAFILE)
@@ -0,0 +1,40 @@
+import types
+
+import pytest
+
+elements = pytest.importorskip('wxauto.elements')
+from wxauto.utils import MessageId
+
+import bench_message_memory
+
+
+def _friend(sender='张三', remark='张三'):
+    info = [(sender, remark), '明天见', MessageId((42, 1, 4, 7))]
+    return elements.FriendMessage(info, None, types.SimpleNamespace(ChatBox='chatbox'))
+
+
+def test_fields_follow_info():
+    msg = _friend()
+    assert (msg.sender, msg.content, msg.id) == (msg[0], msg[1], msg[-1])
+    msg.content = '改了'
+    assert msg[1] == '改了'
+    assert msg.chatbox == 'chatbox'
+
+
+def test_sender_remark():
+    assert _friend().sender_remark == '张三'
+    assert _friend(remark='三哥').sender_remark == '三哥'
+
+
+def test_no_arbitrary_attributes():
+    msg = _friend()
+    assert not hasattr(msg, '__dict__')
+    with pytest.raises(AttributeError):
+        msg.tag = 1
+
+
+def test_slotted_uses_less_memory():
+    _, unslotted = bench_message_memory.measure(
+        bench_message_memory.UnslottedSysMessage, bench_message_memory.UnslottedFriendMessage, 2000)
+    _, slotted = bench_message_memory.measure(elements.SysMessage, elements.FriendMessage, 2000)
+    assert slotted < unslotted
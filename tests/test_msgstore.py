@@ -0,0 +1,55 @@
+import types
+
+import pytest
+
+msgstore = pytest.importorskip('wxauto.msgstore')
+from wxauto.utils import MessageId
+
+
+def _msg(i, content=None):
+    return types.SimpleNamespace(id=MessageId((42, 1, 4, i)), type='friend', sender='张三', content=content or f'第{i}条')
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = msgstore.MessageStore(str(tmp_path / 'wxauto.db'), flushinterval=0.01)
+    yield store
+    store.close()
+
+
+def test_add_and_query(store):
+    store.add('A', [_msg(1), _msg(2)], 'p1')
+    store.flush()
+    assert [(i['chat'], i['content']) for i in store.query(chat='A')] == [('A', '第1条'), ('A', '第2条')]
+
+
+def test_msgids_filtered_by_process(store):
+    store.addids('A', [MessageId((42, 1, 4, 1))], 'p1')
+    store.addids('A', [MessageId((42, 1, 4, 2))], 'p2')
+    store.flush()
+    assert store.msgids('A', 'p1') == [MessageId((42, 1, 4, 1))]
+    assert store.msgids('A', None) == []
+
+
+def test_empty_chat_is_skipped(store):
+    store.add(None, [_msg(1)], 'p1')
+    store.add('B', [_msg(2)], 'p1')
+    store.flush()
+    assert [i['chat'] for i in store.query()] == ['B']
+
+
+def test_bad_row_does_not_drop_batch(store):
+    store.add('A', [_msg(1)], 'p1')
+    store._queue.put((None, '42.1.4.9', 'friend', '张三', '坏记录', 0.0, 'p1'))
+    store.add('B', [_msg(2)], 'p1')
+    store.flush()
+    assert sorted(i['chat'] for i in store.query()) == ['A', 'B']
+
+
+def test_reused_id_replaces_message(store):
+    store.add('A', [_msg(1, '旧')], 'p1')
+    store.flush()
+    store.add('A', [_msg(1, '新')], 'p1')
+    store.addids('A', [MessageId((42, 1, 4, 1))], 'p1')
+    store.flush()
+    assert [i['content'] for i in store.query(chat='A')] == ['新']
@@ -1,9 +1,41 @@
-from .wxauto import WeChat
-from .utils import *
+import importlib
+import importlib.util
 
-__version__ = VERSION
+# 按需导入：只使用wxauto.clipboard等不依赖界面的子模块时，不加载依赖Windows界面的uiautomation
+_EXPORTS = {
+    'WeChat': 'wxauto',
+    'Listener': 'listener',
+    'MessageStore': 'msgstore',
+    'SendQueue': 'sendqueue',
+}
 
 __all__ = [
-    'WeChat', 
+    'WeChat',
+    'Listener',
+    'MessageStore',
+    'SendQueue',
     'VERSION',
 ]
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+    elif name == '__version__':
+        value = importlib.import_module('.utils', __name__).VERSION
+    elif name.startswith('_'):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    elif importlib.util.find_spec(f'{__name__}.{name}') is not None:
+        return importlib.import_module(f'.{name}', __name__)
+    else:
+        # 原先由 from .utils import * 导出的名称
+        try:
+            value = getattr(importlib.import_module('.utils', __name__), name)
+        except AttributeError:
+            raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | {'__version__'})
@@ -0,0 +1,309 @@
+"""剪贴板
+
+所有剪贴板读写都通过Clipboard事务完成：每个事务只打开一次剪贴板，剪贴板被其他进程占用时按指数退避（带随机抖动）重试；
+可在粘贴前后保存、恢复原有内容，并记录争用统计。底层读写由可替换的后端完成，
+非Windows环境或测试时可使用内存后端MemoryClipboardBackend
+"""
+import contextlib
+import threading
+import ctypes
+import random
+import time
+try:
+    import win32clipboard
+except ImportError:
+    win32clipboard = None
+
+CF_TEXT = 1
+CF_UNICODETEXT = 13
+CF_HDROP = 15
+CF_REGISTERED = 0xC000  # RegisterClipboardFormat注册的格式从这里开始
+
+# 数据就是全局内存块内容的格式，读出后可以原样写回：
+# CF_TEXT、CF_SYLK、CF_DIF、CF_TIFF、CF_OEMTEXT、CF_DIB、CF_RIFF、CF_WAVE、CF_UNICODETEXT、CF_HDROP、CF_LOCALE、CF_DIBV5，以及注册的格式。
+# CF_BITMAP、CF_METAFILEPICT、CF_PALETTE、CF_ENHMETAFILE等格式的数据是GDI句柄，关闭剪贴板后即失效，不能保存
+BYVALUE_FORMATS = frozenset((1, 4, 5, 6, 7, 8, 11, 12, 13, 15, 16, 17))
+
+
+def IsByValueFormat(fmt):
+    """剪贴板格式的数据能否读出后原样写回"""
+    return fmt in BYVALUE_FORMATS or fmt >= CF_REGISTERED
+
+
+class DROPFILES(ctypes.Structure):
+    _fields_ = [
+    ("pFiles", ctypes.c_uint),
+    ("x", ctypes.c_long),
+    ("y", ctypes.c_long),
+    ("fNC", ctypes.c_int),
+    ("fWide", ctypes.c_bool),
+    ]
+
+pDropFiles = DROPFILES()
+pDropFiles.pFiles = ctypes.sizeof(DROPFILES)
+pDropFiles.fWide = True
+matedata = bytes(pDropFiles)
+
+def EncodeFiles(paths):
+    """文件路径列表 -> CF_HDROP数据"""
+    files = ("\0".join(paths)).replace("/", "\\")
+    return matedata + files.encode("U16")[2:] + b"\0\0"
+
+def DecodeFiles(data):
+    """CF_HDROP数据 -> 文件路径元组"""
+    files = data[len(matedata):].decode('utf-16-le').rstrip('\0')
+    return tuple(files.split('\0')) if files else ()
+
+
+class Win32ClipboardBackend:
+    """pywin32剪贴板后端"""
+    def __init__(self):
+        if win32clipboard is None:
+            raise ImportError('Win32ClipboardBackend需要pywin32')
+
+    def open(self):
+        win32clipboard.OpenClipboard()
+
+    def close(self):
+        win32clipboard.CloseClipboard()
+
+    def empty(self):
+        win32clipboard.EmptyClipboard()
+
+    def formats(self):
+        formats = []
+        fmt = win32clipboard.EnumClipboardFormats(0)
+        while fmt:
+            formats.append(fmt)
+            fmt = win32clipboard.EnumClipboardFormats(fmt)
+        return formats
+
+    def available(self, fmt):
+        return bool(win32clipboard.IsClipboardFormatAvailable(fmt))
+
+    def get(self, fmt):
+        return win32clipboard.GetClipboardData(fmt)
+
+    def set(self, fmt, data):
+        win32clipboard.SetClipboardData(fmt, data)
+
+
+class MemoryClipboardBackend:
+    """内存剪贴板后端，行为与Win32剪贴板一致：CF_HDROP以字节写入、以文件路径元组读出
+
+    Args:
+        busy (int, optional): 接下来多少次open模拟被其他进程占用而失败
+    """
+    def __init__(self, busy=0):
+        self.busy = busy
+        self.data = {}
+        self.opens = 0
+        self._opened = False
+
+    def open(self):
+        if self.busy > 0:
+            self.busy -= 1
+            raise OSError('剪贴板被占用')
+        if self._opened:
+            raise OSError('剪贴板已打开')
+        self._opened = True
+        self.opens += 1
+
+    def close(self):
+        self._opened = False
+
+    def _check(self):
+        if not self._opened:
+            raise OSError('剪贴板未打开')
+
+    def empty(self):
+        self._check()
+        self.data.clear()
+
+    def formats(self):
+        self._check()
+        return list(self.data)
+
+    def available(self, fmt):
+        self._check()
+        return fmt in self.data
+
+    def get(self, fmt):
+        self._check()
+        data = self.data[fmt]
+        return DecodeFiles(data) if fmt == CF_HDROP else data
+
+    def set(self, fmt, data):
+        self._check()
+        self.data[fmt] = data
+
+
+class Clipboard:
+    """剪贴板事务管理
+
+    Args:
+        backend (optional): 剪贴板后端，默认Windows下为Win32ClipboardBackend，否则为MemoryClipboardBackend
+        timeout (float, optional): 打开剪贴板的超时时间（秒）
+        backoff (float, optional): 首次重试前的等待时间（秒），之后每次翻倍
+        maxbackoff (float, optional): 单次重试等待时间上限（秒）
+
+    Example:
+        >>> with CLIPBOARD.transaction() as cb:
+        ...     cb.empty()
+        ...     cb.set(CF_UNICODETEXT, 'hello')
+        >>> with CLIPBOARD.preserve():  # 退出时恢复原有剪贴板内容
+        ...     CLIPBOARD.settext('hello')
+        ...     editbox.SendKeys('{Ctrl}v')
+    """
+    def __init__(self, backend=None, timeout=10, backoff=0.005, maxbackoff=0.2):
+        if backend is None:
+            backend = Win32ClipboardBackend() if win32clipboard is not None else MemoryClipboardBackend()
+        self.backend = backend
+        self.timeout = timeout
+        self.backoff = backoff
+        self.maxbackoff = maxbackoff
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._stats = {'transactions': 0, 'contended': 0, 'retries': 0, 'timeouts': 0, 'wait': 0, 'max_wait': 0}
+
+    def __repr__(self) -> str:
+        return f"<wxauto Clipboard at {hex(id(self))} ({type(self.backend).__name__})>"
+
+    def stats(self):
+        """争用统计
+
+        Returns:
+            dict: {'transactions': 事务数, 'contended': 遇到占用的事务数, 'retries': 重试次数,
+                'timeouts': 超时次数, 'wait': 退避等待总秒数, 'max_wait': 单个事务最长等待秒数}
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def _open(self):
+        t0 = time.time()
+        delay = self.backoff
+        retries = 0
+        while True:
+            try:
+                self.backend.open()
+                break
+            except Exception:
+                waited = time.time() - t0
+                if waited > self.timeout:
+                    self._stats['timeouts'] += 1
+                    raise TimeoutError(f'打开剪贴板超时，已重试{retries}次')
+                retries += 1
+                time.sleep(random.uniform(delay / 2, delay))
+                delay = min(delay * 2, self.maxbackoff)
+        waited = time.time() - t0
+        stats = self._stats
+        stats['transactions'] += 1
+        if retries:
+            stats['contended'] += 1
+            stats['retries'] += retries
+            stats['wait'] += waited
+            stats['max_wait'] = max(stats['max_wait'], waited)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """打开剪贴板一次，在with块中通过后端读写，退出时关闭；同一线程内嵌套时复用已打开的剪贴板"""
+        with self._lock:
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield self.backend
+                finally:
+                    self._depth -= 1
+                return
+            self._open()
+            self._depth = 1
+            try:
+                yield self.backend
+            finally:
+                self._depth = 0
+                self.backend.close()
+
+    def settext(self, text):
+        """写入文本"""
+        if not isinstance(text, str):
+            raise TypeError(f"参数类型必须为str --> {text}")
+        with self.transaction() as cb:
+            cb.empty()
+            cb.set(CF_UNICODETEXT, text)
+
+    def gettext(self):
+        """读取文本，没有文本时返回None"""
+        with self.transaction() as cb:
+            return cb.get(CF_UNICODETEXT) if cb.available(CF_UNICODETEXT) else None
+
+    def setfiles(self, paths):
+        """写入文件列表"""
+        with self.transaction() as cb:
+            cb.empty()
+            cb.set(CF_HDROP, EncodeFiles(paths))
+
+    def getfiles(self):
+        """读取文件列表，没有文件时返回None"""
+        with self.transaction() as cb:
+            return cb.get(CF_HDROP) if cb.available(CF_HDROP) else None
+
+    def formats(self):
+        with self.transaction() as cb:
+            return cb.formats()
+
+    def read(self, byvalue=False):
+        """一次读取所有可读取的格式
+
+        Args:
+            byvalue (bool, optional): 只读取能原样写回的格式，见IsByValueFormat
+
+        Returns:
+            dict: {格式: 数据}
+        """
+        data = {}
+        with self.transaction() as cb:
+            for fmt in cb.formats():
+                if byvalue and not IsByValueFormat(fmt):
+                    continue
+                try:
+                    data[fmt] = cb.get(fmt)
+                except Exception:
+                    pass
+        return data
+
+    def snapshot(self):
+        """保存当前剪贴板内容，供restore恢复；位图、图元文件等句柄格式无法保存，不在其中"""
+        return self.read(byvalue=True)
+
+    def restore(self, snapshot):
+        """恢复snapshot保存的剪贴板内容，句柄格式和无法写回的格式跳过"""
+        with self.transaction() as cb:
+            cb.empty()
+            for fmt, data in snapshot.items():
+                if not IsByValueFormat(fmt):
+                    continue
+                if fmt == CF_HDROP and not isinstance(data, bytes):
+                    data = EncodeFiles(data)
+                try:
+                    cb.set(fmt, data)
+                except Exception:
+                    pass
+
+    @contextlib.contextmanager
+    def preserve(self, enabled=True):
+        """with块结束后恢复进入时的剪贴板内容
+
+        Args:
+            enabled (bool, optional): 为False时不做任何处理
+        """
+        if not enabled:
+            yield
+            return
+        snapshot = self.snapshot()
+        try:
+            yield
+        finally:
+            self.restore(snapshot)
+
+
+CLIPBOARD = Clipboard()
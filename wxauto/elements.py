@@ -4,6 +4,7 @@ from .utils import *
 from .color import *
 from .errors import *
 import datetime
+import logging
 import time
 import os
 import re
@@ -17,57 +18,348 @@ class WxParam:
     CHAT_TEXT_HEIGHT = 52
     CHAT_IMG_HEIGHT = 117
     DEFALUT_SAVEPATH = os.path.join(os.getcwd(), 'wxauto文件')
+    MSGID_CACHE_SIZE = 1000  # 每个聊天窗口最多记录的已读消息id数量
+    EVENT_WAIT = True  # 等待菜单、弹窗时由UIA事件唤醒，不再按固定间隔轮询
+    ASYNC_MEDIA = False  # 保存图片、文件、语音时先返回消息，由界面操作线程依次下载，结果见msg.media
+    MEDIA_TIMEOUT = 30  # 单个图片、文件、语音的下载超时时间（秒）
+    LISTEN_MIN_INTERVAL = 1  # 监听对象有新消息后的轮询间隔（秒）
+    LISTEN_MAX_INTERVAL = 30  # 监听对象长时间无新消息时的最大轮询间隔（秒）
+    LISTEN_BACKOFF = 2  # 监听对象无新消息时轮询间隔扩大的倍数
+    SEND_RATE = 2  # 发送队列全局每秒最多发送的消息数，0为不限制
+    SEND_BURST = 10  # 发送队列全局可连续发送的消息数
+    SEND_CHAT_RATE = 1  # 发送队列对同一聊天每秒最多发送的消息数，0为不限制
+    SEND_CHAT_BURST = 5  # 发送队列对同一聊天可连续发送的消息数
+    CLIPBOARD_RESTORE = False  # 发送消息、文件后恢复剪贴板中原有的内容
+    CONFIRM_TIMEOUT = 10  # 粘贴后等待编辑框出现内容的超时时间（秒）
+    CONFIRM_QUIET = 1  # 粘贴后编辑框持续无内容多久才重新粘贴（秒）
+    CONFIRM_MAX_BACKOFF = 0.2  # 检查编辑框内容的最大间隔（秒），从0.01秒开始翻倍
+
+# 列表项（消息、会话）批量缓存的属性，一次跨进程调用取回
+LISTITEM_CACHE_REQUEST = uia.CacheRequest([
+    uia.PropertyId.NameProperty,
+    uia.PropertyId.BoundingRectangleProperty,
+])
+
+def ConfirmInput(editbox, paste, confirm=bool, timeout=None, quiet=None, error='输入超时'):
+    """粘贴并确认编辑框已收到内容
+
+    粘贴一次后按指数退避检查编辑框的值，持续quiet秒仍未确认才重新粘贴，避免重复粘贴和空转
+
+    Args:
+        editbox (uia.EditControl): 编辑框控件
+        paste (function): 写剪贴板并粘贴的操作，无参数
+        confirm (function, optional): confirm(value) -> bool，编辑框的值满足时确认成功，默认值非空即可
+        timeout (float, optional): 超时时间，默认WxParam.CONFIRM_TIMEOUT
+        quiet (float, optional): 重新粘贴前等待的时间，默认WxParam.CONFIRM_QUIET
+        error (str, optional): 超时异常的信息
+
+    Returns:
+        float: 从第一次粘贴到确认成功的秒数
+    """
+    timeout = WxParam.CONFIRM_TIMEOUT if timeout is None else timeout
+    quiet = WxParam.CONFIRM_QUIET if quiet is None else quiet
+    t0 = time.time()
+    pasted = 0
+    while True:
+        if time.time() - t0 > timeout:
+            raise TimeoutError(error)
+        paste()
+        pasted += 1
+        t1 = time.time()
+        delay = 0.01
+        while time.time() - t1 < quiet:
+            if confirm(editbox.GetValuePattern().Value):
+                elapsed = time.time() - t0
+                wxlog.debug(f'输入已确认，粘贴{pasted}次，耗时{elapsed:.3f}秒')
+                return elapsed
+            if time.time() - t0 > timeout:
+                raise TimeoutError(error)
+            time.sleep(delay)
+            delay = min(delay * 2, WxParam.CONFIRM_MAX_BACKOFF)
+
+class MsgItemShape:
+    """消息控件中用于分类的属性
+
+    名称、位置、消息id只读取一次；头像按钮和文本控件在规则第一次用到时通过一次子树快照取回。
+    也可以直接用记录下来的数据构造，离线验证分类规则
+
+    Args:
+        name (str): 消息控件的Name
+        rect (tuple): 消息控件的位置 (left, top, right, bottom)
+        msgid (MessageId, optional): 消息id
+        user (tuple, optional): 第一个Name不为空的按钮（头像） (name, rect)，没有则为None
+        text (tuple, optional): 第一个文本控件（群聊中的发送人昵称） (name, rect)，没有则为None
+        control (uia.Control, optional): 消息控件，user和text未给出时从中读取
+    """
+    __slots__ = ('name', 'rect', 'msgid', 'control', '_user', '_text', '_loaded')
+
+    def __init__(self, name, rect, msgid=None, user=None, text=None, control=None):
+        self.name = name
+        self.rect = rect
+        self.msgid = msgid
+        self.control = control
+        self._user = user
+        self._text = text
+        self._loaded = control is None or user is not None or text is not None
+
+    def __repr__(self):
+        return f"<wxauto MsgItemShape {self.name!r} {self.rect}>"
+
+    @classmethod
+    def FromControl(cls, control):
+        rect = control.BoundingRectangle
+        return cls(control.Name, (rect.left, rect.top, rect.right, rect.bottom), MessageId.FromControl(control), control=control)
+
+    @classmethod
+    def FromNode(cls, snapshot, node):
+        """由消息列表快照中的节点构造，不再访问控件"""
+        user = next((i for i in snapshot.FindAll('ButtonControl', node=node) if i.Name), None)
+        text = snapshot.FindFirst('TextControl', node=node)
+        shape = cls(node.Name, node.rect, MessageId(node.runtimeId),
+                    (user.Name, user.rect) if user else None,
+                    (text.Name, text.rect) if text else None)
+        shape._loaded = True
+        return shape
+
+    @classmethod
+    def FromDict(cls, data):
+        """由ToDict的结果构造，用于回放记录下来的消息形状"""
+        user, text = data.get('user'), data.get('text')
+        return cls(data['name'], tuple(data['rect']), MessageId.FromString(data.get('msgid', '')),
+                   (user[0], tuple(user[1])) if user else None,
+                   (text[0], tuple(text[1])) if text else None)
+
+    def ToDict(self):
+        """记录分类用到的全部属性，可用json保存
+
+        Example:
+            >>> shapes = [MsgItemShape.FromControl(i).ToDict() for i in wx.C_MsgList.GetChildren()]
+            >>> json.dump(shapes, open('shapes.json', 'w', encoding='utf-8'), ensure_ascii=False)
+        """
+        return {
+            'name': self.name,
+            'rect': list(self.rect),
+            'msgid': str(self.msgid) if self.msgid else '',
+            'user': [self.user[0], list(self.user[1])] if self.user else None,
+            'text': [self.text[0], list(self.text[1])] if self.text else None,
+        }
+
+    def _load(self):
+        self._loaded = True
+        snapshot = self.control.Snapshot()
+        user = next((i for i in snapshot.FindAll('ButtonControl') if i.Name), None)
+        text = snapshot.FindFirst('TextControl')
+        self._user = (user.Name, user.rect) if user else None
+        self._text = (text.Name, text.rect) if text else None
+
+    @property
+    def height(self):
+        return self.rect[3] - self.rect[1]
+
+    @property
+    def mid(self):
+        return (self.rect[0] + self.rect[2]) / 2
+
+    @property
+    def user(self):
+        if not self._loaded:
+            self._load()
+        return self._user
+
+    @property
+    def text(self):
+        if not self._loaded:
+            self._load()
+        return self._text
+
+
+def _rule_sys(shape):
+    if shape.height == WxParam.SYS_TEXT_HEIGHT:
+        return 'SYS'
+
+def _rule_time(shape):
+    if shape.height == WxParam.TIME_TEXT_HEIGHT:
+        return 'Time'
+
+def _rule_recall(shape):
+    if shape.height == WxParam.RECALL_TEXT_HEIGHT:
+        return 'Recall' if '撤回' in shape.name else 'SYS'
+
+def _rule_nouser(shape):
+    if shape.user is None:
+        return 'SYS'
+
+def _rule_self(shape):
+    if shape.user[1][0] >= shape.mid:
+        return 'Self'
+
+def _rule_group_remark(shape):
+    if shape.text and shape.text[1][1] < shape.user[1][1]:
+        return (shape.user[0], shape.text[0])
+
+def _rule_friend(shape):
+    return (shape.user[0], shape.user[0])
+
+
+class MessageClassifier:
+    """表驱动的消息分类器
+
+    按顺序执行规则，第一个返回非None的规则决定消息发送方，规则出错时按系统消息处理。
+    规则为函数 rule(shape: MsgItemShape) -> str|tuple|None，返回值与ParseMessage所需的发送方一致：
+    'SYS'、'Time'、'Recall'、'Self'，或好友消息的 (发送人, 备注/群昵称)
+
+    Args:
+        rules (list, optional): [(规则名, 规则函数), ...]，默认为DEFAULT_RULES
+    """
+    DEFAULT_RULES = [
+        ('sys', _rule_sys),
+        ('time', _rule_time),
+        ('recall', _rule_recall),
+        ('nouser', _rule_nouser),
+        ('self', _rule_self),
+        ('group_remark', _rule_group_remark),
+        ('friend', _rule_friend),
+    ]
+
+    def __init__(self, rules=None):
+        self.rules = list(self.DEFAULT_RULES if rules is None else rules)
+
+    def __repr__(self):
+        return f"<wxauto MessageClassifier {[name for name, _ in self.rules]}>"
+
+    def AddRule(self, name, rule, before=None):
+        """添加规则
+
+        Args:
+            name (str): 规则名
+            rule (function): 规则函数
+            before (str, optional): 插入到该规则之前，默认添加到最后
+        """
+        index = len(self.rules)
+        if before is not None:
+            index = [i for i, _ in self.rules].index(before)
+        self.rules.insert(index, (name, rule))
+
+    def RemoveRule(self, name):
+        self.rules = [(i, rule) for i, rule in self.rules if i != name]
+
+    def Classify(self, shape):
+        """返回消息发送方，没有规则匹配时按系统消息处理"""
+        try:
+            for _, rule in self.rules:
+                sender = rule(shape)
+                if sender is not None:
+                    return sender
+        except Exception as e:
+            wxlog.debug(f'消息分类失败，按系统消息处理：{shape} {e}')
+        return 'SYS'
+
 
 class WeChatBase:
+    classifier = MessageClassifier()
+
     def _lang(self, text, langtype='MAIN'):
         if langtype == 'MAIN':
             return MAIN_LANGUAGE[text][self.language]
         elif langtype == 'WARNING':
             return WARNING[text][self.language]
 
+    def _sendtext(self, editbox, msg, clear=False, at=None):
+        """向已定位的编辑框输入并发送文本消息
+
+        Args:
+            editbox (uia.EditControl): 编辑框控件
+            msg (str): 要发送的文本消息
+            clear (bool, optional): 是否清除原本的内容
+            at (str|list, optional): 要@的人
+
+        Returns:
+            float: 粘贴后确认输入的耗时（秒）
+        """
+        if clear:
+            editbox.SendKeys('{Ctrl}a', waitTime=0)
+        if not editbox.HasKeyboardFocus:
+            editbox.Click(simulateMove=False)
+
+        if at:
+            if isinstance(at, str):
+                at = [at]
+            for i in at:
+                editbox.SendKeys('@'+i)
+                atwnd = self.UiaAPI.PaneControl(ClassName='ChatContactMenu')
+                if atwnd.Exists(maxSearchSeconds=0.1, waitEvents=WxParam.EVENT_WAIT):
+                    atwnd.SendKeys('{ENTER}')
+                    if msg and not msg.startswith('\n'):
+                        msg = '\n' + msg
+
+        elapsed = 0
+        if msg:
+            def paste():
+                SetClipboardText(msg)
+                editbox.SendKeys('{Ctrl}v')
+            with CLIPBOARD.preserve(WxParam.CLIPBOARD_RESTORE):
+                elapsed = ConfirmInput(editbox, paste, error=f'发送消息超时 --> {editbox.Name} - {msg}')
+        editbox.SendKeys('{Enter}')
+        return elapsed
+
     def _split(self, MsgItem):
-        uia.SetGlobalSearchTimeout(0)
-        MsgItemName = MsgItem.Name
-        if MsgItem.BoundingRectangle.height() == WxParam.SYS_TEXT_HEIGHT:
-            Msg = ['SYS', MsgItemName, ''.join([str(i) for i in MsgItem.GetRuntimeId()])]
-        elif MsgItem.BoundingRectangle.height() == WxParam.TIME_TEXT_HEIGHT:
-            Msg = ['Time', MsgItemName, ''.join([str(i) for i in MsgItem.GetRuntimeId()])]
-        elif MsgItem.BoundingRectangle.height() == WxParam.RECALL_TEXT_HEIGHT:
-            if '撤回' in MsgItemName:
-                Msg = ['Recall', MsgItemName, ''.join([str(i) for i in MsgItem.GetRuntimeId()])]
-            else:
-                Msg = ['SYS', MsgItemName, ''.join([str(i) for i in MsgItem.GetRuntimeId()])]
-        else:
-            Index = 1
-            User = MsgItem.ButtonControl(foundIndex=Index)
-            try:
-                while True:
-                    if User.Name == '':
-                        Index += 1
-                        User = MsgItem.ButtonControl(foundIndex=Index)
-                    else:
-                        break
-                winrect = MsgItem.BoundingRectangle
-                mid = (winrect.left + winrect.right)/2
-                if User.BoundingRectangle.left < mid:
-                    if MsgItem.TextControl().Exists(0.1) and MsgItem.TextControl().BoundingRectangle.top < User.BoundingRectangle.top:
-                        name = (User.Name, MsgItem.TextControl().Name)
-                    else:
-                        name = (User.Name, User.Name)
-                else:
-                    name = 'Self'
-                Msg = [name, MsgItemName, ''.join([str(i) for i in MsgItem.GetRuntimeId()])]
-            except:
-                Msg = ['SYS', MsgItemName, ''.join([str(i) for i in MsgItem.GetRuntimeId()])]
-        uia.SetGlobalSearchTimeout(10.0)
+        shape = MsgItemShape.FromControl(MsgItem)
+        Msg = [self.classifier.Classify(shape), shape.name, shape.msgid]
         return ParseMessage(Msg, MsgItem, self)
     
+    def _getmsgids(self, msgitems):
+        """只读取消息控件的RuntimeId作为消息id，不解析消息内容"""
+        return [MessageId.FromControl(MsgItem) for MsgItem in msgitems]
+
+    def _gettailmsgitems(self, msglist, usedmsgid):
+        """从消息列表最后一条向前遍历，遇到已读消息id即停止，只读取新消息部分
+
+        Args:
+            msglist (uia.ListControl): 消息列表控件
+            usedmsgid (MessageIdSet): 已读消息id
+
+        Returns:
+            tuple: (新消息控件列表, 新消息id列表, 是否遇到已读消息)，列表均按显示顺序排列
+        """
+        msgitems, msgids = [], []
+        found = False
+        MsgItem = msglist.GetLastChildControl(LISTITEM_CACHE_REQUEST)
+        while MsgItem:
+            msgid = MessageId.FromControl(MsgItem)
+            if msgid in usedmsgid:
+                found = True
+                break
+            msgitems.append(MsgItem)
+            msgids.append(msgid)
+            MsgItem = MsgItem.GetPreviousSiblingControl(LISTITEM_CACHE_REQUEST)
+        msgitems.reverse()
+        msgids.reverse()
+        return msgitems, msgids, found
+
     def _getmsgs(self, msgitems, savepic=False, savefile=False, savevoice=False):
         msgs = []
         for MsgItem in msgitems:
             if MsgItem.ControlTypeName == 'ListItemControl':
                 msgs.append(self._split(MsgItem))
+        return self._savemsgfiles(msgs, savepic, savefile, savevoice)
 
+    def _getallmsgs(self, msglist, savepic=False, savefile=False, savevoice=False):
+        """一次取回整个消息列表的子树快照，在内存中解析全部消息
+
+        Args:
+            msglist (uia.ListControl): 消息列表控件
+        """
+        snapshot = msglist.Snapshot()
+        msgs = []
+        for node in snapshot.GetChildren():
+            if node.ControlTypeName != 'ListItemControl':
+                continue
+            shape = MsgItemShape.FromNode(snapshot, node)
+            Msg = [self.classifier.Classify(shape), shape.name, shape.msgid]
+            msgs.append(ParseMessage(Msg, snapshot.GetControl(node), self))
+        return self._savemsgfiles(msgs, savepic, savefile, savevoice)
+
+    def _savemsgfiles(self, msgs, savepic=False, savefile=False, savevoice=False):
         msgtypes = [
             f"[{self._lang('图片')}]",
             f"[{self._lang('文件')}]",
@@ -81,30 +373,66 @@ class WeChatBase:
             if msg.type not in ('friend', 'self'):
                 continue
             if msg.content.startswith(f"[{self._lang('图片')}]") and savepic:
-                imgpath = self._download_pic(msg.control)
-                msg.content = imgpath if imgpath else msg.content
+                download = self._download_pic
             elif msg.content.startswith(f"[{self._lang('文件')}]") and savefile:
-                filepath = self._download_file(msg.control)
-                msg.content = filepath if filepath else msg.content
+                download = self._download_file
             elif msg.content.startswith(f"[{self._lang('语音')}]") and savevoice:
-                voice_text = self._get_voice_text(msg.control)
-                msg.content = voice_text if voice_text else msg.content
-            msg.info[1] = msg.content
+                download = self._get_voice_text
+            else:
+                continue
+            if WxParam.ASYNC_MEDIA:
+                msg.media = self._submitmedia(msg, download)
+            else:
+                result = download(msg.control)
+                msg.content = result if result else msg.content
         return msgs
+
+    def _submitmedia(self, msg, download):
+        """把下载提交到界面操作线程，完成后用结果替换消息内容
+
+        只传入消息id，由界面操作线程重新定位窗口、消息列表和消息控件，不使用本线程创建的控件
+
+        Returns:
+            Future: 下载结果（文件路径或语音文字），失败时为None，超时抛出TimeoutError
+        """
+        def _done(future):
+            if not future.cancelled() and future.exception() is None and future.result():
+                msg.content = future.result()
+        worker = GetUIActionWorker()
+        # 操作依次执行，超时时间包括排在前面的下载
+        future = worker.submit(self._media, download, msg.id, timeout=WxParam.MEDIA_TIMEOUT * (worker.pending + 1))
+        future.add_done_callback(_done)
+        return future
+
+    def _media(self, download, msgid):
+        """在界面操作线程中执行：由窗口句柄和消息id重新定位控件后下载，消息已不在列表中时返回None"""
+        self._show()
+        window = uia.ControlFromHandle(self.HWND)
+        msglist = uia.Control(searchFromControl=window, **self.C_MsgList.searchProperties)
+        for msgitem in msglist.GetChildren(LISTITEM_CACHE_REQUEST):
+            if MessageId.FromControl(msgitem) == msgid:
+                return download(msgitem, msglist, window)
+        wxlog.debug(f'消息已不在列表中，放弃下载：{msgid}')
+        return None
     
-    def _download_pic(self, msgitem):
+    @uilocked
+    def _download_pic(self, msgitem, msglist=None, window=None):
+        msglist = self.C_MsgList if msglist is None else msglist
         self._show()
         imgcontrol = msgitem.ButtonControl(Name='')
         if not imgcontrol.Exists(0.5):
             return None
-        RollIntoView(self.C_MsgList, imgcontrol)
+        RollIntoView(msglist, imgcontrol)
         imgcontrol.Click(simulateMove=False)
         imgobj = WeChatImage()
         savepath = imgobj.Save()
         imgobj.Close()
         return savepath
 
-    def _download_file(self, msgitem):
+    @uilocked
+    def _download_file(self, msgitem, msglist=None, window=None):
+        msglist = self.C_MsgList if msglist is None else msglist
+        window = self.UiaAPI if window is None else window
         # msgitems = self.C_MsgList.GetChildren()
         # msgs = []
         # for MsgItem in msgitems:
@@ -113,10 +441,10 @@ class WeChatBase:
         filecontrol = msgitem.ButtonControl(Name='')
         if not filecontrol.Exists(0.5):
             return None
-        RollIntoView(self.C_MsgList, filecontrol)
+        RollIntoView(msglist, filecontrol)
         filecontrol.RightClick(simulateMove=False)
         # paths = list()
-        menu = self.UiaAPI.MenuControl(ClassName='CMenuWnd')
+        menu = window.MenuControl(ClassName='CMenuWnd')
         options = [i for i in menu.ListControl().GetChildren() if i.ControlTypeName == 'MenuItemControl']
 
         copy = [i for i in options if i.Name == '复制']
@@ -125,16 +453,20 @@ class WeChatBase:
         else:
             filecontrol.RightClick(simulateMove=False)
             filecontrol.Click(simulateMove=False)
-            filewin = self.UiaAPI.WindowControl(ClassName='MsgFileWnd')
+            filewin = window.WindowControl(ClassName='MsgFileWnd')
             accept_button = filewin.ButtonControl(Name='接收文件')
             if accept_button.Exists(2):
                 accept_button.Click(simulateMove=False)
             
+            t0 = time.time()
             while True:
+                if time.time() - t0 > WxParam.MEDIA_TIMEOUT:
+                    wxlog.debug('下载文件超时')
+                    return None
                 try:
                     filecontrol = msgitem.ButtonControl(Name='')
                     filecontrol.RightClick(simulateMove=False)
-                    menu = self.UiaAPI.MenuControl(ClassName='CMenuWnd')
+                    menu = window.MenuControl(ClassName='CMenuWnd')
                     options = [i for i in menu.ListControl().GetChildren() if i.ControlTypeName == 'MenuItemControl']
                     copy = [i for i in options if i.Name == '复制']
                     if copy:
@@ -151,17 +483,22 @@ class WeChatBase:
         shutil.copyfile(filepath, savepath)
         return savepath
 
-    def _get_voice_text(self, msgitem):
-        if msgitem.GetProgenyControl(8, 4):
-            return msgitem.GetProgenyControl(8, 4).Name
+    @uilocked
+    def _get_voice_text(self, msgitem, msglist=None, window=None):
+        msglist = self.C_MsgList if msglist is None else msglist
+        window = self.UiaAPI if window is None else window
+        progeny = msgitem.GetProgenyIndex()
+        voicetext = progeny.GetControl(8, 4)
+        if voicetext:
+            return voicetext.Name
         voicecontrol = msgitem.ButtonControl(Name='')
         if not voicecontrol.Exists(0.5):
             return None
-        RollIntoView(self.C_MsgList, voicecontrol)
-        msgitem.GetProgenyControl(7, 1).RightClick(simulateMove=False)
-        menu = self.UiaAPI.MenuControl(ClassName='CMenuWnd')
+        RollIntoView(msglist, voicecontrol)
+        progeny.GetControl(7, 1).RightClick(simulateMove=False)
+        menu = window.MenuControl(ClassName='CMenuWnd')
         option = menu.MenuItemControl(Name="语音转文字")
-        if not option.Exists(0.5):
+        if not option.Exists(0.5, waitEvents=WxParam.EVENT_WAIT):
             voicecontrol.Click(simulateMove=False)
             if not msgitem.GetProgenyControl(8, 4):
                 return None
@@ -169,25 +506,36 @@ class WeChatBase:
             option.Click(simulateMove=False)
 
         text = ''
+        t0 = time.time()
         while True:
-            if msgitem.GetProgenyControl(8, 4):
-                if msgitem.GetProgenyControl(8, 4).Name == text:
+            if time.time() - t0 > WxParam.MEDIA_TIMEOUT:
+                wxlog.debug('语音转文字超时')
+                return text or None
+            voicetext = msgitem.GetProgenyControl(8, 4)
+            if voicetext:
+                if voicetext.Name == text:
                     return text
-                text = msgitem.GetProgenyControl(8, 4).Name
+                text = voicetext.Name
             time.sleep(0.1)
 
 
 class ChatWnd(WeChatBase):
-    def __init__(self, who, language='cn'):
+    def __init__(self, who, language='cn', store=None, seed=True):
         self.who = who
         self.language = language
-        self.usedmsgid = []
+        self.store = store  # MessageStore，记录新消息并在启动时恢复已读消息id
+        self.usedmsgid = MessageIdSet(maxsize=WxParam.MSGID_CACHE_SIZE)
         self.UiaAPI = uia.WindowControl(searchDepth=1, ClassName='ChatWnd', Name=who)
         self.editbox = self.UiaAPI.EditControl()
         self.C_MsgList = self.UiaAPI.ListControl()
-        self.GetAllMessage()
+        self.processkey = GetProcessKey(FindWindow(name=who, classname='ChatWnd'))  # 消息id只在同一微信进程内有效
+        if store is not None:
+            self.usedmsgid.update(store.msgids(who, self.processkey, limit=WxParam.MSGID_CACHE_SIZE))
+        elif seed:  # 为False时不读取已加载的消息，第一次GetNewMessage时再记录已读消息id
+            self.GetAllMessage()
 
         self.savepic = False   # 该参数用于在自动监听的情况下是否自动保存聊天图片
+        self.pollinterval = PollInterval(WxParam.LISTEN_MIN_INTERVAL, WxParam.LISTEN_MAX_INTERVAL, WxParam.LISTEN_BACKOFF)  # Listener按此间隔轮询
 
     def __repr__(self) -> str:
         return f"<wxauto Chat Window at {hex(id(self))} for {self.who}>"
@@ -197,8 +545,10 @@ class ChatWnd(WeChatBase):
         win32gui.ShowWindow(self.HWND, 1)
         win32gui.SetWindowPos(self.HWND, -1, 0, 0, 0, 0, 3)
         win32gui.SetWindowPos(self.HWND, -2, 0, 0, 0, 0, 3)
-        self.UiaAPI.SwitchToThisWindow()
+        uia.SwitchToThisWindow(self.HWND)  # 只用窗口句柄，界面操作线程也可调用
+        time.sleep(uia.OPERATION_WAIT_TIME)
 
+    @uilocked
     def AtAll(self, msg=None):
         """@所有人
         
@@ -212,7 +562,7 @@ class ChatWnd(WeChatBase):
 
         self.editbox.SendKeys('@')
         atwnd = self.UiaAPI.PaneControl(ClassName='ChatContactMenu')
-        if atwnd.Exists(maxSearchSeconds=0.1):
+        if atwnd.Exists(maxSearchSeconds=0.1, waitEvents=WxParam.EVENT_WAIT):
             atwnd.ListItemControl(Name='所有人').Click(simulateMove=False)
             if msg:
                 if not msg.startswith('\n'):
@@ -221,6 +571,7 @@ class ChatWnd(WeChatBase):
             else:
                 self.editbox.SendKeys('{Enter}')
 
+    @uilocked
     def SendMsg(self, msg, at=None):
         """发送文本消息
 
@@ -230,30 +581,9 @@ class ChatWnd(WeChatBase):
         """
         wxlog.debug(f"发送消息：{self.who} --> {msg}")
         self._show()
-        if not self.editbox.HasKeyboardFocus:
-            self.editbox.Click(simulateMove=False)
-
-        if at:
-            if isinstance(at, str):
-                at = [at]
-            for i in at:
-                self.editbox.SendKeys('@'+i)
-                atwnd = self.UiaAPI.PaneControl(ClassName='ChatContactMenu')
-                if atwnd.Exists(maxSearchSeconds=0.1):
-                    atwnd.SendKeys('{ENTER}')
-                    if msg and not msg.startswith('\n'):
-                        msg = '\n' + msg
-
-        t0 = time.time()
-        while True:
-            if time.time() - t0 > 10:
-                raise TimeoutError(f'发送消息超时 --> {self.who} - {msg}')
-            SetClipboardText(msg)
-            self.editbox.SendKeys('{Ctrl}v')
-            if self.editbox.GetValuePattern().Value:
-                break
-        self.editbox.SendKeys('{Enter}')
+        self._sendtext(self.editbox, msg, at=at)
 
+    @uilocked
     def SendFiles(self, filepath):
         """向当前聊天窗口发送文件
         
@@ -284,15 +614,12 @@ class ChatWnd(WeChatBase):
         if filelist:
             self._show()
             self.editbox.SendKeys('{Ctrl}a', waitTime=0)
-            t0 = time.time()
-            while True:
-                if time.time() - t0 > 10:
-                    raise TimeoutError(f'发送文件超时 --> {filelist}')
+            def paste():
                 SetClipboardFiles(filelist)
                 time.sleep(0.2)
                 self.editbox.SendKeys('{Ctrl}v')
-                if self.editbox.GetValuePattern().Value:
-                    break
+            with CLIPBOARD.preserve(WxParam.CLIPBOARD_RESTORE):
+                ConfirmInput(self.editbox, paste, error=f'发送文件超时 --> {filelist}')
             self.editbox.SendKeys('{Enter}')
             return True
         else:
@@ -311,8 +638,7 @@ class ChatWnd(WeChatBase):
             list: 聊天记录信息
         '''
         wxlog.debug(f"获取所有聊天记录：{self.who}")
-        MsgItems = self.C_MsgList.GetChildren()
-        msgs = self._getmsgs(MsgItems, savepic, savefile, savevoice)
+        msgs = self._getallmsgs(self.C_MsgList, savepic, savefile, savevoice)
         return msgs
     
     def GetNewMessage(self, savepic=False, savefile=False, savevoice=False):
@@ -328,19 +654,24 @@ class ChatWnd(WeChatBase):
         '''
         wxlog.debug(f"获取新聊天记录：{self.who}")
         if not self.usedmsgid:
-            self.usedmsgid = [i[-1] for i in self.GetAllMessage()]
+            msgids = self._getmsgids(self.C_MsgList.GetChildren(cacheRequest=LISTITEM_CACHE_REQUEST))
+            self.usedmsgid.update(msgids)
+            if self.store is not None:
+                self.store.addids(self.who, msgids, self.processkey)
             return []
-        MsgItems = self.C_MsgList.GetChildren()
-        NewMsgItems = [i for i in MsgItems if ''.join([str(i) for i in i.GetRuntimeId()]) not in self.usedmsgid]
+        NewMsgItems, msgids, _ = self._gettailmsgitems(self.C_MsgList, self.usedmsgid)
         if not NewMsgItems:
             return []
         newmsgs = self._getmsgs(NewMsgItems, savepic, savefile, savevoice)
-        self.usedmsgid = [i[-1] for i in self._getmsgs(MsgItems)]
+        self.usedmsgid.update(msgids)
+        if self.store is not None:
+            self.store.add(self.who, newmsgs, self.processkey)
         # if newmsgs[0].type == 'sys' and newmsgs[0].content == self._lang('查看更多消息'):
         #     newmsgs = newmsgs[1:]
         return newmsgs
 
     
+    @uilocked
     def LoadMoreMessage(self):
         """加载当前聊天页面更多聊天信息
         
@@ -366,6 +697,7 @@ class ChatWnd(WeChatBase):
         self.C_MsgList.WheelUp(wheelTimes=1, waitTime=0.1)
         return isload
 
+    @uilocked
     def GetGroupMembers(self):
         """获取当前聊天群成员
 
@@ -375,23 +707,18 @@ class ChatWnd(WeChatBase):
         wxlog.debug(f"获取当前聊天群成员：{self.who}")
         ele = self.UiaAPI.PaneControl(searchDepth=7, foundIndex=6).ButtonControl(Name='聊天信息')
         try:
-            uia.SetGlobalSearchTimeout(1)
-            rect = ele.BoundingRectangle
+            with uia.SearchTimeout(1):
+                rect = ele.BoundingRectangle
             Click(rect)
         except:
-            return 
-        finally:
-            uia.SetGlobalSearchTimeout(10)
+            return
         roominfoWnd = self.UiaAPI.WindowControl(ClassName='SessionChatRoomDetailWnd', searchDepth=1)
         more = roominfoWnd.ButtonControl(Name='查看更多', searchDepth=8)
         try:
-            uia.SetGlobalSearchTimeout(1)
-            rect = more.BoundingRectangle
-            Click(rect)
+            if more.Exists(1, waitEvents=WxParam.EVENT_WAIT):
+                Click(more.BoundingRectangle)
         except:
             pass
-        finally:
-            uia.SetGlobalSearchTimeout(10)
         members = [i.Name for i in roominfoWnd.ListControl(Name='聊天成员').GetChildren()]
         while members[-1] in ['添加', '移出']:
             members = members[:-1]
@@ -511,15 +838,19 @@ class TextElement:
         self._wx = wx
         chatname = wx.CurrentChat()
         self.ele = ele
-        self.sender = ele.ButtonControl(foundIndex=1, searchDepth=2)
-        _ = ele.GetFirstChildControl().GetChildren()[1].GetChildren()
+        snapshot = ele.Snapshot()
+        self.sender = snapshot.GetControl(snapshot.FindFirst(controlType='ButtonControl', maxDepth=2))
+        content = snapshot.FindByPath((0, 1))
+        if content is None:  # GetChildren(None)会返回根节点的子节点，不能让它读错子树
+            raise LookupError('找不到消息内容控件')
+        _ = snapshot.GetChildren(content)
         if len(_) == 1:
-            self.content = _[0].TextControl().Name
+            self.content = snapshot.FindFirst(controlType='TextControl', node=_[0]).Name
             self.chattype = 'friend'
             self.chatname = chatname
         else:
-            self.sender_remark = _[0].TextControl().Name
-            self.content = _[1].TextControl().Name
+            self.sender_remark = snapshot.FindFirst(controlType='TextControl', node=_[0]).Name
+            self.content = snapshot.FindFirst(controlType='TextControl', node=_[1]).Name
             self.chattype = 'group'
             numtext = re.findall(' \(\d+\)', chatname)[-1]
             self.chatname = chatname[:-len(numtext)]
@@ -539,12 +870,17 @@ class NewFriendsElement:
     def __init__(self, ele, wx):
         self._wx = wx
         self.ele = ele
-        self.name = self.ele.Name
-        self.msg = self.ele.GetFirstChildControl().PaneControl(SearchDepth=1).GetChildren()[-1].TextControl().Name
-        self.ele.GetChildren()[-1]
-        self.Status = self.ele.GetFirstChildControl().GetChildren()[-1]
+        snapshot = ele.Snapshot()
+        self.name = snapshot.root.Name
+        content = snapshot.FindByPath((0,))
+        if content is None:
+            raise LookupError('找不到好友申请内容控件')
+        msgpane = snapshot.FindFirst(controlType='PaneControl', node=content)
+        self.msg = snapshot.FindFirst(controlType='TextControl', node=snapshot.GetChildren(msgpane)[-1]).Name
+        status = snapshot.GetChildren(content)[-1]
+        self.Status = snapshot.GetControl(status)
         self.acceptable = False
-        if isinstance(self.Status, uia.ButtonControl):
+        if status.ControlType == uia.ControlType.ButtonControl:
             self.acceptable = True
 
     def __repr__(self) -> str:
@@ -666,24 +1002,156 @@ class ContactElement:
 
 class SessionElement:
     def __init__(self, item):
-        self.name = item.GetProgenyControl(4, control_type='TextControl').Name\
-            if item.GetProgenyControl(4, control_type='TextControl') else None
-        self.time = item.GetProgenyControl(4, 1, control_type='TextControl').Name\
-            if item.GetProgenyControl(4, 1, control_type='TextControl') else None
-        self.content = item.GetProgenyControl(4, 2, control_type='TextControl').Name\
-            if item.GetProgenyControl(4, 2, control_type='TextControl') else None
-        self.isnew = item.GetProgenyControl(2, 2) is not None
+        snapshot = item.Snapshot(maxDepth=4)
+        texts = [snapshot.GetProgeny(4, i, 'TextControl') for i in range(3)]
+        self.name, self.time, self.content = [i.Name if i else None for i in texts]
+        self.isnew = snapshot.GetProgeny(2, 2) is not None
         wxlog.debug(f"============== 【{self.name}】 ==============")
         wxlog.debug(f"最后一条消息时间: {self.time}")
         wxlog.debug(f"最后一条消息内容: {self.content}")
         wxlog.debug(f"是否有新消息: {self.isnew}")
 
 
+def SessionName(itemname, buttonname):
+    """聊天列表项对应的聊天对象名
+
+    列表项名称可能带有"N条新消息"等随客户端语言变化的后缀，因此取列表项中第一个按钮的名称，
+    按钮名为'SessionListItem'或没有按钮时才用列表项名称
+
+    Args:
+        itemname (str): 列表项名称
+        buttonname (str): 列表项中第一个按钮的名称，没有按钮时为None
+
+    Returns:
+        str: 聊天对象名
+    """
+    return itemname if buttonname in (None, 'SessionListItem') else buttonname
+
+
+class SessionIndex:
+    """聊天列表索引：聊天对象名 -> 列表项控件
+
+    一次快照读取所有列表项及其按钮的名称和位置建立索引，聊天对象名与GetSessionAmont一样由SessionName得到；
+    查找时只重新读取命中的列表项位置和按钮名称，名称或位置已变化（列表项被复用、滚出可见区域）才重建索引。
+    能订阅UIA结构变化事件时，事件计数作为代数，代数变化即视为索引失效；
+    事件在查找时先处理本线程待处理的COM消息再计数，不需要调用方另外处理消息
+
+    Args:
+        sessionlist (uia.ListControl): 聊天列表控件
+    """
+    def __init__(self, sessionlist):
+        self.sessionlist = sessionlist
+        self.generation = 0  # 每次重建索引加一
+        self._items = {}  # {聊天对象名: (列表项控件, 按钮控件或None)}
+        self._rect = None
+        self._eventcount = 0
+        self._waiter = uia.EventWaiter(sessionlist, uia.TreeScope.Children, eventIds=())  # 只订阅结构变化事件
+        self._subscribed = None  # None为尚未尝试订阅，订阅失败时只靠查找时的校验
+
+    def __del__(self):
+        try:
+            self.Close()
+        except Exception:
+            pass
+
+    def __repr__(self) -> str:
+        return f"<wxauto SessionIndex at {hex(id(self))} ({len(self._items)} sessions, generation {self.generation})>"
+
+    def __contains__(self, who):
+        return who in self._items
+
+    def _visible(self, rect):
+        return rect.width() != 0 and rect.height() != 0 and rect.bottom <= self._rect.bottom
+
+    def _stale(self):
+        """结构变化事件计数变化，说明列表项增删过"""
+        if self._subscribed is None:
+            self._subscribed = self._waiter.Start()
+            return True
+        if self._subscribed:
+            self._waiter.Pump()
+            if self._waiter.eventCount != self._eventcount:
+                self._eventcount = self._waiter.eventCount
+                return True
+        return False
+
+    def Invalidate(self):
+        """使索引失效，下次查找时重建"""
+        self._items = {}
+
+    def Close(self):
+        """取消事件订阅，之后查找时重新订阅"""
+        self._waiter.Stop()
+        self._subscribed = None
+
+    def Refresh(self):
+        """重建索引，返回可见的聊天对象名列表"""
+        self._rect = self.sessionlist.BoundingRectangle
+        self._items = {}
+        snapshot = self.sessionlist.Snapshot()
+        for node in snapshot.GetChildren():
+            if node.ControlTypeName != 'ListItemControl' or not self._visible(node.BoundingRectangle):
+                continue
+            button = snapshot.FindFirst(controlType='ButtonControl', node=node)
+            name = SessionName(node.name, button.name if button else None)
+            if name not in self._items:
+                self._items[name] = (snapshot.GetControl(node), snapshot.GetControl(button) if button else None)
+        self.generation += 1
+        return list(self._items)
+
+    def Get(self, who):
+        """查找当前可见的聊天列表项
+
+        Args:
+            who (str): 聊天对象名，完全匹配
+
+        Returns:
+            uia.ListItemControl: 列表项控件，不在可见的聊天列表中时返回None
+        """
+        if self._stale() or not self._items:
+            self.Refresh()
+        for _ in range(2):
+            found = self._items.get(who)
+            if found is None:
+                return None
+            item, button = found
+            try:
+                name = SessionName(item.Name, button.Name if button else None)
+                if name == who and self._visible(item.BoundingRectangle):
+                    return item
+            except Exception:
+                pass
+            self.Refresh()
+        return None
+
+
 class Message:
+    """消息基类，sender、content、id均保存在info中，msg[0]、msg[1]、msg[-1]与之对应
+
+    消息类使用__slots__，没有__dict__，不能给消息对象添加自定义属性（msg.tag = 1会抛出AttributeError），
+    需要附加数据时请以msg.id为键另存，或继承消息类时不声明__slots__
+    """
+    __slots__ = ('info', 'control')
     type = 'message'
 
     def __getitem__(self, index):
         return self.info[index]
+
+    @property
+    def sender(self):
+        return self.info[0]
+
+    @property
+    def content(self):
+        return self.info[1]
+
+    @content.setter
+    def content(self, value):
+        self.info[1] = value
+
+    @property
+    def id(self):
+        return self.info[-1]
     
     def __str__(self):
         return self.content
@@ -693,70 +1161,81 @@ class Message:
     
 
 class SysMessage(Message):
+    __slots__ = ('wx',)
     type = 'sys'
     
     def __init__(self, info, control, wx):
         self.info = info
         self.control = control
         self.wx = wx
-        self.sender = info[0]
-        self.content = info[1]
-        self.id = info[-1]
-        wxlog.debug(f"【系统消息】{self.content}")
+        if wxlog.isEnabledFor(logging.DEBUG):
+            wxlog.debug(f"【系统消息】{self.content}")
     
     # def __repr__(self):
     #     return f'<wxauto SysMessage at {hex(id(self))}>'
     
 
 class TimeMessage(Message):
+    __slots__ = ('wx', '_time')
     type = 'time'
     
     def __init__(self, info, control, wx):
         self.info = info
         self.control = control
         self.wx = wx
-        self.time = ParseWeChatTime(info[1])
-        self.sender = info[0]
-        self.content = info[1]
-        self.id = info[-1]
-        wxlog.debug(f"【时间消息】{self.time}")
+        self._time = None
+        if wxlog.isEnabledFor(logging.DEBUG):
+            wxlog.debug(f"【时间消息】{self.time}")
+
+    @property
+    def time(self):
+        if self._time is None:
+            self._time = ParseWeChatTime(self.info[1])
+        return self._time
     
     # def __repr__(self):
     #     return f'<wxauto TimeMessage at {hex(id(self))}>'
     
 
 class RecallMessage(Message):
+    __slots__ = ('wx',)
     type = 'recall'
     
     def __init__(self, info, control, wx):
         self.info = info
         self.control = control
         self.wx = wx
-        self.sender = info[0]
-        self.content = info[1]
-        self.id = info[-1]
-        wxlog.debug(f"【撤回消息】{self.content}")
+        if wxlog.isEnabledFor(logging.DEBUG):
+            wxlog.debug(f"【撤回消息】{self.content}")
     
     # def __repr__(self):
     #     return f'<wxauto RecallMessage at {hex(id(self))}>'
     
 
 class SelfMessage(Message):
+    __slots__ = ('_winobj', '_chatbox', 'media')
     type = 'self'
     
     def __init__(self, info, control, obj):
         self.info = info
         self.control = control
         self._winobj = obj
-        self.sender = info[0]
-        self.content = info[1]
-        self.id = info[-1]
-        self.chatbox = obj.ChatBox if hasattr(obj, 'ChatBox') else obj.UiaAPI
-        wxlog.debug(f"【自己消息】{self.content}")
+        self._chatbox = None
+        self.media = None  # WxParam.ASYNC_MEDIA为True时，图片、文件、语音消息的下载Future
+        if wxlog.isEnabledFor(logging.DEBUG):
+            wxlog.debug(f"【自己消息】{self.content}")
+
+    @property
+    def chatbox(self):
+        if self._chatbox is None:
+            obj = self._winobj
+            self._chatbox = obj.ChatBox if hasattr(obj, 'ChatBox') else obj.UiaAPI
+        return self._chatbox
     
     # def __repr__(self):
     #     return f'<wxauto SelfMessage at {hex(id(self))}>'
 
+    @uilocked
     def quote(self, msg):
         """引用该消息
 
@@ -774,22 +1253,20 @@ class SelfMessage(Message):
         headcontrol.RightClick(x=-xbias, simulateMove=False)
         menu = self._winobj.UiaAPI.MenuControl(ClassName='CMenuWnd')
         quote_option = menu.MenuItemControl(Name="引用")
-        if not quote_option.Exists(maxSearchSeconds=0.1):
+        if not quote_option.Exists(maxSearchSeconds=0.1, waitEvents=WxParam.EVENT_WAIT):
             wxlog.debug('该消息当前状态无法引用')
             return False
         quote_option.Click(simulateMove=False)
         editbox = self.chatbox.EditControl(searchDepth=15)
-        t0 = time.time()
-        while True:
-            if time.time() - t0 > 10:
-                raise TimeoutError(f'发送消息超时 --> {msg}')
+        def paste():
             SetClipboardText(msg)
             editbox.SendKeys('{Ctrl}v')
-            if editbox.GetValuePattern().Value.replace('\r￼', ''):
-                break
+        with CLIPBOARD.preserve(WxParam.CLIPBOARD_RESTORE):
+            ConfirmInput(editbox, paste, confirm=lambda value: value.replace('\r￼', ''), error=f'发送消息超时 --> {msg}')
         editbox.SendKeys('{Enter}')
         return True
     
+    @uilocked
     def forward(self, friend):
         """转发该消息
         
@@ -807,7 +1284,7 @@ class SelfMessage(Message):
         headcontrol.RightClick(x=-xbias, simulateMove=False)
         menu = self._winobj.UiaAPI.MenuControl(ClassName='CMenuWnd')
         forward_option = menu.MenuItemControl(Name="转发...")
-        if not forward_option.Exists(maxSearchSeconds=0.1):
+        if not forward_option.Exists(maxSearchSeconds=0.1, waitEvents=WxParam.EVENT_WAIT):
             wxlog.debug('该消息当前状态无法转发')
             return False
         forward_option.Click(simulateMove=False)
@@ -824,6 +1301,7 @@ class SelfMessage(Message):
             contactwnd.SendKeys('{Esc}')
             raise FriendNotFoundError(f'未找到好友：{friend}')
     
+    @uilocked
     def parse(self):
         """解析合并消息内容，当且仅当消息内容为合并转发的消息时有效"""
         wxlog.debug(f'解析合并消息内容：{self.sender} | {self.content}')
@@ -848,26 +1326,39 @@ class SelfMessage(Message):
         return msgs
 
 class FriendMessage(Message):
+    __slots__ = ('_winobj', '_chatbox', '_sender_remark', 'media')
     type = 'friend'
     
     def __init__(self, info, control, obj):
+        sender, sender_remark = info[0]
         self.info = info
         self.control = control
         self._winobj = obj
-        self.sender = info[0][0]
-        self.sender_remark = info[0][1]
-        self.content = info[1]
-        self.id = info[-1]
-        self.info[0] = info[0][0]
-        self.chatbox = obj.ChatBox if hasattr(obj, 'ChatBox') else obj.UiaAPI
-        if self.sender == self.sender_remark:
-            wxlog.debug(f"【好友消息】{self.sender}: {self.content}")
-        else:
-            wxlog.debug(f"【好友消息】{self.sender}({self.sender_remark}): {self.content}")
+        self._chatbox = None
+        self.media = None  # WxParam.ASYNC_MEDIA为True时，图片、文件、语音消息的下载Future
+        self._sender_remark = None if sender_remark == sender else sender_remark  # 与昵称相同时不单独保存
+        self.info[0] = sender
+        if wxlog.isEnabledFor(logging.DEBUG):
+            if self._sender_remark is None:
+                wxlog.debug(f"【好友消息】{self.sender}: {self.content}")
+            else:
+                wxlog.debug(f"【好友消息】{self.sender}({self.sender_remark}): {self.content}")
+
+    @property
+    def sender_remark(self):
+        return self.sender if self._sender_remark is None else self._sender_remark
+
+    @property
+    def chatbox(self):
+        if self._chatbox is None:
+            obj = self._winobj
+            self._chatbox = obj.ChatBox if hasattr(obj, 'ChatBox') else obj.UiaAPI
+        return self._chatbox
     
     # def __repr__(self):
     #     return f'<wxauto FriendMessage at {hex(id(self))}>'
 
+    @uilocked
     def quote(self, msg):
         """引用该消息
 
@@ -885,22 +1376,20 @@ class FriendMessage(Message):
         headcontrol.RightClick(x=xbias, simulateMove=False)
         menu = self._winobj.UiaAPI.MenuControl(ClassName='CMenuWnd')
         quote_option = menu.MenuItemControl(Name="引用")
-        if not quote_option.Exists(maxSearchSeconds=0.1):
+        if not quote_option.Exists(maxSearchSeconds=0.1, waitEvents=WxParam.EVENT_WAIT):
             wxlog.debug('该消息当前状态无法引用')
             return False
         quote_option.Click(simulateMove=False)
         editbox = self.chatbox.EditControl(searchDepth=15)
-        t0 = time.time()
-        while True:
-            if time.time() - t0 > 10:
-                raise TimeoutError(f'发送消息超时 --> {msg}')
+        def paste():
             SetClipboardText(msg)
             editbox.SendKeys('{Ctrl}v')
-            if editbox.GetValuePattern().Value.replace('\r￼', ''):
-                break
+        with CLIPBOARD.preserve(WxParam.CLIPBOARD_RESTORE):
+            ConfirmInput(editbox, paste, confirm=lambda value: value.replace('\r￼', ''), error=f'发送消息超时 --> {msg}')
         editbox.SendKeys('{Enter}')
         return True
     
+    @uilocked
     def forward(self, friend):
         """转发该消息
         
@@ -918,7 +1407,7 @@ class FriendMessage(Message):
         headcontrol.RightClick(x=xbias, simulateMove=False)
         menu = self._winobj.UiaAPI.MenuControl(ClassName='CMenuWnd')
         forward_option = menu.MenuItemControl(Name="转发...")
-        if not forward_option.Exists(maxSearchSeconds=0.1):
+        if not forward_option.Exists(maxSearchSeconds=0.1, waitEvents=WxParam.EVENT_WAIT):
             wxlog.debug('该消息当前状态无法转发')
             return False
         forward_option.Click(simulateMove=False)
@@ -935,6 +1424,7 @@ class FriendMessage(Message):
             contactwnd.SendKeys('{Esc}')
             raise FriendNotFoundError(f'未找到好友：{friend}')
     
+    @uilocked
     def parse(self):
         """解析合并消息内容，当且仅当消息内容为合并转发的消息时有效"""
         wxlog.debug(f'解析合并消息内容：{self.sender} | {self.content}')
@@ -0,0 +1,159 @@
+from . import uiautomation as uia
+from .utils import *
+import threading
+import queue
+import time
+
+
+class Listener:
+    """后台监听引擎
+
+    在独立线程中按计划轮询WeChat.listen中的聊天窗口（通过WeChat.AddListenChat添加），
+    每个聊天窗口按其pollinterval自适应间隔轮询：有新消息后回到最小间隔，空闲时逐步退避，
+    新消息交给该聊天的回调函数，没有回调时放入队列self.queue，元素为 (聊天窗口对象, 消息列表)；
+    等待期间AddListenChat、RemoveListenChat或stop会立即唤醒线程并重新计算轮询计划
+
+    Args:
+        wx (WeChat): 微信实例
+        callback (function, optional): 默认回调函数 callback(chat, msgs)，各聊天可用set_callback单独指定
+
+    Example:
+        >>> listener = Listener(wx, callback=lambda chat, msgs: print(chat.who, msgs))
+        >>> listener.start()
+        >>> ...
+        >>> listener.stop()
+    """
+    def __init__(self, wx, callback=None):
+        self.wx = wx
+        self.callback = callback
+        self.queue = queue.Queue()
+        self._callbacks = {}
+        self._stats = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()  # 停止或监听对象增减时置位
+        self._started = None
+
+    def __repr__(self) -> str:
+        return f"<wxauto Listener at {hex(id(self))} ({'running' if self.running else 'stopped'})>"
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def set_callback(self, who, callback):
+        """指定某个聊天的回调函数
+
+        Args:
+            who (str): 聊天对象名
+            callback (function): callback(chat, msgs)，为None时恢复使用默认回调
+        """
+        if callback is None:
+            self._callbacks.pop(who, None)
+        else:
+            self._callbacks[who] = callback
+
+    def start(self):
+        """启动监听线程"""
+        if self.running:
+            return
+        self._stop.clear()
+        self._wake.clear()
+        self.wx._listenwakes.add(self._wake)
+        self._started = time.time()
+        self._thread = threading.Thread(target=self._run, name='wxauto-listener', daemon=True)
+        self._thread.start()
+        wxlog.debug('监听线程已启动')
+
+    def stop(self, timeout=None):
+        """停止监听线程，等待当前一轮轮询结束
+
+        Args:
+            timeout (float, optional): 最多等待的秒数
+        """
+        self._stop.set()
+        self._wake.set()
+        self.wx._listenwakes.discard(self._wake)
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        wxlog.debug('监听线程已停止')
+
+    def stats(self, who=None):
+        """获取轮询统计
+
+        Args:
+            who (str, optional): 聊天对象名，为None时返回所有聊天
+
+        Returns:
+            dict: {聊天对象名: {'polls': 轮询次数, 'messages': 新消息数, 'errors': 出错次数,
+                'latency': 最近一次轮询耗时, 'avg_latency': 平均轮询耗时, 'max_latency': 最大轮询耗时,
+                'msg_per_sec': 每秒新消息数, 'interval': 当前轮询间隔, 'last_active': 最近一次有新消息的时间,
+                'skipped': 退避省下的轮询次数}}
+        """
+        elapsed = time.time() - self._started if self._started else 0
+        result = {}
+        for name, stat in list(self._stats.items()):
+            if who is not None and name != who:
+                continue
+            stat = dict(stat)
+            stat['avg_latency'] = stat.pop('total_latency') / stat['polls'] if stat['polls'] else 0
+            stat['msg_per_sec'] = stat['messages'] / elapsed if elapsed else 0
+            chat = self.wx.listen.get(name)
+            if chat is not None:
+                stat['interval'] = chat.pollinterval.interval
+                stat['last_active'] = chat.pollinterval.last_active
+                stat['skipped'] = chat.pollinterval.skipped
+            result[name] = stat
+        return result
+
+    def _schedule(self):
+        """返回下一个到期的聊天对象名及到期时间，没有监听对象时返回 (None, None)"""
+        listen = list(self.wx.listen.items())
+        if not listen:
+            return None, None
+        who, chat = min(listen, key=lambda i: i[1].pollinterval.next_poll)
+        return who, chat.pollinterval.next_poll
+
+    def _poll(self, who):
+        chat = self.wx.listen.get(who)
+        if chat is None:
+            return
+        stat = self._stats.setdefault(who, {'polls': 0, 'messages': 0, 'errors': 0, 'latency': 0, 'total_latency': 0, 'max_latency': 0})
+        t0 = time.time()
+        try:
+            with UI_LOCK:
+                msgs = chat.GetNewMessage(savepic=chat.savepic, savefile=chat.savefile, savevoice=chat.savevoice)
+        except Exception as e:
+            stat['errors'] += 1
+            wxlog.debug(f'监听轮询失败：{who} {e}')
+            msgs = []
+        latency = time.time() - t0
+        stat['polls'] += 1
+        stat['latency'] = latency
+        stat['total_latency'] += latency
+        stat['max_latency'] = max(stat['max_latency'], latency)
+        chat.pollinterval.update(bool(msgs))
+        if not msgs:
+            return
+        stat['messages'] += len(msgs)
+        callback = self._callbacks.get(who, self.callback)
+        if callback is None:
+            self.queue.put((chat, msgs))
+            return
+        try:
+            callback(chat, msgs)
+        except Exception as e:
+            wxlog.debug(f'监听回调出错：{who} {e}')
+
+    def _run(self):
+        initializer = uia.UIAutomationInitializerInThread()
+        while not self._stop.is_set():
+            who, due = self._schedule()
+            wait = None if due is None else due - time.time()
+            if wait is None or wait > 0:
+                if self._wake.wait(wait):
+                    self._wake.clear()
+                    continue  # 停止或监听对象有增减，重新计算轮询计划
+            self._poll(who)
+        del initializer
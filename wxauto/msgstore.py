@@ -0,0 +1,187 @@
+from .utils import *
+import threading
+import sqlite3
+import queue
+import time
+
+
+class MessageStore:
+    """本地消息库
+
+    按 (微信进程, 聊天对象, 消息id) 保存解析后的消息，并按时间、发送者建立索引；
+    写入先进入队列，由后台线程按批写入SQLite，不阻塞消息获取。
+    启动时可由msgids恢复已读消息id，不必再通过UIA读取已加载的全部消息。
+    消息id由控件的RuntimeId组成，微信重启后不再有效，也可能被新消息重复使用，
+    因此每条记录都带有微信进程标识（见GetProcessKey），只恢复同一进程记录的消息id
+
+    Args:
+        path (str): 数据库文件路径
+        batchsize (int, optional): 每批最多写入的条数
+        flushinterval (float, optional): 队列中的消息最多等待多久写入（秒）
+
+    Example:
+        >>> store = MessageStore('wxauto.db')
+        >>> wx = WeChat(store=store)
+        >>> store.query(chat='文件传输助手', limit=10)
+    """
+    _SCHEMA = [
+        """CREATE TABLE IF NOT EXISTS messages (
+            chat TEXT NOT NULL,
+            msgid TEXT NOT NULL,
+            type TEXT,
+            sender TEXT,
+            content TEXT,
+            time REAL NOT NULL,
+            process TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (process, chat, msgid)
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_messages_time ON messages (chat, time)",
+        "CREATE INDEX IF NOT EXISTS idx_messages_sender ON messages (chat, sender)",
+    ]
+
+    def __init__(self, path, batchsize=100, flushinterval=1):
+        self.path = path
+        self.batchsize = batchsize
+        self.flushinterval = flushinterval
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        for sql in self._SCHEMA:
+            self._conn.execute(sql)
+        self._conn.commit()
+        self._thread = threading.Thread(target=self._run, name='wxauto-msgstore', daemon=True)
+        self._thread.start()
+
+    def __repr__(self) -> str:
+        return f"<wxauto MessageStore at {hex(id(self))} ({self.path})>"
+
+    def add(self, chat, msgs, process=None):
+        """记录消息，立即返回，由后台线程写入
+
+        Args:
+            chat (str): 聊天对象名
+            msgs (list): 消息对象列表
+            process (str, optional): 微信进程标识，见GetProcessKey
+        """
+        if not chat:
+            wxlog.debug('聊天对象名为空，消息不写入消息库')
+            return
+        now = time.time()
+        for msg in msgs:
+            self._queue.put((chat, str(msg.id), msg.type, msg.sender, msg.content, now, process or ''))
+
+    def addids(self, chat, msgids, process=None):
+        """只记录已读消息id，用于启动时恢复
+
+        Args:
+            chat (str): 聊天对象名
+            msgids (list): 消息id列表
+            process (str, optional): 微信进程标识，见GetProcessKey
+        """
+        if not chat:
+            return
+        now = time.time()
+        for msgid in msgids:
+            self._queue.put((chat, str(msgid), None, None, None, now, process or ''))
+
+    def msgids(self, chat, process, limit=1000):
+        """按记录顺序返回某个聊天最近的消息id，只返回同一微信进程记录的
+
+        Args:
+            chat (str): 聊天对象名
+            process (str): 微信进程标识，见GetProcessKey，为None（未知）时返回空列表
+            limit (int, optional): 最多返回的数量
+
+        Returns:
+            list: MessageId列表，按记录先后排列
+        """
+        if not chat or not process:
+            return []
+        sql = 'SELECT msgid FROM messages WHERE process=? AND chat=? ORDER BY rowid DESC LIMIT ?'
+        with self._lock:
+            rows = self._conn.execute(sql, (process, chat, limit)).fetchall()
+        return [MessageId.FromString(i[0]) for i in reversed(rows)]
+
+    def query(self, chat=None, sender=None, since=None, until=None, limit=100):
+        """查询已记录的消息
+
+        Args:
+            chat (str, optional): 聊天对象名
+            sender (str, optional): 发送者
+            since (float, optional): 起始时间戳
+            until (float, optional): 结束时间戳
+            limit (int, optional): 最多返回的数量
+
+        Returns:
+            list: [{'chat', 'id', 'type', 'sender', 'content', 'time'}]，按时间先后排列
+        """
+        where, args = ['type IS NOT NULL'], []
+        for column, op, value in (('chat', '=', chat), ('sender', '=', sender), ('time', '>=', since), ('time', '<=', until)):
+            if value is not None:
+                where.append(f'{column}{op}?')
+                args.append(value)
+        sql = f"SELECT chat, msgid, type, sender, content, time FROM messages WHERE {' AND '.join(where)} ORDER BY time DESC, rowid DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(sql, args + [limit]).fetchall()
+        keys = ('chat', 'id', 'type', 'sender', 'content', 'time')
+        return [dict(zip(keys, row)) for row in reversed(rows)]
+
+    def flush(self):
+        """等待队列中的消息全部写入"""
+        self._queue.join()
+
+    def close(self):
+        """写入剩余消息并关闭数据库"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        with self._lock:
+            self._conn.close()
+
+    # 同一进程中消息id再次出现在新消息里说明RuntimeId被重复使用，覆盖旧记录；只记录id时不覆盖已有记录
+    _INSERT_MSG = 'INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?)'
+    _INSERT_ID = 'INSERT OR IGNORE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?)'
+
+    def _write(self, rows):
+        """按批写入；整批失败时回滚并逐条重写，一条坏记录不会连累同批的其他消息"""
+        with self._lock:
+            try:
+                self._conn.executemany(self._INSERT_MSG, [i for i in rows if i[2] is not None])
+                self._conn.executemany(self._INSERT_ID, [i for i in rows if i[2] is None])
+                self._conn.commit()
+                return
+            except sqlite3.Error as e:
+                self._conn.rollback()
+                wxlog.debug(f'批量写入失败，逐条重写：{e}')
+            for row in rows:
+                try:
+                    self._conn.execute(self._INSERT_ID if row[2] is None else self._INSERT_MSG, row)
+                except sqlite3.Error as e:
+                    wxlog.debug(f'消息写入失败：{e} {row}')
+            self._conn.commit()
+
+    def _run(self):
+        while True:
+            row = self._queue.get()
+            rows = [row]
+            deadline = time.time() + self.flushinterval
+            while row is not None and len(rows) < self.batchsize:
+                try:
+                    row = self._queue.get(timeout=max(deadline - time.time(), 0))
+                except queue.Empty:
+                    break
+                rows.append(row)
+            batch = [i for i in rows if i is not None]
+            try:
+                if batch:
+                    self._write(batch)
+            except Exception as e:
+                wxlog.debug(f'消息写入失败：{e}')
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+            if row is None or rows[-1] is None:
+                break
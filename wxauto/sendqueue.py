@@ -0,0 +1,197 @@
+from . import uiautomation as uia
+from .utils import *
+from .elements import WxParam, ChatWnd
+from concurrent.futures import Future
+import collections
+import threading
+import time
+
+
+class SendReceipt:
+    """发送回执
+
+    Attributes:
+        who (str): 聊天对象名
+        msg (str): 发送的文本消息
+        queued (float): 在队列中等待的秒数
+        onscreen (float): 在界面上输入并发送的秒数
+        confirm (float): 其中粘贴后确认编辑框收到内容的秒数
+        sent (float): 发送完成的时间戳
+    """
+    __slots__ = ('who', 'msg', 'queued', 'onscreen', 'confirm', 'sent')
+
+    def __init__(self, who, msg, queued, onscreen, confirm, sent):
+        self.who = who
+        self.msg = msg
+        self.queued = queued
+        self.onscreen = onscreen
+        self.confirm = confirm
+        self.sent = sent
+
+    def __repr__(self) -> str:
+        return f"<wxauto SendReceipt {self.who} (queued {self.queued:.3f}s, onscreen {self.onscreen:.3f}s)>"
+
+
+class SendQueue:
+    """发送队列
+
+    待发送的消息按聊天对象分组，由后台线程逐组发送：同一聊天的连续消息只切换一次聊天、定位一次编辑框；
+    全局与每个聊天分别按令牌桶限速，令牌不足的聊天让给其他聊天，该组剩余消息留到下一轮；
+    下一轮仍是同一聊天且窗口仍在前台、未切换到其他聊天时，沿用上一轮定位的窗口和编辑框
+
+    Args:
+        wx (WeChat): 微信实例
+        rate (float, optional): 全局每秒最多发送的消息数，默认WxParam.SEND_RATE，为0时不限速
+        burst (int, optional): 全局可连续发送的消息数，默认WxParam.SEND_BURST
+        chat_rate (float, optional): 同一聊天每秒最多发送的消息数，默认WxParam.SEND_CHAT_RATE，为0时不限速
+        chat_burst (int, optional): 同一聊天可连续发送的消息数，默认WxParam.SEND_CHAT_BURST
+
+    Example:
+        >>> sq = SendQueue(wx)
+        >>> futures = [sq.put(f'第{i}条', '文件传输助手') for i in range(5)]
+        >>> [f.result() for f in futures]
+    """
+    def __init__(self, wx, rate=None, burst=None, chat_rate=None, chat_burst=None):
+        self.wx = wx
+        self.bucket = TokenBucket(WxParam.SEND_RATE if rate is None else rate,
+                                  WxParam.SEND_BURST if burst is None else burst)
+        self._chat_rate = WxParam.SEND_CHAT_RATE if chat_rate is None else chat_rate
+        self._chat_burst = WxParam.SEND_CHAT_BURST if chat_burst is None else chat_burst
+        self._buckets = {}
+        self._pending = {}  # {聊天对象名: deque}，按最早排队的先后顺序
+        self._chats = {}
+        self._last = None  # 上一轮定位的 (聊天对象名, 窗口对象, 编辑框)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    def __repr__(self) -> str:
+        return f"<wxauto SendQueue at {hex(id(self))} ({self.pending} pending)>"
+
+    @property
+    def pending(self):
+        """排队中的消息数量"""
+        with self._cond:
+            return sum(len(i) for i in self._pending.values())
+
+    def put(self, msg, who=None, at=None):
+        """加入一条待发送的文本消息
+
+        Args:
+            msg (str): 要发送的文本消息
+            who (str, optional): 要发送给谁，为None时发送到主窗口当前聊天页面
+            at (str|list, optional): 要@的人
+
+        Returns:
+            Future: 结果为SendReceipt，发送失败时抛出对应异常
+        """
+        future = Future()
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name='wxauto-sendqueue', daemon=True)
+                self._thread.start()
+            self._pending.setdefault(who, collections.deque()).append((msg, at, future, time.time()))
+            self._cond.notify()
+        return future
+
+    def stop(self, wait=True):
+        """发送完已排队的消息后停止线程"""
+        with self._cond:
+            thread = self._thread
+            if thread is None:
+                return
+            self._stopping = True
+            self._thread = None
+            self._cond.notify()
+        if wait:
+            thread.join()
+
+    def _chatbucket(self, who):
+        if who not in self._buckets:
+            self._buckets[who] = TokenBucket(self._chat_rate, self._chat_burst)
+        return self._buckets[who]
+
+    def _next(self):
+        """返回 (下一个可发送的聊天对象名, 需等待的秒数)"""
+        delays = [(self._chatbucket(who).delay(), who) for who in self._pending]
+        delay, who = min(delays, key=lambda i: i[0])
+        return who, max(delay, self.bucket.delay())
+
+    def _take(self, who):
+        """令牌足够时取出该聊天的下一条消息"""
+        with self._cond:
+            items = self._pending.get(who)
+            chatbucket = self._chatbucket(who)
+            if not items or self.bucket.delay() or chatbucket.delay():
+                return None
+            self.bucket.acquire()
+            chatbucket.acquire()
+            item = items.popleft()
+            if not items:
+                del self._pending[who]
+            return item
+
+    def _target(self, who):
+        """定位发送目标，返回 (窗口对象, 编辑框)，已单独打开的聊天窗口优先，优先复用监听中的聊天窗口对象"""
+        if who and FindWindow(name=who, classname='ChatWnd'):
+            chat = self.wx.listen.get(who) or self._chats.get(who)
+            if chat is None:
+                chat = self._chats[who] = ChatWnd(who, self.wx.language, seed=False)  # 只用于发送，不读取已有消息
+            chat._show()
+            return chat, chat.editbox
+        self._chats.pop(who, None)
+        editbox = self.wx._geteditbox(who)
+        self.wx._show()
+        return self.wx, editbox
+
+    def _resolved(self, who):
+        """上一轮定位的发送目标仍可直接使用时返回 (窗口对象, 编辑框)，否则返回None"""
+        if self._last is None or self._last[0] != who:
+            return None
+        _, target, editbox = self._last
+        if win32gui.GetForegroundWindow() != target.HWND:  # 窗口已被切走或关闭
+            return None
+        if target is self.wx and who and who not in (self.wx.CurrentChat() or ''):  # 主窗口已切换到其他聊天
+            return None
+        return target, editbox
+
+    def _burst(self, who):
+        """持有UI_LOCK连续发送同一聊天的消息，直到该聊天没有消息或令牌不足"""
+        with UI_LOCK:
+            target, editbox = self._resolved(who) or (None, None)
+            while True:
+                item = self._take(who)
+                if item is None:
+                    return
+                msg, at, future, queued = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                t0 = time.time()
+                try:
+                    if editbox is None:
+                        target, editbox = self._target(who)
+                    confirm = target._sendtext(editbox, msg, clear=True, at=at)
+                except Exception as e:
+                    wxlog.debug(f'发送队列发送失败：{who} {e}')
+                    future.set_exception(e)
+                    editbox = self._last = None  # 下一条消息重新定位
+                    continue
+                self._last = (who, target, editbox)
+                t1 = time.time()
+                future.set_result(SendReceipt(who, msg, t0 - queued, t1 - t0, confirm, t1))
+
+    def _run(self):
+        initializer = uia.UIAutomationInitializerInThread()
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if not self._pending:
+                    break
+                who, delay = self._next()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+            self._burst(who)
+        del initializer
@@ -17,7 +17,9 @@ import sys
 import time
 import datetime
 import re
+import json
 import threading
+import collections
 import ctypes
 import ctypes.wintypes
 import comtypes #need pip install comtypes
@@ -36,6 +38,10 @@ OPERATION_WAIT_TIME = 0.5
 MAX_PATH = 260
 DEBUG_SEARCH_TIME = False
 DEBUG_EXIST_DISAPPEAR = False
+USE_NATIVE_SEARCH = True  # use IUIAutomationElement::FindFirst/FindAll if searchProperties can be translated into conditions
+USE_PATH_MEMO = True  # remember the child index path of search results and try it before native or walker search next time, only for locators identified by Name, AutomationId or ClassName
+USE_EVENT_WAIT = False  # Exists and Disappears wake up on UI Automation events instead of sleeping SEARCH_INTERVAL
+TRAVERSE_STRATEGY = 0  # default TraverseStrategy of walker searches, 0 is TraverseStrategy.DepthFirst
 S_OK = 0
 
 IsNT6orHigher = os.sys.getwindowsversion().major >= 6
@@ -830,6 +836,54 @@ class NavigateDirection:
     LastChild = 4
 
 
+class TreeScope:
+    """
+    TreeScope from IUIAutomation.
+    Refer https://docs.microsoft.com/en-us/windows/desktop/api/uiautomationclient/ne-uiautomationclient-treescope
+    """
+    None_ = 0
+    Element = 1
+    Children = 2
+    Descendants = 4
+    Parent = 8
+    Ancestors = 16
+    Subtree = 7
+
+
+class TraverseStrategy:
+    """
+    The order in which the walker visits controls when a search can not be done natively, see `FindControl`.
+    DepthFirst: dive into the first child before visiting siblings, good for deep targets.
+    BreadthFirst: visit controls level by level, good for shallow targets in wide trees.
+    IterativeDeepening: depth first walks with depth limit 1, 2, ... up to searchDepth,
+        visits controls in the same order as BreadthFirst but only keeps one path in memory.
+    """
+    DepthFirst = 0
+    BreadthFirst = 1
+    IterativeDeepening = 2
+
+
+class EventId:
+    """
+    EventId from IUIAutomation.
+    Refer https://docs.microsoft.com/en-us/windows/win32/winauto/uiauto-event-ids
+    """
+    ToolTipOpenedEventId = 20000
+    ToolTipClosedEventId = 20001
+    StructureChangedEventId = 20002
+    MenuOpenedEventId = 20003
+    AutomationPropertyChangedEventId = 20004
+    AutomationFocusChangedEventId = 20005
+    AsyncContentLoadedEventId = 20006
+    MenuClosedEventId = 20007
+    LayoutInvalidatedEventId = 20008
+    Invoke_InvokedEventId = 20009
+    Window_WindowOpenedEventId = 20016
+    Window_WindowClosedEventId = 20017
+    MenuModeStartEventId = 20018
+    MenuModeEndEventId = 20019
+
+
 class DockPosition:
     """
     DockPosition from IUIAutomation.
@@ -2260,6 +2314,16 @@ def IsZoomed(handle: int) -> bool:
     return bool(ctypes.windll.user32.IsZoomed(ctypes.c_void_p(handle)))
 
 
+def IsWindow(handle: int) -> bool:
+    """
+    IsWindow from Win32.
+    Determine whether a native window handle identifies an existing window.
+    handle: int, the handle of a native window.
+    Return bool.
+    """
+    return bool(ctypes.windll.user32.IsWindow(ctypes.c_void_p(handle)))
+
+
 def IsWindowVisible(handle: int) -> bool:
     """
     IsWindowVisible from Win32.
@@ -5264,15 +5328,831 @@ def CreatePattern(patternId: int, pattern: ctypes.POINTER(comtypes.IUnknown)):
         return PatternConstructors[patternId](pattern=subPattern)
 
 
+class CacheRequest():
+    """
+    Wraps IUIAutomationCacheRequest.
+    Controls created with a CacheRequest have their chosen properties and runtime id fetched in one batched call,
+    `Control.Name`, `Control.ControlType`, `Control.ClassName`, `Control.AutomationId`, `Control.BoundingRectangle`
+    and `Control.GetRuntimeId` serve the cached values until `Control.RefreshCache` is called.
+    Refer https://docs.microsoft.com/en-us/windows/desktop/api/uiautomationclient/nn-uiautomationclient-iuiautomationcacherequest
+
+    cacheRequest = CacheRequest([PropertyId.NameProperty, PropertyId.BoundingRectangleProperty])
+    for child in control.GetChildren(cacheRequest=cacheRequest):
+        print(child.Name, child.BoundingRectangle, child.GetRuntimeId())
+    """
+    DefaultPropertyIds = (
+        PropertyId.ControlTypeProperty,
+        PropertyId.ClassNameProperty,
+        PropertyId.AutomationIdProperty,
+        PropertyId.NameProperty,
+        PropertyId.BoundingRectangleProperty,
+    )
+
+    def __init__(self, propertyIds: Iterable[int] = None, treeScope: int = TreeScope.Element):
+        """
+        propertyIds: Iterable[int], values in class `PropertyId`, if None, use `CacheRequest.DefaultPropertyIds`.
+            PropertyId.ControlTypeProperty and PropertyId.RuntimeIdProperty are always cached.
+        treeScope: int, a value in class `TreeScope`.
+        The COM object is created on first use, so a CacheRequest can be defined at module level.
+        """
+        propertyIds = set(CacheRequest.DefaultPropertyIds if propertyIds is None else propertyIds)
+        propertyIds.add(PropertyId.ControlTypeProperty)
+        propertyIds.add(PropertyId.RuntimeIdProperty)
+        self.propertyIds = frozenset(propertyIds)
+        self.treeScope = treeScope
+        self._cacheRequest = None
+
+    @property
+    def Request(self):
+        """
+        Property Request.
+        Return `ctypes.POINTER(IUIAutomationCacheRequest)`.
+        """
+        if self._cacheRequest is None:
+            automation = _AutomationClient.instance().IUIAutomation
+            cacheRequest = automation.CreateCacheRequest()
+            for propertyId in self.propertyIds:
+                cacheRequest.AddProperty(propertyId)
+            cacheRequest.TreeScope = self.treeScope
+            cacheRequest.TreeFilter = automation.RawViewCondition
+            self._cacheRequest = cacheRequest
+        return self._cacheRequest
+
+
+RAW_VIEW_CACHE_REQUEST = CacheRequest([])  # only ControlType and RuntimeId are cached, used to search native in the raw view
+
+
+class SnapshotNode():
+    """
+    A control captured by `Control.Snapshot`.
+    Reading its properties does not cause any COM call, the properties are read only.
+    """
+    __slots__ = ('controlType', 'className', 'name', 'rect', 'runtimeId', 'depth', 'parent', 'children', 'element')
+
+    def __init__(self, controlType: int, className: str, name: str, rect: Tuple[int, int, int, int], runtimeId: Tuple[int, ...],
+                 depth: int, parent: int, element=None):
+        self.controlType = controlType
+        self.className = className
+        self.name = name
+        self.rect = rect
+        self.runtimeId = runtimeId
+        self.depth = depth
+        self.parent = parent  # index of parent node in snapshot, -1 for root
+        self.children = []  # indices of child nodes in snapshot
+        self.element = element
+
+    def __repr__(self) -> str:
+        return '<SnapshotNode {} {!r} depth={}>'.format(self.ControlTypeName, self.name, self.depth)
+
+    @property
+    def ControlType(self) -> int:
+        return self.controlType
+
+    @property
+    def ControlTypeName(self) -> str:
+        return ControlTypeNames.get(self.controlType, '')
+
+    @property
+    def ClassName(self) -> str:
+        return self.className
+
+    @property
+    def Name(self) -> str:
+        return self.name
+
+    @property
+    def BoundingRectangle(self) -> Rect:
+        return Rect(*self.rect) if self.rect else Rect()
+
+    def GetRuntimeId(self) -> List[int]:
+        return list(self.runtimeId) if self.runtimeId else []
+
+
+class ControlSnapshot():
+    """
+    An immutable subtree captured by `Control.Snapshot`.
+    Nodes are stored in the same order as `WalkControl`(depth first), the root node is at index 0.
+    All queries run in memory without COM calls, use `GetControl` to get a live `Control` from a node.
+
+    snapshot = control.Snapshot(maxDepth=4)
+    for node in snapshot.FindByType(ControlType.TextControl):
+        print(node.Name, node.BoundingRectangle)
+    """
+    def __init__(self, nodes: List[SnapshotNode]):
+        self.nodes = nodes
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def __getitem__(self, index: int) -> SnapshotNode:
+        return self.nodes[index]
+
+    @property
+    def root(self) -> SnapshotNode:
+        return self.nodes[0]
+
+    def GetChildren(self, node: SnapshotNode = None) -> List[SnapshotNode]:
+        """
+        node: `SnapshotNode`, if None, use root.
+        Return List[SnapshotNode].
+        """
+        node = node or self.nodes[0]
+        return [self.nodes[i] for i in node.children]
+
+    def GetParent(self, node: SnapshotNode) -> SnapshotNode:
+        """Return `SnapshotNode` or None."""
+        return self.nodes[node.parent] if node.parent >= 0 else None
+
+    def GetControl(self, node: SnapshotNode) -> 'Control':
+        """
+        Return a live `Control` subclass of node, the control reads current property values.
+        """
+        return Control.CreateControlFromElement(node.element)
+
+    def WalkNodes(self, node: SnapshotNode = None, includeTop: bool = False, maxDepth: int = 0xFFFFFFFF):
+        """
+        node: `SnapshotNode`, if None, use root.
+        includeTop: bool, if True, yield node first.
+        maxDepth: int, depth relative to node.
+        Yield 2 items tuple (node: SnapshotNode, depth: int) in depth first order.
+        """
+        node = node or self.nodes[0]
+        if includeTop:
+            yield node, 0
+        stack = [(self.nodes[i], 1) for i in reversed(node.children)]
+        while stack:
+            child, depth = stack.pop()
+            yield child, depth
+            if depth < maxDepth:
+                stack.extend((self.nodes[i], depth + 1) for i in reversed(child.children))
+
+    def FindAll(self, controlType=None, className: str = None, name: str = None, subName: str = None, regexName: str = None,
+                node: SnapshotNode = None, maxDepth: int = 0xFFFFFFFF) -> List[SnapshotNode]:
+        """
+        Find descendants of node that match all the given conditions, node itself is not compared, the same as `Control` searching.
+        controlType: int or str, a value in class `ControlType` or a control type name such as 'TextControl'.
+        className: str.
+        name: str.
+        subName: str, a part str in Name.
+        regexName: str, supports regex using re.match.
+        node: `SnapshotNode`, if None, use root.
+        maxDepth: int, depth relative to node.
+        Return List[SnapshotNode].
+        """
+        if isinstance(controlType, str):
+            controlType = getattr(ControlType, controlType)
+        regex = re.compile(regexName) if regexName else None
+        found = []
+        for child, _ in self.WalkNodes(node, False, maxDepth):
+            if controlType is not None and child.controlType != controlType:
+                continue
+            if className is not None and child.className != className:
+                continue
+            if name is not None and child.name != name:
+                continue
+            if subName is not None and subName not in (child.name or ''):
+                continue
+            if regex and not regex.match(child.name or ''):
+                continue
+            found.append(child)
+        return found
+
+    def FindFirst(self, controlType=None, className: str = None, name: str = None, subName: str = None, regexName: str = None,
+                  node: SnapshotNode = None, maxDepth: int = 0xFFFFFFFF, foundIndex: int = 1) -> SnapshotNode:
+        """
+        Same as `FindAll`, foundIndex: int, starts with 1, >= 1.
+        Return `SnapshotNode` or None.
+        """
+        found = self.FindAll(controlType, className, name, subName, regexName, node, maxDepth)
+        if foundIndex <= len(found):
+            return found[foundIndex - 1]
+
+    def FindByType(self, controlType, node: SnapshotNode = None) -> List[SnapshotNode]:
+        return self.FindAll(controlType=controlType, node=node)
+
+    def FindByName(self, name: str, node: SnapshotNode = None) -> List[SnapshotNode]:
+        return self.FindAll(name=name, node=node)
+
+    def FindByRegex(self, regexName: str, node: SnapshotNode = None) -> List[SnapshotNode]:
+        return self.FindAll(regexName=regexName, node=node)
+
+    def FindByPath(self, path: Iterable[int], node: SnapshotNode = None) -> SnapshotNode:
+        """
+        path: Iterable[int], child indices from node, negative index is supported, such as (0, 1, -1).
+        node: `SnapshotNode`, if None, use root.
+        Return `SnapshotNode` or None.
+        """
+        node = node or self.nodes[0]
+        for index in path:
+            try:
+                node = self.nodes[node.children[index]]
+            except IndexError:
+                return None
+        return node
+
+    def GetProgeny(self, depth: int = 1, index: int = 0, controlType=None, node: SnapshotNode = None) -> SnapshotNode:
+        """
+        Get the nth node in the mth depth, the same as `Control.GetProgenyControl`.
+        depth: int, starts with 0.
+        index: int, starts with 0.
+        controlType: int or str, if not None, only return the nth node that matches the controlType.
+        Return `SnapshotNode` or None.
+        """
+        if isinstance(controlType, str):
+            controlType = getattr(ControlType, controlType)
+        count = 0
+        for child, childDepth in self.WalkNodes(node, True, depth):
+            if childDepth != depth:
+                continue
+            if controlType is not None and child.controlType != controlType:
+                continue
+            if count == index:
+                return child
+            count += 1
+
+
+class ProgenyIndex():
+    """
+    Level index of a control's progeny, built breadth first and only as far as the lookups need.
+    Several lookups on the same index share one traversal, use `Control.GetProgenyIndex` to create it.
+
+    progeny = control.GetProgenyIndex()
+    name = progeny.GetControl(4, 0, 'TextControl')
+    time = progeny.GetControl(4, 1, 'TextControl')
+    """
+    def __init__(self, control: 'Control', cacheRequest: CacheRequest = None):
+        self.control = control
+        self.cacheRequest = cacheRequest
+        self.levels = [[control], []]  # levels[-1] is the level being collected, others are complete
+        self.traverseCount = 0
+        self._parentIndex = 0
+        self._lastChild = None
+        self._exhausted = False
+
+    def _Next(self) -> bool:
+        """
+        Collect one more control in breadth first order.
+        Return bool, False if there is no more progeny.
+        """
+        while not self._exhausted:
+            parents = self.levels[-2]
+            if self._parentIndex >= len(parents):
+                if not self.levels[-1]:
+                    self._exhausted = True
+                    break
+                self.levels.append([])
+                self._parentIndex = 0
+                self._lastChild = None
+                continue
+            if self._lastChild is None:
+                child = parents[self._parentIndex].GetFirstChildControl(self.cacheRequest)
+            else:
+                child = self._lastChild.GetNextSiblingControl(self.cacheRequest)
+            if child:
+                self.traverseCount += 1
+                self._lastChild = child
+                self.levels[-1].append(child)
+                return True
+            self._parentIndex += 1
+            self._lastChild = None
+        return False
+
+    def GetLevel(self, depth: int) -> List['Control']:
+        """
+        depth: int, starts with 0.
+        Return List[Control], all controls in depth.
+        """
+        while depth >= len(self.levels) - 1 and self._Next():
+            pass
+        return self.levels[depth] if depth < len(self.levels) else []
+
+    def GetControl(self, depth: int = 1, index: int = 0, control_type: str = None) -> 'Control':
+        """
+        Get the nth control in the mth depth, stop traversing as soon as it is found.
+        depth: int, starts with 0.
+        index: int, starts with 0.
+        control_type: str, control type name such as 'TextControl', if not None, only return the nth control that matches the control_type.
+        Return `Control` subclass or None.
+        """
+        found = -1
+        position = 0
+        while True:
+            if depth < len(self.levels):
+                level = self.levels[depth]
+                while position < len(level):
+                    control = level[position]
+                    position += 1
+                    if not control_type or control.ControlTypeName == control_type:
+                        found += 1
+                        if found == index:
+                            return control
+                if depth < len(self.levels) - 1:
+                    return None
+            if not self._Next():
+                if depth >= len(self.levels) or position >= len(self.levels[depth]):
+                    return None
+
+
+class SearchPlan():
+    """
+    searchProperties compiled into an ordered list of checks, used by `Control._CompareFunction`.
+    Cheap and selective checks run first: Depth, ControlType, AutomationId, ClassName, then Name/SubName/RegexName
+    which share one Name read, then Compare. Every property is read at most once for a visited control.
+    The plan counts visited and matched controls, property reads and rejections per check.
+    """
+    StageOrder = ('Depth', 'ControlType', 'AutomationId', 'ClassName', 'Name', 'SubName', 'RegexName', 'Compare')
+
+    def __init__(self, searchProperties: Dict[str, Any], regexName=None):
+        """
+        searchProperties: dict, same as searchProperties in `Control.__init__`.
+        regexName: compiled regex of RegexName, if None, compile searchProperties['RegexName'].
+        """
+        self.stages = []
+        nameChecks = []
+        for key in SearchPlan.StageOrder:
+            if key not in searchProperties:
+                continue
+            value = searchProperties[key]
+            if key == 'Depth':
+                self.stages.append((key, lambda control, depth, value=value: value == depth))
+            elif key == 'ControlType':
+                self.stages.append((key, self._PropertyCheck('ControlType', value)))
+            elif key == 'AutomationId':
+                self.stages.append((key, self._PropertyCheck('AutomationId', value)))
+            elif key == 'ClassName':
+                self.stages.append((key, self._PropertyCheck('ClassName', value)))
+            elif key == 'Name':
+                nameChecks.append((key, lambda name, value=value: value == name))
+            elif key == 'SubName':
+                nameChecks.append((key, lambda name, value=value: value in name))
+            elif key == 'RegexName':
+                regex = regexName or re.compile(value)
+                nameChecks.append((key, lambda name, regex=regex: regex.match(name) is not None))
+            elif key == 'Compare':
+                self.stages.append((key, value))
+        if nameChecks:
+            self.nameChecks = nameChecks
+            index = len(self.stages) - 1 if 'Compare' in searchProperties else len(self.stages)
+            self.stages.insert(index, ('Name', self._CheckName))
+        self.ResetStats()
+
+    def _PropertyCheck(self, propertyName: str, value) -> Callable[['Control', int], bool]:
+        def check(control: 'Control', depth: int) -> bool:
+            self.propertyReads += 1
+            return value == getattr(control, propertyName)
+        return check
+
+    def _CheckName(self, control: 'Control', depth: int) -> bool:
+        self.propertyReads += 1
+        name = control.Name
+        for key, check in self.nameChecks:
+            if not check(name):
+                self._rejectedKey = key
+                return False
+        return True
+
+    def Match(self, control: 'Control', depth: int) -> bool:
+        """
+        control: `Control` or its subclass.
+        depth: int, tree depth from searchFromControl.
+        Return bool.
+        """
+        self.visited += 1
+        for key, check in self.stages:
+            if not check(control, depth):
+                if self._rejectedKey:
+                    key = self._rejectedKey
+                    self._rejectedKey = None
+                self.rejected[key] = self.rejected.get(key, 0) + 1
+                return False
+        self.matched += 1
+        return True
+
+    def ResetStats(self) -> None:
+        self.visited = 0
+        self.matched = 0
+        self.propertyReads = 0
+        self.rejected = {}
+        self._rejectedKey = None
+
+    def GetStats(self) -> Dict[str, Any]:
+        """
+        Return dict, {'stages': [...], 'visited': int, 'matched': int, 'propertyReads': int, 'rejected': {key: count}}.
+        """
+        return {
+            'stages': [key for key, _ in self.stages],
+            'visited': self.visited,
+            'matched': self.matched,
+            'propertyReads': self.propertyReads,
+            'rejected': dict(self.rejected),
+        }
+
+
+class PathMemo():
+    """
+    Remembers the child index path from a searchFromControl to the controls its searches found.
+    Every searchFromControl owns one PathMemo, searches from the Desktop use `ROOT_PATH_MEMO`.
+    A remembered path is tried before both the native search and the walker search,
+    it is validated against the search properties and searchDepth before it is used,
+    on mismatch the path is discarded and a full search runs.
+    Only locators with a non-empty Name, AutomationId or ClassName are memorized, see `MemoKeys`,
+    a locator with only ControlType would validate any node of that type after the tree shifted.
+    The path of a native search result is computed once by walking up from the found element.
+    """
+    MaxSize = 256
+    MemoKeys = ('Name', 'AutomationId', 'ClassName')  # a locator needs at least one of them to be memorized
+    TotalStats = {'hits': 0, 'misses': 0, 'fallbacks': 0}
+
+    def __init__(self):
+        self.paths = {}
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+
+    def Get(self, key) -> Tuple[int, ...]:
+        return self.paths.get(key)
+
+    def Set(self, key, path: Tuple[int, ...]) -> None:
+        if key not in self.paths and len(self.paths) >= PathMemo.MaxSize:
+            del self.paths[next(iter(self.paths))]
+        self.paths[key] = path
+
+    def Discard(self, key) -> None:
+        self.paths.pop(key, None)
+
+    def Count(self, result: str) -> None:
+        """result: str, 'hits', 'misses' or 'fallbacks'."""
+        setattr(self, result, getattr(self, result) + 1)
+        PathMemo.TotalStats[result] += 1
+
+    def GetStats(self) -> Dict[str, int]:
+        """Return dict, {'hits': int, 'misses': int, 'fallbacks': int, 'paths': int}."""
+        return {'hits': self.hits, 'misses': self.misses, 'fallbacks': self.fallbacks, 'paths': len(self.paths)}
+
+
+ROOT_PATH_MEMO = PathMemo()
+
+
+def GetPathMemoStats() -> Dict[str, int]:
+    """
+    Return dict, hits, misses and fallbacks of all path memos.
+    hits: remembered path was valid, misses: remembered path was invalid, fallbacks: full native or walker searches.
+    """
+    return dict(PathMemo.TotalStats)
+
+
+_EventHandlerClass = None
+
+
+def _CreateEventHandler(callback: Callable[[], None]):
+    """
+    Create a COM object implementing IUIAutomationEventHandler and IUIAutomationStructureChangedEventHandler,
+    callback is called without arguments when any of the events is raised.
+    The class is created lazily because the interfaces come from UIAutomationCore.dll.
+    """
+    global _EventHandlerClass
+    if _EventHandlerClass is None:
+        UIAutomationCore = _AutomationClient.instance().UIAutomationCore
+
+        class _EventHandler(comtypes.COMObject):
+            _com_interfaces_ = [UIAutomationCore.IUIAutomationEventHandler, UIAutomationCore.IUIAutomationStructureChangedEventHandler]
+
+            def __init__(self, callback):
+                comtypes.COMObject.__init__(self)
+                self._callback = callback
+
+            def HandleAutomationEvent(self, sender, eventId):
+                self._callback()
+
+            def HandleStructureChangedEvent(self, sender, changeType, runtimeId):
+                self._callback()
+
+        _EventHandlerClass = _EventHandler
+    return _EventHandlerClass(callback)
+
+
+class EventWaiter():
+    """
+    Subscribe window opened/closed, menu opened/closed(or the given eventIds) and structure changed events under a control,
+    and wake up a waiting thread when any of them is raised.
+    `Control.Exists` and `Control.Disappears` use the waiter shared by the top level window of searchFromControl if waitEvents is True,
+    see `EventWaiter.GetShared`, so that short probes do not pay the cost of subscribing and unsubscribing every call.
+
+    waiter = EventWaiter(control)
+    if waiter.Start():
+        waiter.Wait(0.5)  # return True if an event was raised in 0.5 seconds
+    waiter.Stop()
+    """
+    EventIds = (EventId.Window_WindowOpenedEventId, EventId.Window_WindowClosedEventId,
+                EventId.MenuOpenedEventId, EventId.MenuClosedEventId)
+    PumpInterval = 0.02  # seconds, COM messages are pumped while waiting so that handlers can run in a STA thread
+    _shared = {}  # top level window handle(0 for the Desktop) -> EventWaiter, see GetShared
+    _sharedLock = threading.Lock()
+
+    def __init__(self, control: 'Control' = None, treeScope: int = TreeScope.Subtree, eventIds: Iterable[int] = None):
+        """
+        control: `Control` or its subclass, the search root, if None, use the Desktop.
+            Structure changed events are only subscribed for a non-Desktop control, they are too many for the whole Desktop.
+        treeScope: int, a value in class `TreeScope`.
+        eventIds: Iterable[int], automation event ids in class `EventId` to subscribe, if None, use `EventWaiter.EventIds`.
+            Pass () to subscribe structure changed events only.
+        """
+        self.control = control
+        self.treeScope = treeScope
+        self.eventIds = EventWaiter.EventIds if eventIds is None else tuple(eventIds)
+        self.started = False
+        self.eventCount = 0
+        self._event = threading.Event()
+        self._handler = None
+        self._element = None
+        self._registered = []
+
+    def _OnEvent(self) -> None:
+        self.eventCount += 1
+        self._event.set()
+
+    def Start(self) -> bool:
+        """
+        Subscribe the events.
+        Return bool, True if succeed, False if the events can not be subscribed and the caller should fall back to polling.
+        """
+        uiaClient = _AutomationClient.instance().IUIAutomation
+        try:
+            self._element = self.control.Element if self.control else GetRootControl().Element
+            self._handler = _CreateEventHandler(self._OnEvent)
+            for eventId in self.eventIds:
+                uiaClient.AddAutomationEventHandler(eventId, self._element, self.treeScope, None, self._handler)
+                self._registered.append(eventId)
+            if self.control:
+                uiaClient.AddStructureChangedEventHandler(self._element, self.treeScope, None, self._handler)
+                self._registered.append(EventId.StructureChangedEventId)
+        except Exception as ex:
+            if DEBUG_EXIST_DISAPPEAR:
+                Logger.WriteLine('Can not subscribe UI Automation events, fall back to polling. {}'.format(ex), ConsoleColor.Yellow)
+            self.Stop()
+            return False
+        self.started = True
+        return True
+
+    def Stop(self) -> None:
+        """Unsubscribe the events."""
+        if self._registered:
+            uiaClient = _AutomationClient.instance().IUIAutomation
+            for eventId in self._registered:
+                try:
+                    if eventId == EventId.StructureChangedEventId:
+                        uiaClient.RemoveStructureChangedEventHandler(self._element, self._handler)
+                    else:
+                        uiaClient.RemoveAutomationEventHandler(eventId, self._element, self._handler)
+                except Exception:
+                    pass
+            self._registered = []
+        self.started = False
+        self._handler = None
+        self._element = None
+
+    def Pump(self) -> None:
+        """
+        Dispatch the COM messages waiting in this thread without blocking, so that the events raised so far are counted in eventCount.
+        Handlers subscribed in a STA thread only run while it pumps messages, `Wait` pumps too.
+        """
+        comtypes.client.PumpEvents(0)
+
+    def Clear(self) -> None:
+        """Forget the events raised before, the next `Wait` only returns for new events."""
+        self._event.clear()
+
+    def Wait(self, timeout: float) -> bool:
+        """
+        Wait until an event is raised or timeout.
+        timeout: float, seconds.
+        Return bool, True if an event was raised.
+        """
+        end = ProcessTime() + timeout
+        while not self._event.is_set():
+            remain = end - ProcessTime()
+            if remain <= 0:
+                return False
+            comtypes.client.PumpEvents(min(remain, EventWaiter.PumpInterval))
+        self._event.clear()
+        return True
+
+    @staticmethod
+    def GetShared(control: 'Control' = None) -> 'EventWaiter':
+        """
+        Get the started waiter subscribing the events under the top level window of control, it is created on first use
+        and kept alive across calls, the waiters of destroyed windows are stopped the next time this is called.
+        control: `Control` or its subclass, if None, use the Desktop.
+        Return `EventWaiter` or None if the events can not be subscribed.
+        """
+        handle = control._GetTopLevelHandle() if control else 0
+        if handle is None:
+            return None
+        with EventWaiter._sharedLock:
+            for topHandle in [h for h in EventWaiter._shared if h and not IsWindow(h)]:
+                EventWaiter._shared.pop(topHandle).Stop()
+            waiter = EventWaiter._shared.get(handle)
+            if waiter is None:
+                waiter = EventWaiter(ControlFromHandle(handle) if handle else None)
+                waiter.Start()
+                EventWaiter._shared[handle] = waiter  # a failed waiter is kept too, not to retry every call
+        return waiter if waiter.started else None
+
+    @staticmethod
+    def StopShared() -> None:
+        """Stop all waiters created by `GetShared`."""
+        with EventWaiter._sharedLock:
+            for waiter in EventWaiter._shared.values():
+                waiter.Stop()
+            EventWaiter._shared = {}
+
+
+class SearchMetrics():
+    """
+    Registry of locator resolution metrics recorded by `Control.Exists` if enabled, keyed by locator signature:
+    the search properties and searchDepth, foundIndex is recorded separately.
+    Use the module instance `SEARCH_METRICS`:
+
+    SEARCH_METRICS.Enable()
+    ...
+    SEARCH_METRICS.GetStats()  # in-process query
+    SEARCH_METRICS.DumpJson('metrics.json')
+
+    Visited controls and property reads are counted by the search plan, they are 0 for native searches
+    because UI Automation evaluates the conditions in the provider process.
+    Native FindFirst/FindAll calls and tree walker navigation reads(GetFirstChild, GetNextSibling...) are counted per thread,
+    so the cost of native, memo and walker searches can be compared. Counts of a call include resolving its searchFromControl.
+    """
+    MaxSamples = 1000  # wall time samples kept per signature for percentiles
+    MaxSignatures = 1024  # signatures beyond this are recorded under OtherSignature
+    OtherSignature = '<others>'
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._local = threading.local()
+
+    def Enable(self, enable: bool = True) -> None:
+        self.enabled = enable
+
+    def Reset(self) -> None:
+        with self._lock:
+            self._entries = {}
+
+    def GetCounter(self) -> List[int]:
+        """Return List[int], [nativeCalls, navigationReads] of the current thread."""
+        counter = getattr(self._local, 'counter', None)
+        if counter is None:
+            counter = self._local.counter = [0, 0]
+        return counter
+
+    def CountNative(self, count: int = 1) -> None:
+        """Count IUIAutomationElement::FindFirst/FindAll calls of the current thread if enabled."""
+        if self.enabled:
+            self.GetCounter()[0] += count
+
+    def CountNavigation(self, count: int = 1) -> None:
+        """Count tree walker navigation reads of the current thread if enabled."""
+        if self.enabled:
+            self.GetCounter()[1] += count
+
+    @staticmethod
+    def GetSignature(control: 'Control') -> str:
+        """Return str, the signature of control used as the metrics key."""
+        signature = control.GetSearchPropertiesStr()
+        if control.searchDepth != 0xFFFFFFFF and 'Depth' not in control.searchProperties:
+            signature += ' searchDepth={}'.format(control.searchDepth)
+        return signature
+
+    def Record(self, control: 'Control', found: bool, seconds: float, visited: int, propertyReads: int,
+               nativeCalls: int = 0, navigationReads: int = 0) -> None:
+        """
+        Record one `Control.Exists` call.
+        control: `Control` or its subclass, the locator.
+        found: bool.
+        seconds: float, wall time.
+        visited: int, controls compared.
+        propertyReads: int, COM property reads by the comparisons.
+        nativeCalls: int, IUIAutomationElement::FindFirst/FindAll calls.
+        navigationReads: int, tree walker navigation reads.
+        """
+        signature = SearchMetrics.GetSignature(control)
+        with self._lock:
+            entry = self._entries.get(signature)
+            if entry is None:
+                if len(self._entries) >= SearchMetrics.MaxSignatures:
+                    signature = SearchMetrics.OtherSignature
+                    entry = self._entries.get(signature)
+                if entry is None:
+                    entry = self._entries[signature] = {
+                        'calls': 0, 'found': 0, 'timeouts': 0, 'visited': 0, 'propertyReads': 0,
+                        'nativeCalls': 0, 'navigationReads': 0, 'totalTime': 0.0,
+                        'searchPaths': {}, 'foundIndex': {}, 'times': collections.deque(maxlen=SearchMetrics.MaxSamples),
+                    }
+            entry['calls'] += 1
+            if found:
+                entry['found'] += 1
+                searchPath = control.searchPath
+                entry['searchPaths'][searchPath] = entry['searchPaths'].get(searchPath, 0) + 1
+            else:
+                entry['timeouts'] += 1
+            entry['visited'] += visited
+            entry['propertyReads'] += propertyReads
+            entry['nativeCalls'] += nativeCalls
+            entry['navigationReads'] += navigationReads
+            entry['totalTime'] += seconds
+            entry['foundIndex'][control.foundIndex] = entry['foundIndex'].get(control.foundIndex, 0) + 1
+            entry['times'].append(seconds)
+
+    @staticmethod
+    def _Percentile(sortedTimes: List[float], percent: float) -> float:
+        if not sortedTimes:
+            return 0.0
+        index = max(0, min(len(sortedTimes) - 1, int(len(sortedTimes) * percent / 100 + 0.5) - 1))
+        return sortedTimes[index]
+
+    def GetStats(self, signature: str = None) -> Dict[str, Dict[str, Any]]:
+        """
+        signature: str, if not None, only return the stats of this signature.
+        Return dict, {signature: {'calls': int, 'found': int, 'timeouts': int, 'visited': int, 'propertyReads': int,
+            'nativeCalls': int, 'navigationReads': int,
+            'searchPaths': {searchPath: count}, 'foundIndex': {foundIndex: count},
+            'time': {'total', 'mean', 'p50', 'p90', 'p99', 'max': float seconds}}}.
+        """
+        with self._lock:
+            items = [(k, v) for k, v in self._entries.items() if signature is None or k == signature]
+            stats = {}
+            for key, entry in items:
+                times = sorted(entry['times'])
+                stats[key] = {
+                    'calls': entry['calls'],
+                    'found': entry['found'],
+                    'timeouts': entry['timeouts'],
+                    'visited': entry['visited'],
+                    'propertyReads': entry['propertyReads'],
+                    'nativeCalls': entry['nativeCalls'],
+                    'navigationReads': entry['navigationReads'],
+                    'searchPaths': dict(entry['searchPaths']),
+                    'foundIndex': dict(entry['foundIndex']),
+                    'time': {
+                        'total': entry['totalTime'],
+                        'mean': entry['totalTime'] / entry['calls'],
+                        'p50': SearchMetrics._Percentile(times, 50),
+                        'p90': SearchMetrics._Percentile(times, 90),
+                        'p99': SearchMetrics._Percentile(times, 99),
+                        'max': times[-1] if times else 0.0,
+                    },
+                }
+        return stats
+
+    def GetTop(self, count: int = 10, key: str = 'total') -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        count: int.
+        key: str, a key in the time stats, such as 'total', 'mean', 'p90', or a counter key, such as 'calls', 'visited'.
+        Return list, [(signature, stats), ...] sorted by key descending.
+        """
+        stats = self.GetStats()
+        order = lambda item: item[1]['time'][key] if key in item[1]['time'] else item[1][key]
+        return sorted(stats.items(), key=order, reverse=True)[:count]
+
+    def ToJson(self, indent: int = 2) -> str:
+        """Return str, GetStats() in JSON, foundIndex keys become strings."""
+        return json.dumps(self.GetStats(), ensure_ascii=False, indent=indent)
+
+    def DumpJson(self, path: str, indent: int = 2) -> None:
+        """path: str, write ToJson() to this file."""
+        with open(path, 'w', encoding='utf-8') as fout:
+            fout.write(self.ToJson(indent))
+
+
+SEARCH_METRICS = SearchMetrics()
+
+
 class Control():
     ValidKeys = set(['ControlType', 'ClassName', 'AutomationId', 'Name', 'SubName', 'RegexName', 'Depth', 'Compare'])
-    def __init__(self, searchFromControl: 'Control' = None, searchDepth: int = 0xFFFFFFFF, searchInterval: float = SEARCH_INTERVAL, foundIndex: int = 1, element=None, **searchProperties):
+    # searchProperties that can be translated into IUIAutomationPropertyCondition, ordered from cheap to expensive
+    NativeSearchKeys = {
+        'ControlType': PropertyId.ControlTypeProperty,
+        'AutomationId': PropertyId.AutomationIdProperty,
+        'ClassName': PropertyId.ClassNameProperty,
+        'Name': PropertyId.NameProperty,
+    }
+    # searchProperties that need Python tree walking
+    WalkerSearchKeys = set(['SubName', 'RegexName', 'Depth', 'Compare'])
+    def __init__(self, searchFromControl: 'Control' = None, searchDepth: int = 0xFFFFFFFF, searchInterval: float = SEARCH_INTERVAL, foundIndex: int = 1, element=None, cacheRequest: CacheRequest = None, traverseStrategy: int = None, **searchProperties):
         """
         searchFromControl: `Control` or its subclass, if it is None, search from root control(Desktop).
         searchDepth: int, max search depth from searchFromControl.
         foundIndex: int, starts with 1, >= 1.
-        searchInterval: float, wait searchInterval after every search in self.Refind and self.Exists, the global timeout is TIME_OUT_SECOND.
+        searchInterval: float, wait searchInterval after every search in self.Refind and self.Exists, the timeout is GetSearchTimeout().
         element: `ctypes.POINTER(IUIAutomationElement)`, internal use only.
+        cacheRequest: `CacheRequest`, if not None, the search reads cached properties and the found control keeps them.
+        traverseStrategy: int, a value in class `TraverseStrategy`, if None, use TRAVERSE_STRATEGY.
+            Only used if the search can not be done natively, foundIndex counts in the traverse order.
         searchProperties: defines how to search, the following keys can be used:
                             ControlType: int, a value in class `ControlType`.
                             ClassName: str.
@@ -5290,6 +6170,8 @@ class Control():
         """
         self._element = element
         self._elementDirectAssign = True if element else False
+        self._cacheRequest = cacheRequest
+        self.traverseStrategy = traverseStrategy
         self.searchFromControl = searchFromControl
         self.searchDepth = searchProperties.get('Depth', searchDepth)
         self.searchInterval = searchInterval
@@ -5298,6 +6180,11 @@ class Control():
         regName = searchProperties.get('RegexName', '')
         self.regexName = re.compile(regName) if regName else None
         self._supportedPatterns = {}
+        self._searchCondition = None
+        self._searchPlan = None
+        self._pathMemo = None
+        self._topLevelHandle = None
+        self.searchPath = None  # 'native', 'memo' or 'walker', the path the last successful search took
 
     def __str__(self) -> str:
         rect = self.BoundingRectangle
@@ -5305,16 +6192,17 @@ class Control():
             self.ControlTypeName, self.ClassName, self.AutomationId, rect, self.Name, self.NativeWindowHandle)
 
     @staticmethod
-    def CreateControlFromElement(element) -> 'Control':
+    def CreateControlFromElement(element, cacheRequest: CacheRequest = None) -> 'Control':
         """
         Create a concreate `Control` from a com type `IUIAutomationElement`.
         element: `ctypes.POINTER(IUIAutomationElement)`.
+        cacheRequest: `CacheRequest`, the request element's cached properties were built with.
         Return a subclass of `Control`, an instance of the control's real type.
         """
         if element:
-            controlType = element.CurrentControlType
+            controlType = element.CachedControlType if cacheRequest else element.CurrentControlType
             if controlType in ControlConstructors:
-                return ControlConstructors[controlType](element=element)
+                return ControlConstructors[controlType](element=element, cacheRequest=cacheRequest)
             else:
                 Logger.WriteLine("element.CurrentControlType returns {}, invalid ControlType!".format(controlType), ConsoleColor.Red)  #rarely happens
 
@@ -5342,6 +6230,8 @@ class Control():
         searchProperties: dict, same as searchProperties in `Control.__init__`.
         """
         self.searchProperties.update(searchProperties)
+        self._searchCondition = None
+        self._searchPlan = None
         if 'Depth' in searchProperties:
             self.searchDepth = searchProperties['Depth']
         if 'RegexName' in searchProperties:
@@ -5356,6 +6246,8 @@ class Control():
             del self.searchProperties[key]
             if key == 'RegexName':
                 self.regexName = None
+        self._searchCondition = None
+        self._searchPlan = None
 
     def GetSearchPropertiesStr(self) -> str:
         strs = ['{}: {}'.format(k, ControlTypeNames[v] if k == 'ControlType' else repr(v)) for k, v in self.searchProperties.items()]
@@ -5367,7 +6259,32 @@ class Control():
                 ControlTypeNames[v] if k == 'ControlType' else repr(v)) for k, v in self.searchProperties.items()]
         return '{' + ', '.join(strs) + '}'
 
-    #BuildUpdatedCache
+    def IsPropertyCached(self, propertyId: int) -> bool:
+        """
+        propertyId: int, a value in class `PropertyId`.
+        Return bool, True if the property value is served from the cache of `self.cacheRequest`.
+        """
+        return self._cacheRequest is not None and propertyId in self._cacheRequest.propertyIds
+
+    @property
+    def cacheRequest(self) -> CacheRequest:
+        """
+        Property cacheRequest.
+        Return `CacheRequest` or None.
+        """
+        return self._cacheRequest
+
+    def RefreshCache(self, cacheRequest: CacheRequest = None) -> None:
+        """
+        Call IUIAutomationElement::BuildUpdatedCache, fetch cached properties again in one call.
+        cacheRequest: `CacheRequest`, if not None, replace the current cacheRequest.
+        Refer https://docs.microsoft.com/en-us/windows/desktop/api/uiautomationclient/nf-uiautomationclient-iuiautomationelement-buildupdatedcache
+        """
+        if cacheRequest is not None:
+            self._cacheRequest = cacheRequest
+        if self._cacheRequest is not None:
+            self._element = self.Element.BuildUpdatedCache(self._cacheRequest.Request)
+
     #CachedAcceleratorKey
     #CachedAccessKey
     #CachedAriaProperties
@@ -5444,6 +6361,8 @@ class Control():
         Call IUIAutomationElement::get_CurrentAutomationId.
         Refer https://docs.microsoft.com/en-us/windows/desktop/api/uiautomationclient/nf-uiautomationclient-iuiautomationelement-get_currentautomationid
         """
+        if self.IsPropertyCached(PropertyId.AutomationIdProperty):
+            return self.Element.CachedAutomationId
         return self.Element.CurrentAutomationId
 
     @property
@@ -5457,6 +6376,20 @@ class Control():
         rect = control.BoundingRectangle
         print(rect.left, rect.top, rect.right, rect.bottom, rect.width(), rect.height(), rect.xcenter(), rect.ycenter())
         """
+        if self.IsPropertyCached(PropertyId.BoundingRectangleProperty):
+            rect = self.Element.CachedBoundingRectangle
+        else:
+            rect = self.Element.CurrentBoundingRectangle
+        return Rect(rect.left, rect.top, rect.right, rect.bottom)
+
+    @property
+    def CurrentBoundingRectangle(self) -> Rect:
+        """
+        Property CurrentBoundingRectangle.
+        Call IUIAutomationElement::get_CurrentBoundingRectangle even if BoundingRectangleProperty is cached,
+            input methods(Click, RightClick, WheelDown...) use it so that a scrolled control is not clicked at its cached position.
+        Return `Rect`.
+        """
         rect = self.Element.CurrentBoundingRectangle
         return Rect(rect.left, rect.top, rect.right, rect.bottom)
     
@@ -5481,6 +6414,8 @@ class Control():
         Call IUIAutomationElement::get_CurrentClassName.
         Refer https://docs.microsoft.com/en-us/windows/desktop/api/uiautomationclient/nf-uiautomationclient-iuiautomationelement-get_currentclassname
         """
+        if self.IsPropertyCached(PropertyId.ClassNameProperty):
+            return self.Element.CachedClassName
         return self.Element.CurrentClassName
 
     @property
@@ -5491,6 +6426,8 @@ class Control():
         Call IUIAutomationElement::get_CurrentControlType.
         Refer https://docs.microsoft.com/en-us/windows/desktop/api/uiautomationclient/nf-uiautomationclient-iuiautomationelement-get_currentcontroltype
         """
+        if self.IsPropertyCached(PropertyId.ControlTypeProperty):
+            return self.Element.CachedControlType
         return self.Element.CurrentControlType
 
     #@property
@@ -5652,6 +6589,8 @@ class Control():
         Call IUIAutomationElement::get_CurrentName.
         Refer https://docs.microsoft.com/en-us/windows/desktop/api/uiautomationclient/nf-uiautomationclient-iuiautomationelement-get_currentname
         """
+        if self.IsPropertyCached(PropertyId.NameProperty):
+            return self.Element.CachedName or ''
         return self.Element.CurrentName or ''   # CurrentName may be None
 
     @property
@@ -5763,6 +6702,8 @@ class Control():
         Return List[int], a list of int.
         Refer https://docs.microsoft.com/en-us/windows/desktop/api/uiautomationclient/nf-uiautomationclient-iuiautomationelement-getruntimeid
         """
+        if self.IsPropertyCached(PropertyId.RuntimeIdProperty):
+            return list(self.Element.GetCachedPropertyValue(PropertyId.RuntimeIdProperty))
         return self.Element.GetRuntimeId()
 
     #QueryInterface
@@ -5785,7 +6726,7 @@ class Control():
         Return `ctypes.POINTER(IUIAutomationElement)`.
         """
         if not self._element:
-            self.Refind(maxSearchSeconds=TIME_OUT_SECOND, searchIntervalSeconds=self.searchInterval)
+            self.Refind(maxSearchSeconds=GetSearchTimeout(), searchIntervalSeconds=self.searchInterval)
         return self._element
 
     @property
@@ -5841,38 +6782,63 @@ class Control():
             else:
                 break
 
-    def GetParentControl(self) -> 'Control':
+    def GetParentControl(self, cacheRequest: CacheRequest = None) -> 'Control':
         """
+        cacheRequest: `CacheRequest`, if not None, call GetParentElementBuildCache.
         Return `Control` subclass or None.
         """
+        SEARCH_METRICS.CountNavigation()
+        if cacheRequest:
+            ele = _AutomationClient.instance().ViewWalker.GetParentElementBuildCache(self.Element, cacheRequest.Request)
+            return Control.CreateControlFromElement(ele, cacheRequest)
         ele = _AutomationClient.instance().ViewWalker.GetParentElement(self.Element)
         return Control.CreateControlFromElement(ele)
 
-    def GetFirstChildControl(self) -> 'Control':
+    def GetFirstChildControl(self, cacheRequest: CacheRequest = None) -> 'Control':
         """
+        cacheRequest: `CacheRequest`, if not None, call GetFirstChildElementBuildCache.
         Return `Control` subclass or None.
         """
+        SEARCH_METRICS.CountNavigation()
+        if cacheRequest:
+            ele = _AutomationClient.instance().ViewWalker.GetFirstChildElementBuildCache(self.Element, cacheRequest.Request)
+            return Control.CreateControlFromElement(ele, cacheRequest)
         ele = _AutomationClient.instance().ViewWalker.GetFirstChildElement(self.Element)
         return Control.CreateControlFromElement(ele)
 
-    def GetLastChildControl(self) -> 'Control':
+    def GetLastChildControl(self, cacheRequest: CacheRequest = None) -> 'Control':
         """
+        cacheRequest: `CacheRequest`, if not None, call GetLastChildElementBuildCache.
         Return `Control` subclass or None.
         """
+        SEARCH_METRICS.CountNavigation()
+        if cacheRequest:
+            ele = _AutomationClient.instance().ViewWalker.GetLastChildElementBuildCache(self.Element, cacheRequest.Request)
+            return Control.CreateControlFromElement(ele, cacheRequest)
         ele = _AutomationClient.instance().ViewWalker.GetLastChildElement(self.Element)
         return Control.CreateControlFromElement(ele)
 
-    def GetNextSiblingControl(self) -> 'Control':
+    def GetNextSiblingControl(self, cacheRequest: CacheRequest = None) -> 'Control':
         """
+        cacheRequest: `CacheRequest`, if not None, call GetNextSiblingElementBuildCache.
         Return `Control` subclass or None.
         """
+        SEARCH_METRICS.CountNavigation()
+        if cacheRequest:
+            ele = _AutomationClient.instance().ViewWalker.GetNextSiblingElementBuildCache(self.Element, cacheRequest.Request)
+            return Control.CreateControlFromElement(ele, cacheRequest)
         ele = _AutomationClient.instance().ViewWalker.GetNextSiblingElement(self.Element)
         return Control.CreateControlFromElement(ele)
 
-    def GetPreviousSiblingControl(self) -> 'Control':
+    def GetPreviousSiblingControl(self, cacheRequest: CacheRequest = None) -> 'Control':
         """
+        cacheRequest: `CacheRequest`, if not None, call GetPreviousSiblingElementBuildCache.
         Return `Control` subclass or None.
         """
+        SEARCH_METRICS.CountNavigation()
+        if cacheRequest:
+            ele = _AutomationClient.instance().ViewWalker.GetPreviousSiblingElementBuildCache(self.Element, cacheRequest.Request)
+            return Control.CreateControlFromElement(ele, cacheRequest)
         ele = _AutomationClient.instance().ViewWalker.GetPreviousSiblingElement(self.Element)
         return Control.CreateControlFromElement(ele)
 
@@ -5934,28 +6900,89 @@ class Control():
         
         return find_all_elements(self)
     
+    def GetProgenyIndex(self, cacheRequest: CacheRequest = None) -> ProgenyIndex:
+        """
+        Create a `ProgenyIndex` so several progeny lookups on this control share one breadth first traversal.
+        cacheRequest: `CacheRequest`, if not None, every walker step builds the cache of the collected control.
+        Return `ProgenyIndex`.
+        """
+        return ProgenyIndex(self, cacheRequest)
+
     def GetProgenyControl(self, depth: int=1, index: int=0, control_type: str = None) -> 'Control':
         """
-        Get the nth control in the mth depth.
+        Get the nth control in the mth depth, traverse breadth first and stop at the requested depth and index.
         depth: int, starts with 0.
         index: int, starts with 0.
         control_type: `Control` or its subclass, if not None, only return the nth control that matches the control_type.
         Return `Control` subclass or None.
         """
-        progeny = self.GetAllProgeny()
-        try:
-            controls = progeny[depth]
-            if control_type:
-                controls = [child for child in controls if child.ControlTypeName == control_type]
-            if index < len(controls):
-                return controls[index]
-        except IndexError:
-            return
-
-    def GetChildren(self) -> List['Control']:
-        """
+        return ProgenyIndex(self).GetControl(depth, index, control_type)
+
+    def Snapshot(self, maxDepth: int = 0xFFFFFFFF, properties: Iterable[int] = None) -> ControlSnapshot:
+        """
+        Capture the subtree of this control by one IUIAutomationElement::BuildUpdatedCache call.
+        maxDepth: int, nodes deeper than maxDepth are not kept.
+            If maxDepth is 0 or 1, TreeScope.Element or TreeScope.Element | TreeScope.Children is cached, only this level is fetched.
+            Otherwise TreeScope.Subtree is cached because UI Automation has no depth limit for a cache request,
+            the whole subtree is still fetched and maxDepth only reduces the nodes that are kept.
+        properties: Iterable[int], values in class `PropertyId`, if None, capture
+            ControlType, ClassName, Name, BoundingRectangle and RuntimeId.
+            Properties that are not captured are None in `SnapshotNode`.
+        Return `ControlSnapshot`.
+        """
+        if properties is None:
+            properties = (PropertyId.ControlTypeProperty, PropertyId.ClassNameProperty, PropertyId.NameProperty,
+                          PropertyId.BoundingRectangleProperty, PropertyId.RuntimeIdProperty)
+        if maxDepth <= 0:
+            treeScope = TreeScope.Element
+        elif maxDepth == 1:
+            treeScope = TreeScope.Element | TreeScope.Children
+        else:
+            treeScope = TreeScope.Subtree
+        cacheRequest = CacheRequest(properties, treeScope)
+        propertyIds = cacheRequest.propertyIds
+        hasClassName = PropertyId.ClassNameProperty in propertyIds
+        hasName = PropertyId.NameProperty in propertyIds
+        hasRect = PropertyId.BoundingRectangleProperty in propertyIds
+        element = self.Element.BuildUpdatedCache(cacheRequest.Request)
+        nodes = []
+        stack = [(element, 0, -1)]
+        while stack:
+            element, depth, parent = stack.pop()
+            if hasRect:
+                rect = element.CachedBoundingRectangle
+                rect = (rect.left, rect.top, rect.right, rect.bottom)
+            else:
+                rect = None
+            node = SnapshotNode(element.CachedControlType,
+                                element.CachedClassName if hasClassName else None,
+                                (element.CachedName or '') if hasName else None,
+                                rect,
+                                tuple(element.GetCachedPropertyValue(PropertyId.RuntimeIdProperty) or ()),
+                                depth, parent, element)
+            if parent >= 0:
+                nodes[parent].children.append(len(nodes))
+            nodes.append(node)
+            if depth < maxDepth:
+                children = element.GetCachedChildren()
+                if children:
+                    index = len(nodes) - 1
+                    for i in range(children.Length - 1, -1, -1):
+                        stack.append((children.GetElement(i), depth + 1, index))
+        return ControlSnapshot(nodes)
+
+    def GetChildren(self, cacheRequest: CacheRequest = None) -> List['Control']:
+        """
+        cacheRequest: `CacheRequest`, if not None, get all children and their cached properties
+            by one IUIAutomationElement::FindAllBuildCache call.
         Return List[Control], a list of `Control` subclasses.
         """
+        if cacheRequest:
+            automation = _AutomationClient.instance().IUIAutomation
+            elements = self.Element.FindAllBuildCache(TreeScope.Children, automation.CreateTrueCondition(), cacheRequest.Request)
+            if not elements:
+                return []
+            return [Control.CreateControlFromElement(elements.GetElement(i), cacheRequest) for i in range(elements.Length)]
         children = []
         child = self.GetFirstChildControl()
         while child:
@@ -5963,6 +6990,15 @@ class Control():
             child = child.GetNextSiblingControl()
         return children
 
+    def GetSearchPlan(self) -> SearchPlan:
+        """
+        Compile searchProperties into a `SearchPlan` once, the plan is rebuilt if searchProperties change.
+        Return `SearchPlan`, use `SearchPlan.GetStats` to see how many controls were rejected at each check.
+        """
+        if self._searchPlan is None:
+            self._searchPlan = SearchPlan(self.searchProperties, self.regexName)
+        return self._searchPlan
+
     def _CompareFunction(self, control: 'Control', depth: int) -> bool:
         """
         Define how to search.
@@ -5970,40 +7006,161 @@ class Control():
         depth: int, tree depth from searchFromControl.
         Return bool.
         """
-        for key, value in self.searchProperties.items():
-            if 'ControlType' == key:
-                if value != control.ControlType:
-                    return False
-            elif 'ClassName' == key:
-                if value != control.ClassName:
-                    return False
-            elif 'AutomationId' == key:
-                if value != control.AutomationId:
-                    return False
-            elif 'Depth' == key:
-                if value != depth:
-                    return False
-            elif 'Name' == key:
-                if value != control.Name:
-                    return False
-            elif 'SubName' == key:
-                if value not in control.Name:
-                    return False
-            elif 'RegexName' == key:
-                if not self.regexName.match(control.Name):
-                    return False
-            elif 'Compare' == key:
-                if not value(control, depth):
-                    return False
+        return self.GetSearchPlan().Match(control, depth)
+
+    def CanSearchNatively(self) -> bool:
+        """
+        Return bool, True if searchProperties can be translated into an IUIAutomationCondition,
+            False if Python tree walking is needed(SubName, RegexName, Depth or Compare is used).
+        """
+        if not USE_NATIVE_SEARCH:
+            return False
+        for key in self.searchProperties:
+            if key in Control.WalkerSearchKeys:
+                return False
         return True
 
-    def Exists(self, maxSearchSeconds: float = 5, searchIntervalSeconds: float = SEARCH_INTERVAL, printIfNotExist: bool = False) -> bool:
+    def GetSearchCondition(self):
+        """
+        Translate ControlType, AutomationId, ClassName and Name in searchProperties into an IUIAutomationCondition.
+        Keys that are not in `Control.NativeSearchKeys` are ignored, the same as `self._CompareFunction`.
+        Return `ctypes.POINTER(IUIAutomationCondition)`.
+        """
+        if self._searchCondition is None:
+            automation = _AutomationClient.instance().IUIAutomation
+            condition = None
+            for key, propertyId in Control.NativeSearchKeys.items():
+                if key in self.searchProperties:
+                    propertyCondition = automation.CreatePropertyCondition(propertyId, self.searchProperties[key])
+                    condition = propertyCondition if condition is None else automation.CreateAndCondition(condition, propertyCondition)
+            self._searchCondition = condition if condition is not None else automation.CreateTrueCondition()
+        return self._searchCondition
+
+    def GetPathMemo(self) -> PathMemo:
+        """
+        Return `PathMemo`, the path memo of searches from this control.
+        """
+        if self._pathMemo is None:
+            self._pathMemo = PathMemo()
+        return self._pathMemo
+
+    def _GetTopLevelHandle(self) -> int:
+        """
+        Return int, the native handle of the top level window which this control lays, or None if it can not be got.
+        The handle is got once and cached, used by `EventWaiter.GetShared`.
+        """
+        if self._topLevelHandle is None:
+            try:
+                topLevel = self.GetTopLevelControl()
+                self._topLevelHandle = topLevel.NativeWindowHandle if topLevel else 0
+            except Exception:
+                self._topLevelHandle = 0
+        return self._topLevelHandle or None
+
+    def _GetPathMemoKey(self):
+        """
+        Return a hashable key of this locator for `PathMemo`, or None if the result can not be memorized.
+        """
+        if not USE_PATH_MEMO or self.foundIndex != 1 or 'Compare' in self.searchProperties:
+            return None
+        if not any(isinstance(self.searchProperties.get(k), str) and self.searchProperties[k] for k in PathMemo.MemoKeys):
+            return None
+        try:
+            key = (tuple(sorted(self.searchProperties.items())), self.searchDepth, self.traverseStrategy)
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _FindControlByPathMemo(self, memo: PathMemo, key) -> 'Control':
+        """
+        Follow the remembered path and validate the control with the search properties.
+        Return `Control` subclass or None.
+        """
+        path = memo.Get(key)
+        if path is None:
+            return None
+        control = self.searchFromControl or GetRootControl()
+        for index in path:
+            child = control.GetFirstChildControl(self._cacheRequest)
+            for _ in range(index):
+                if not child:
+                    break
+                child = child.GetNextSiblingControl(self._cacheRequest)
+            if not child:
+                break
+            control = child
+        else:
+            if len(path) <= self.searchDepth and self._CompareFunction(control, len(path)):
+                memo.Count('hits')
+                return control
+        memo.Count('misses')
+        memo.Discard(key)
+        return None
+
+    def _FindElementNatively(self):
+        """
+        Find the element by IUIAutomationElement::FindFirstBuildCache or IUIAutomationElement::FindAllBuildCache.
+        The raw view is always searched, the same view as the tree walker, see `RAW_VIEW_CACHE_REQUEST`.
+        searchDepth 1 uses TreeScope.Children, other depths use TreeScope.Descendants.
+        If foundIndex is 1, FindFirst is tried first and FindAll is only used if its result is deeper than searchDepth,
+            results deeper than searchDepth are skipped.
+        Return `ctypes.POINTER(IUIAutomationElement)` or None.
+        """
+        if self.searchDepth <= 0:
+            return None
+        if self.searchFromControl:
+            rootElement = self.searchFromControl.Element
+        else:
+            rootElement = _AutomationClient.instance().IUIAutomation.GetRootElement()
+        condition = self.GetSearchCondition()
+        request = (self._cacheRequest or RAW_VIEW_CACHE_REQUEST).Request
+        scope = TreeScope.Children if self.searchDepth == 1 else TreeScope.Descendants
+        checkDepth = scope == TreeScope.Descendants and self.searchDepth < 0xFFFFFFFF
+        if self.foundIndex == 1:
+            SEARCH_METRICS.CountNative()
+            element = rootElement.FindFirstBuildCache(scope, condition, request)
+            if not element:
+                return None
+            if not checkDepth or _IsElementWithinDepth(element, rootElement, self.searchDepth):
+                return element
+        SEARCH_METRICS.CountNative()
+        elements = rootElement.FindAllBuildCache(scope, condition, request)
+        if not elements:
+            return None
+        foundCount = 0
+        for i in range(elements.Length):
+            element = elements.GetElement(i)
+            if checkDepth and not _IsElementWithinDepth(element, rootElement, self.searchDepth):
+                continue
+            foundCount += 1
+            if foundCount == self.foundIndex:
+                return element
+
+    def Exists(self, maxSearchSeconds: float = 5, searchIntervalSeconds: float = SEARCH_INTERVAL, printIfNotExist: bool = False, waitEvents: bool = None) -> bool:
         """
         maxSearchSeconds: float
         searchIntervalSeconds: float
+        waitEvents: bool, if True, search again as soon as a UI Automation event is raised under searchFromControl
+            instead of sleeping searchIntervalSeconds, see `EventWaiter.GetShared`. If None, use USE_EVENT_WAIT.
         Find control every searchIntervalSeconds seconds in maxSearchSeconds seconds.
         Return bool, True if find
-        """
+        If SEARCH_METRICS is enabled, the call is recorded in it.
+        """
+        if SEARCH_METRICS.enabled and not (self._element and self._elementDirectAssign):
+            plan = self.GetSearchPlan() if self.searchProperties else None
+            visited, propertyReads = (plan.visited, plan.propertyReads) if plan else (0, 0)
+            counter = SEARCH_METRICS.GetCounter()
+            nativeCalls, navigationReads = counter
+            startTime = ProcessTime()
+            found = self._Exists(maxSearchSeconds, searchIntervalSeconds, printIfNotExist, waitEvents)
+            if plan:
+                SEARCH_METRICS.Record(self, found, ProcessTime() - startTime, plan.visited - visited, plan.propertyReads - propertyReads,
+                                      counter[0] - nativeCalls, counter[1] - navigationReads)
+            return found
+        return self._Exists(maxSearchSeconds, searchIntervalSeconds, printIfNotExist, waitEvents)
+
+    def _Exists(self, maxSearchSeconds: float, searchIntervalSeconds: float, printIfNotExist: bool, waitEvents: bool) -> bool:
         if self._element and self._elementDirectAssign:
             #if element is directly assigned, not by searching, just check whether self._element is valid
             #but I can't find an API in UIAutomation that can directly check
@@ -6020,68 +7177,119 @@ class Control():
         if len(self.searchProperties) == 0:
             raise LookupError("control's searchProperties must not be empty!")
         self._element = None
+        if waitEvents is None:
+            waitEvents = USE_EVENT_WAIT
         startTime = ProcessTime()
         # Use same timeout(s) parameters for resolve all parents
         prev =  self.searchFromControl
-        if prev and not prev._element and not prev.Exists(maxSearchSeconds, searchIntervalSeconds):
+        if prev and not prev._element and not prev.Exists(maxSearchSeconds, searchIntervalSeconds, waitEvents=waitEvents):
             if printIfNotExist or DEBUG_EXIST_DISAPPEAR:
                 Logger.ColorfullyLog(self.GetColorfulSearchPropertiesStr() + '<Color=Red> does not exist.</Color>')
             return False
         startTime2 = ProcessTime()
         if DEBUG_SEARCH_TIME:
             startDateTime = datetime.datetime.now()
+        waiter = EventWaiter.GetShared(self.searchFromControl) if waitEvents and maxSearchSeconds > 0 else None
         while True:
-            control = FindControl(self.searchFromControl, self._CompareFunction, self.searchDepth, False, self.foundIndex)
+            if waiter:
+                waiter.Clear()  # only events raised after this point wake up the wait below
+            memoKey = self._GetPathMemoKey()
+            memo = (self.searchFromControl.GetPathMemo() if self.searchFromControl else ROOT_PATH_MEMO) if memoKey else None
+            control = self._FindControlByPathMemo(memo, memoKey) if memo else None
+            if control:
+                control.traverseCount = control.visitCount = 0
+                searchPath = 'memo'
+            elif self.CanSearchNatively():
+                element = self._FindElementNatively()
+                if memo:
+                    memo.Count('fallbacks')
+                    if element:
+                        path = _GetElementPath(element, (self.searchFromControl or GetRootControl()).Element, self.searchDepth)
+                        if path:
+                            memo.Set(memoKey, path)
+                if element:
+                    self._element = element
+                    self.searchPath = 'native'
+                    if DEBUG_SEARCH_TIME:
+                        Logger.ColorfullyLog('{} SearchPath: <Color=Cyan>native</Color>, SearchTime: <Color=Cyan>{:.3f}</Color>s[{} - {}]'.format(
+                            self.GetColorfulSearchPropertiesStr(), ProcessTime() - startTime2,
+                            startDateTime.time(), datetime.datetime.now().time()))
+                    return True
+            else:
+                control = FindControl(self.searchFromControl, self._CompareFunction, self.searchDepth, False, self.foundIndex, self._cacheRequest,
+                                      TRAVERSE_STRATEGY if self.traverseStrategy is None else self.traverseStrategy)
+                searchPath = 'walker'
+                if memo:
+                    memo.Count('fallbacks')
+                    if control:
+                        memo.Set(memoKey, control.foundPath)
             if control:
                 self._element = control.Element
                 control._element = 0  # control will be destroyed, but the element needs to be stroed in self._element
+                self.searchPath = searchPath
                 if DEBUG_SEARCH_TIME:
-                    Logger.ColorfullyLog('{} TraverseControls: <Color=Cyan>{}</Color>, SearchTime: <Color=Cyan>{:.3f}</Color>s[{} - {}]'.format(
-                        self.GetColorfulSearchPropertiesStr(), control.traverseCount, ProcessTime() - startTime2,
+                    Logger.ColorfullyLog('{} SearchPath: <Color=Cyan>{}</Color>, TraverseControls: <Color=Cyan>{}</Color>, VisitControls: <Color=Cyan>{}</Color>, SearchTime: <Color=Cyan>{:.3f}</Color>s[{} - {}]'.format(
+                        self.GetColorfulSearchPropertiesStr(), searchPath, control.traverseCount, control.visitCount, ProcessTime() - startTime2,
                         startDateTime.time(), datetime.datetime.now().time()))
                 return True
             else:
                 remain = startTime + maxSearchSeconds - ProcessTime()
                 if remain > 0:
-                    time.sleep(min(remain, searchIntervalSeconds))
+                    if waiter:
+                        waiter.Wait(min(remain, searchIntervalSeconds))
+                    else:
+                        time.sleep(min(remain, searchIntervalSeconds))
                 else:
                     if printIfNotExist or DEBUG_EXIST_DISAPPEAR:
                         Logger.ColorfullyLog(self.GetColorfulSearchPropertiesStr() + '<Color=Red> does not exist.</Color>')
                     return False
 
-    def Disappears(self, maxSearchSeconds: float = 5, searchIntervalSeconds: float = SEARCH_INTERVAL, printIfNotDisappear: bool = False) -> bool:
+    def Disappears(self, maxSearchSeconds: float = 5, searchIntervalSeconds: float = SEARCH_INTERVAL, printIfNotDisappear: bool = False, waitEvents: bool = None) -> bool:
         """
         maxSearchSeconds: float
         searchIntervalSeconds: float
+        waitEvents: bool, if True, check again as soon as a UI Automation event is raised under searchFromControl
+            instead of sleeping searchIntervalSeconds, see `EventWaiter.GetShared`. If None, use USE_EVENT_WAIT.
         Check if control disappears every searchIntervalSeconds seconds in maxSearchSeconds seconds.
         Return bool, True if control disappears.
         """
         global DEBUG_EXIST_DISAPPEAR
+        if waitEvents is None:
+            waitEvents = USE_EVENT_WAIT
         start = ProcessTime()
+        waiter = EventWaiter.GetShared(self.searchFromControl) if waitEvents and maxSearchSeconds > 0 else None
         while True:
+            if waiter:
+                waiter.Clear()  # only events raised after this point wake up the wait below
             temp = DEBUG_EXIST_DISAPPEAR
             DEBUG_EXIST_DISAPPEAR = False  # do not print for Exists
-            if not self.Exists(0, 0, False):
+            if not self.Exists(0, 0, False, waitEvents=False):
                 DEBUG_EXIST_DISAPPEAR = temp
                 return True
             DEBUG_EXIST_DISAPPEAR = temp
             remain = start + maxSearchSeconds - ProcessTime()
             if remain > 0:
-                time.sleep(min(remain, searchIntervalSeconds))
+                if waiter:
+                    waiter.Wait(min(remain, searchIntervalSeconds))
+                else:
+                    time.sleep(min(remain, searchIntervalSeconds))
             else:
                 if printIfNotDisappear or DEBUG_EXIST_DISAPPEAR:
                     Logger.ColorfullyLog(self.GetColorfulSearchPropertiesStr() + '<Color=Red> does not disappear.</Color>')
                 return False
 
-    def Refind(self, maxSearchSeconds: float = TIME_OUT_SECOND, searchIntervalSeconds: float = SEARCH_INTERVAL, raiseException: bool = True) -> bool:
+    def Refind(self, maxSearchSeconds: float = None, searchIntervalSeconds: float = SEARCH_INTERVAL, raiseException: bool = True, waitEvents: bool = None) -> bool:
         """
         Refind the control every searchIntervalSeconds seconds in maxSearchSeconds seconds.
-        maxSearchSeconds: float.
+        maxSearchSeconds: float, if None, use GetSearchTimeout().
         searchIntervalSeconds: float.
         raiseException: bool, if True, raise a LookupError if timeout.
+        waitEvents: bool, see `Exists`.
         Return bool, True if find.
         """
-        if not self.Exists(maxSearchSeconds, searchIntervalSeconds, False if raiseException else DEBUG_EXIST_DISAPPEAR):
+        if maxSearchSeconds is None:
+            maxSearchSeconds = GetSearchTimeout()
+        if not self.Exists(maxSearchSeconds, searchIntervalSeconds, False if raiseException else DEBUG_EXIST_DISAPPEAR, waitEvents):
             if raiseException:
                 # Logger.ColorfullyLog('<Color=Red>Find Control Timeout: </Color>' + self.GetColorfulSearchPropertiesStr())
                 raise LookupError('Find Control Timeout: ' + self.GetSearchPropertiesStr())
@@ -6099,8 +7307,9 @@ class Control():
         simulateMove: bool.
         Return Tuple[int, int], two ints tuple (x, y), the cursor positon relative to screen(0, 0)
             after moving or None if control's width or height is 0.
+        The current BoundingRectangle is used even if it is cached.
         """
-        rect = self.BoundingRectangle
+        rect = self.CurrentBoundingRectangle
         if rect.width() == 0 or rect.height() == 0:
             Logger.ColorfullyLog('<Color=Yellow>Can not move cursor</Color>. {}\'s BoundingRectangle is {}. SearchProperties: {}'.format(
                 self.ControlTypeName, rect, self.GetColorfulSearchPropertiesStr()))
@@ -6195,7 +7404,7 @@ class Control():
         Click(x, y, waitTime)
 
     def DragDrop(self, x1: int, y1: int, x2: int, y2: int, moveSpeed: float=1, waitTime: float = OPERATION_WAIT_TIME) -> None:
-        rect = self.BoundingRectangle
+        rect = self.CurrentBoundingRectangle
         if rect.width() == 0 or rect.height() == 0:
             Logger.ColorfullyLog('<Color=Yellow>Can not move cursor</Color>. {}\'s BoundingRectangle is {}. SearchProperties: {}'.format(
                 self.ControlTypeName, rect, self.GetColorfulSearchPropertiesStr()))
@@ -7581,11 +8790,50 @@ def SetGlobalSearchTimeout(seconds: float) -> None:
     To make this available, you need explicitly import uiautomation:
         from uiautomation import uiautomation as auto
         auto.SetGlobalSearchTimeout(10)
+    The timeout is shared by all threads, use `SearchTimeout` to change it only for the current thread.
     """
     global TIME_OUT_SECOND
     TIME_OUT_SECOND = seconds
 
 
+_SearchTimeoutLocal = threading.local()
+
+
+def GetSearchTimeout() -> float:
+    """
+    Return float, the search timeout of the current thread,
+    the innermost `SearchTimeout` scope of the current thread if any, otherwise TIME_OUT_SECOND.
+    """
+    stack = getattr(_SearchTimeoutLocal, 'stack', None)
+    if stack:
+        return stack[-1]
+    return TIME_OUT_SECOND
+
+
+class SearchTimeout():
+    """
+    A context manager that changes the search timeout of `Control.Element` and `Control.Refind` in the current thread only.
+    Scopes can be nested, other threads are not affected.
+
+    with SearchTimeout(1):
+        rect = control.BoundingRectangle  # LookupError if control is not found in 1 second
+    """
+
+    def __init__(self, seconds: float):
+        """seconds: float."""
+        self.seconds = seconds
+
+    def __enter__(self) -> 'SearchTimeout':
+        stack = getattr(_SearchTimeoutLocal, 'stack', None)
+        if stack is None:
+            stack = _SearchTimeoutLocal.stack = []
+        stack.append(self.seconds)
+        return self
+
+    def __exit__(self, exceptionType, exceptionValue, exceptionTraceback) -> None:
+        _SearchTimeoutLocal.stack.pop()
+
+
 def WaitForExist(control: Control, timeout: float) -> bool:
     """
     Check if control exists in timeout seconds.
@@ -7767,11 +9015,142 @@ def ControlsAreSame(control1: Control, control2: Control) -> bool:
     return bool(_AutomationClient.instance().IUIAutomation.CompareElements(control1.Element, control2.Element))
 
 
-def WalkControl(control: Control, includeTop: bool = False, maxDepth: int = 0xFFFFFFFF):
+def _IsElementWithinDepth(element, ancestorElement, maxDepth: int) -> bool:
+    """
+    element: `ctypes.POINTER(IUIAutomationElement)`.
+    ancestorElement: `ctypes.POINTER(IUIAutomationElement)`.
+    maxDepth: int.
+    Return bool, True if ancestorElement is reached in maxDepth steps when walking up from element.
+    """
+    client = _AutomationClient.instance()
+    parentElement = element
+    for _ in range(maxDepth):
+        SEARCH_METRICS.CountNavigation()
+        parentElement = client.ViewWalker.GetParentElement(parentElement)
+        if not parentElement:
+            return False
+        if client.IUIAutomation.CompareElements(parentElement, ancestorElement):
+            return True
+    return False
+
+
+def _GetElementPath(element, ancestorElement, maxDepth: int) -> Tuple[int, ...]:
+    """
+    element: `ctypes.POINTER(IUIAutomationElement)`.
+    ancestorElement: `ctypes.POINTER(IUIAutomationElement)`.
+    maxDepth: int.
+    Return Tuple[int, ...], the child indices from ancestorElement to element in the raw view,
+        or None if ancestorElement is not reached in maxDepth steps when walking up from element.
+    """
+    client = _AutomationClient.instance()
+    path = []
+    for _ in range(maxDepth):
+        index = 0
+        sibling = client.ViewWalker.GetPreviousSiblingElement(element)
+        while sibling:
+            index += 1
+            sibling = client.ViewWalker.GetPreviousSiblingElement(sibling)
+        path.append(index)
+        element = client.ViewWalker.GetParentElement(element)
+        SEARCH_METRICS.CountNavigation(index + 2)
+        if not element:
+            return None
+        if client.IUIAutomation.CompareElements(element, ancestorElement):
+            path.reverse()
+            return tuple(path)
+    return None
+
+
+def _WalkControlWithPath(control: Control, includeTop: bool = False, maxDepth: int = 0xFFFFFFFF, cacheRequest: CacheRequest = None):
+    """
+    Same as `WalkControl`, but yield 3 items tuple (control: Control, depth: int, path: Tuple[int, ...]),
+    path is the child indices from control.
+    """
+    if includeTop:
+        yield control, 0, ()
+    if maxDepth <= 0:
+        return
+    depth = 0
+    child = control.GetFirstChildControl(cacheRequest)
+    controlList = [child]
+    indexList = [0]  # index of controlList[i] in its siblings
+    pathList = []  # child indices of the ancestors of controlList[-1]
+    while depth >= 0:
+        lastControl = controlList[-1]
+        if lastControl:
+            index = indexList[depth]
+            yield lastControl, depth + 1, tuple(pathList) + (index, )
+            child = lastControl.GetNextSiblingControl(cacheRequest)
+            controlList[depth] = child
+            indexList[depth] = index + 1
+            if depth + 1 < maxDepth:
+                child = lastControl.GetFirstChildControl(cacheRequest)
+                if child:
+                    depth += 1
+                    controlList.append(child)
+                    indexList.append(0)
+                    pathList.append(index)
+        else:
+            del controlList[depth]
+            del indexList[depth]
+            if pathList:
+                pathList.pop()
+            depth -= 1
+
+
+def _WalkControlBreadthFirst(control: Control, includeTop: bool = False, maxDepth: int = 0xFFFFFFFF, cacheRequest: CacheRequest = None):
+    """
+    Same as `_WalkControlWithPath`, but visit controls level by level.
+    """
+    if includeTop:
+        yield control, 0, ()
+    level = [(control, ())]
+    depth = 0
+    while level and depth < maxDepth:
+        depth += 1
+        nextLevel = []
+        for parent, parentPath in level:
+            child = parent.GetFirstChildControl(cacheRequest)
+            index = 0
+            while child:
+                path = parentPath + (index, )
+                yield child, depth, path
+                if depth < maxDepth:
+                    nextLevel.append((child, path))
+                child = child.GetNextSiblingControl(cacheRequest)
+                index += 1
+        level = nextLevel
+
+
+def _WalkControlIterativeDeepening(control: Control, includeTop: bool = False, maxDepth: int = 0xFFFFFFFF, cacheRequest: CacheRequest = None, visitCounter: List[int] = None):
+    """
+    Same as `_WalkControlWithPath`, but walk depth first with depth limit 1, 2, ... maxDepth
+    and only yield the controls at the limit depth, so controls are yielded level by level.
+    Stop if no control is at the limit depth.
+    visitCounter: List[int], if not None, visitCounter[0] is increased by the count of visited controls, including revisits.
+    """
+    if includeTop:
+        yield control, 0, ()
+    limit = 0
+    while limit < maxDepth:
+        limit += 1
+        found = False
+        for child, depth, path in _WalkControlWithPath(control, False, limit, cacheRequest):
+            if visitCounter is not None:
+                visitCounter[0] += 1
+            if depth == limit:
+                found = True
+                yield child, depth, path
+        if not found:
+            break
+
+
+def WalkControl(control: Control, includeTop: bool = False, maxDepth: int = 0xFFFFFFFF, cacheRequest: CacheRequest = None):
     """
     control: `Control` or its subclass.
     includeTop: bool, if True, yield (control, 0) first.
     maxDepth: int, enum depth.
+    cacheRequest: `CacheRequest`, if not None, every walker step builds the cache of the yielded control.
     Yield 2 items tuple (control: Control, depth: int).
     """
     if includeTop:
@@ -7779,16 +9158,16 @@ def WalkControl(control: Control, includeTop: bool = False, maxDepth: int = 0xFF
     if maxDepth <= 0:
         return
     depth = 0
-    child = control.GetFirstChildControl()
+    child = control.GetFirstChildControl(cacheRequest)
     controlList = [child]
     while depth >= 0:
         lastControl = controlList[-1]
         if lastControl:
             yield lastControl, depth + 1
-            child = lastControl.GetNextSiblingControl()
+            child = lastControl.GetNextSiblingControl(cacheRequest)
             controlList[depth] = child
             if depth + 1 < maxDepth:
-                child = lastControl.GetFirstChildControl()
+                child = lastControl.GetFirstChildControl(cacheRequest)
                 if child:
                     depth += 1
                     controlList.append(child)
@@ -7898,25 +9277,41 @@ def EnumAndLogControlAncestors(control: Control, showAllName: bool = True, showP
         LogControl(control, i, showAllName, showPid)
 
 
-def FindControl(control: Control, compare: Callable[[Control, int], bool], maxDepth: int = 0xFFFFFFFF, findFromSelf: bool = False, foundIndex: int = 1) -> Control:
+def FindControl(control: Control, compare: Callable[[Control, int], bool], maxDepth: int = 0xFFFFFFFF, findFromSelf: bool = False, foundIndex: int = 1, cacheRequest: CacheRequest = None,
+                traverseStrategy: int = TraverseStrategy.DepthFirst) -> Control:
     """
     control: `Control` or its subclass.
     compare: Callable[[Control, int], bool], function(control: Control, depth: int) -> bool.
     maxDepth: int, enum depth.
     findFromSelf: bool, if False, do not compare self.
-    foundIndex: int, starts with 1, >= 1.
-    Return `Control` subclass or None if not find.
+    foundIndex: int, starts with 1, >= 1, counts in the traverse order.
+    cacheRequest: `CacheRequest`, if not None, compare reads cached properties and the found control keeps them.
+    traverseStrategy: int, a value in class `TraverseStrategy`.
+    Return `Control` subclass or None if not find, the found control has attributes
+        traverseCount: int, controls compared,
+        visitCount: int, controls visited, larger than traverseCount for TraverseStrategy.IterativeDeepening,
+        foundPath: Tuple[int, ...], child indices from control.
     """
     foundCount = 0
     if not control:
         control = GetRootControl()
     traverseCount = 0
-    for child, depth in WalkControl(control, findFromSelf, maxDepth):
+    visitCounter = None
+    if traverseStrategy == TraverseStrategy.BreadthFirst:
+        walker = _WalkControlBreadthFirst(control, findFromSelf, maxDepth, cacheRequest)
+    elif traverseStrategy == TraverseStrategy.IterativeDeepening:
+        visitCounter = [int(findFromSelf)]
+        walker = _WalkControlIterativeDeepening(control, findFromSelf, maxDepth, cacheRequest, visitCounter)
+    else:
+        walker = _WalkControlWithPath(control, findFromSelf, maxDepth, cacheRequest)
+    for child, depth, path in walker:
         traverseCount += 1
         if compare(child, depth):
             foundCount += 1
             if foundCount == foundIndex:
                 child.traverseCount = traverseCount
+                child.visitCount = visitCounter[0] if visitCounter else traverseCount
+                child.foundPath = path
                 return child
 
 
@@ -1,17 +1,19 @@
 from datetime import datetime, timedelta
+from concurrent.futures import Future, InvalidStateError
 from . import uiautomation as uia
+from .clipboard import CLIPBOARD, Clipboard, MemoryClipboardBackend, Win32ClipboardBackend
 from PIL import ImageGrab
-import win32clipboard
 import win32process
 import win32gui
 import win32api
 import win32con
-import pyperclip
-import ctypes
 import psutil
 import shutil
 import winreg
+import threading
+import functools
 import logging
+import queue
 import time
 import os
 import re
@@ -37,6 +39,14 @@ def GetPathByHwnd(hwnd):
         print(f"Error: {e}")
         return None
 
+def GetProcessKey(hwnd):
+    """窗口所属进程的标识 '进程id-启动时间'，进程重启后必然不同，获取失败时返回None"""
+    try:
+        thread_id, process_id = win32process.GetWindowThreadProcessId(hwnd)
+        return f'{process_id}-{int(psutil.Process(process_id).create_time())}'
+    except Exception:
+        return None
+
 def GetVersionByPath(file_path):
     try:
         info = win32api.GetFileVersionInfo(file_path, '\\')
@@ -55,40 +65,8 @@ def IsRedPixel(uicontrol):
     img = ImageGrab.grab(bbox=bbox, all_screens=True)
     return any(p[0] > p[1] and p[0] > p[2] for p in img.getdata())
 
-class DROPFILES(ctypes.Structure):
-    _fields_ = [
-    ("pFiles", ctypes.c_uint),
-    ("x", ctypes.c_long),
-    ("y", ctypes.c_long),
-    ("fNC", ctypes.c_int),
-    ("fWide", ctypes.c_bool),
-    ]
-
-pDropFiles = DROPFILES()
-pDropFiles.pFiles = ctypes.sizeof(DROPFILES)
-pDropFiles.fWide = True
-matedata = bytes(pDropFiles)
-
 def SetClipboardText(text: str):
-    pyperclip.copy(text)
-    # if not isinstance(text, str):
-    #     raise TypeError(f"参数类型必须为str --> {text}")
-    # t0 = time.time()
-    # while True:
-    #     if time.time() - t0 > 10:
-    #         raise TimeoutError(f"设置剪贴板超时！ --> {text}")
-    #     try:
-    #         win32clipboard.OpenClipboard()
-    #         win32clipboard.EmptyClipboard()
-    #         win32clipboard.SetClipboardData(win32con.CF_UNICODETEXT, text)
-    #         break
-    #     except:
-    #         pass
-    #     finally:
-    #         try:
-    #             win32clipboard.CloseClipboard()
-    #         except:
-    #             pass
+    CLIPBOARD.settext(text)
 
 try:
     from anytree import Node, RenderTree
@@ -137,50 +115,22 @@ def SetClipboardFiles(paths):
     for file in paths:
         if not os.path.exists(file):
             raise FileNotFoundError(f"file ({file}) not exists!")
-    files = ("\0".join(paths)).replace("/", "\\")
-    data = files.encode("U16")[2:]+b"\0\0"
-    t0 = time.time()
-    while True:
-        if time.time() - t0 > 10:
-            raise TimeoutError(f"设置剪贴板文件超时！ --> {paths}")
-        try:
-            win32clipboard.OpenClipboard()
-            win32clipboard.EmptyClipboard()
-            win32clipboard.SetClipboardData(win32clipboard.CF_HDROP, matedata+data)
-            break
-        except:
-            pass
-        finally:
-            try:
-                win32clipboard.CloseClipboard()
-            except:
-                pass
+    CLIPBOARD.setfiles(paths)
 
 def PasteFile(folder):
     folder = os.path.realpath(folder)
     if not os.path.exists(folder):
         os.makedirs(folder)
 
-    t0 = time.time()
-    while True:
-        if time.time() - t0 > 10:
-            raise TimeoutError(f"读取剪贴板文件超时！")
-        try:
-            win32clipboard.OpenClipboard()
-            if win32clipboard.IsClipboardFormatAvailable(win32clipboard.CF_HDROP):
-                files = win32clipboard.GetClipboardData(win32clipboard.CF_HDROP)
-                for file in files:
-                    filename = os.path.basename(file)
-                    dest_file = os.path.join(folder, filename)
-                    shutil.copy2(file, dest_file)
-                    return True
-            else:
-                print("剪贴板中没有文件")
-                return False
-        except:
-            pass
-        finally:
-            win32clipboard.CloseClipboard()
+    files = CLIPBOARD.getfiles()
+    if files is None:
+        print("剪贴板中没有文件")
+        return False
+    for file in files:
+        filename = os.path.basename(file)
+        dest_file = os.path.join(folder, filename)
+        shutil.copy2(file, dest_file)
+        return True
 
 def GetText(HWND):
     length = win32gui.SendMessage(HWND, win32con.WM_GETTEXTLENGTH)*2
@@ -225,30 +175,11 @@ def FindWinEx(HWND, classname=None, name=None) -> list:
         hwnds = hwnds_classname + hwnds_name
     return hwnds
 
-def ClipboardFormats(unit=0, *units):
-    units = list(units)
-    win32clipboard.OpenClipboard()
-    u = win32clipboard.EnumClipboardFormats(unit)
-    win32clipboard.CloseClipboard()
-    units.append(u)
-    if u:
-        units = ClipboardFormats(u, *units)
-    return units
+def ClipboardFormats():
+    return CLIPBOARD.formats()
 
 def ReadClipboardData():
-    Dict = {}
-    for i in ClipboardFormats():
-        if i == 0:
-            continue
-        win32clipboard.OpenClipboard()
-        try:
-            filenames = win32clipboard.GetClipboardData(i)
-            win32clipboard.CloseClipboard()
-        except:
-            win32clipboard.CloseClipboard()
-            raise ValueError
-        Dict[str(i)] = filenames
-    return Dict
+    return {str(i): data for i, data in CLIPBOARD.read().items()}
 
 def ParseWeChatTime(time_str):
     """
@@ -294,24 +225,192 @@ def ParseWeChatTime(time_str):
 
 
 def RollIntoView(win, ele, equal=False):
-    if ele.BoundingRectangle.top < win.BoundingRectangle.top:
+    if ele.CurrentBoundingRectangle.top < win.CurrentBoundingRectangle.top:
         # 上滚动
         while True:
             win.WheelUp(wheelTimes=1, waitTime=0.1)
-            if ele.BoundingRectangle.top >= win.BoundingRectangle.top:
+            if ele.CurrentBoundingRectangle.top >= win.CurrentBoundingRectangle.top:
                 break
 
-    elif ele.BoundingRectangle.bottom >= win.BoundingRectangle.bottom:
+    elif ele.CurrentBoundingRectangle.bottom >= win.CurrentBoundingRectangle.bottom:
         # 下滚动
         while True:
             win.WheelDown(wheelTimes=1, waitTime=0.1)
             if equal:
-                if ele.BoundingRectangle.bottom <= win.BoundingRectangle.bottom:
+                if ele.CurrentBoundingRectangle.bottom <= win.CurrentBoundingRectangle.bottom:
                     break
             else:
-                if ele.BoundingRectangle.bottom < win.BoundingRectangle.bottom:
+                if ele.CurrentBoundingRectangle.bottom < win.CurrentBoundingRectangle.bottom:
                     break
 
+
+class MessageId(tuple):
+    """消息id，由消息控件的RuntimeId组成的不可变元组
+
+    可哈希、可比较，最近用到的相同RuntimeId共用同一个实例；str()为稳定的字符串形式，如'42.1234.5.67'，可由FromString还原
+    """
+    __slots__ = ()
+    _interned = {}  # 与元组相等的MessageId作为自身的键，按加入顺序淘汰
+    _interned_maxsize = 10000
+
+    def __new__(cls, runtimeid=()):
+        key = tuple(int(i) for i in runtimeid)
+        msgid = cls._interned.get(key)
+        if msgid is None:
+            msgid = super().__new__(cls, key)
+            if len(cls._interned) >= cls._interned_maxsize:
+                cls._interned.pop(next(iter(cls._interned)), None)
+            cls._interned[msgid] = msgid
+        return msgid
+
+    def __str__(self):
+        return '.'.join([str(i) for i in self])
+
+    def __repr__(self):
+        return f"MessageId('{self}')"
+
+    @classmethod
+    def FromControl(cls, control):
+        """由消息控件的RuntimeId生成消息id"""
+        return cls(control.GetRuntimeId())
+
+    @classmethod
+    def FromString(cls, text):
+        """由str(MessageId)的结果还原消息id"""
+        return cls(text.split('.')) if text else cls()
+
+
+class MessageIdSet:
+    """已读消息id集合
+    
+    哈希集合判重，O(1)；按加入顺序淘汰，超过上限时丢弃最早加入的id
+
+    Args:
+        msgids (iterable, optional): 初始的消息id
+        maxsize (int, optional): 最多保留的id数量，应大于聊天窗口中同时加载的消息数
+    """
+    def __init__(self, msgids=None, maxsize=1000):
+        self.maxsize = maxsize
+        self._ids = {}  # dict保持插入顺序，当作有序集合使用
+        if msgids:
+            self.update(msgids)
+
+    def __repr__(self) -> str:
+        return f"<wxauto MessageIdSet at {hex(id(self))} ({len(self._ids)}/{self.maxsize})>"
+
+    def __contains__(self, msgid):
+        return msgid in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def add(self, msgid):
+        """加入一个消息id，已存在时不改变其顺序"""
+        if msgid in self._ids:
+            return
+        self._ids[msgid] = None
+        if len(self._ids) > self.maxsize:
+            del self._ids[next(iter(self._ids))]
+
+    def update(self, msgids):
+        """按顺序加入多个消息id"""
+        for msgid in msgids:
+            self.add(msgid)
+
+    def discard(self, msgid):
+        self._ids.pop(msgid, None)
+
+    def clear(self):
+        self._ids.clear()
+
+class PollInterval:
+    """按活跃程度自适应的轮询间隔
+
+    有新消息后回到最小间隔，无新消息时按倍数退避，不超过最大间隔
+
+    Args:
+        minimum (float, optional): 最小轮询间隔（秒）
+        maximum (float, optional): 最大轮询间隔（秒）
+        factor (float, optional): 空闲时每次轮询后间隔扩大的倍数
+    """
+    def __init__(self, minimum=1, maximum=30, factor=2):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.interval = minimum
+        self.last_active = None  # 最近一次轮询到新消息的时间
+        self.next_poll = 0
+        self.skipped = 0  # 相比按最小间隔轮询，退避而省下的轮询次数
+
+    def __repr__(self) -> str:
+        return f"<wxauto PollInterval at {hex(id(self))} ({self.interval}s)>"
+
+    def due(self, now=None):
+        """是否到了下一次轮询的时间"""
+        return (now or time.time()) >= self.next_poll
+
+    def update(self, active, now=None):
+        """记录一次轮询的结果，返回下一次轮询的间隔
+
+        Args:
+            active (bool): 本次轮询是否获取到新消息
+        """
+        now = now or time.time()
+        if active:
+            self.interval = self.minimum
+            self.last_active = now
+        else:
+            self.interval = min(self.interval * self.factor, self.maximum)
+        self.skipped += max(int(self.interval / self.minimum) - 1, 0)
+        self.next_poll = now + self.interval
+        return self.interval
+
+class TokenBucket:
+    """令牌桶限速
+
+    每秒补充rate个令牌，最多积攒capacity个，每次发送消耗一个令牌
+
+    Args:
+        rate (float): 每秒补充的令牌数，为0或None时不限速
+        capacity (int, optional): 令牌上限，即可连续发送的数量，默认与rate相同
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(rate or 1, 1)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"<wxauto TokenBucket at {hex(id(self))} ({self.rate}/s)>"
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self._tokens + (now - self._last) * self.rate, self.capacity)
+        self._last = now
+
+    def delay(self, n=1):
+        """距离有n个可用令牌还需等待的秒数"""
+        if not self.rate:
+            return 0
+        with self._lock:
+            self._refill()
+            return max(n - self._tokens, 0) / self.rate
+
+    def acquire(self, n=1):
+        """令牌足够时消耗n个并返回True，否则不消耗并返回False"""
+        if not self.rate:
+            return True
+        with self._lock:
+            self._refill()
+            if self._tokens < n:
+                return False
+            self._tokens -= n
+            return True
+
 wxlog = logging.getLogger('wxauto')
 wxlog.setLevel(logging.DEBUG)
 console_handler = logging.StreamHandler()
@@ -328,3 +427,121 @@ def set_debug(debug: bool):
     else:
         wxlog.setLevel(logging.INFO)
         console_handler.setLevel(logging.INFO)
+
+
+# 界面操作锁：同一时刻只允许一个线程操作微信界面
+UI_LOCK = threading.RLock()
+
+def uilocked(func):
+    """装饰器：持有UI_LOCK执行，用于点击、输入、切换窗口等前台界面操作"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with UI_LOCK:
+            return func(*args, **kwargs)
+    return wrapper
+
+class UIActionWorker:
+    """界面操作工作线程
+
+    按提交顺序逐个执行界面操作（如保存图片、文件、语音转文字），每个操作返回一个Future；
+    线程内已初始化UIAutomation，执行操作时持有UI_LOCK，避免与其他线程的界面操作交错。
+    不要把其他线程中创建的控件传给操作，应传入窗口句柄、消息id等，在操作中重新定位控件
+
+    Args:
+        name (str, optional): 线程名
+    """
+    def __init__(self, name='wxauto-ui-worker'):
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"<wxauto UIActionWorker {self.name} ({self._queue.qsize()} pending)>"
+
+    @property
+    def pending(self):
+        """排队中的操作数量"""
+        return self._queue.qsize()
+
+    def submit(self, func, *args, timeout=None, **kwargs):
+        """提交一个界面操作
+
+        Args:
+            func (function): 要执行的操作
+            timeout (float, optional): 提交后超过该秒数仍未完成则Future抛出TimeoutError，工作线程卡住时调用方也不会一直等待；
+                尚未开始的操作不再执行，已开始的操作无法中断，其结果被丢弃。为None时不限时
+
+        Returns:
+            Future: 操作的结果
+        """
+        future = Future()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._queue.put((func, args, kwargs, future))
+        if timeout is not None:
+            timer = threading.Timer(timeout, self._expire, (future, func))
+            timer.daemon = True
+            timer.start()
+            future.add_done_callback(lambda f: timer.cancel())
+        return future
+
+    @staticmethod
+    def _expire(future, func):
+        try:
+            future.set_exception(TimeoutError(f'界面操作超时：{func}'))
+        except InvalidStateError:  # 已完成
+            pass
+
+    def stop(self, wait=True):
+        """执行完已提交的操作后停止线程"""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._queue.put(None)
+            self._thread = None
+        if wait:
+            thread.join()
+
+    def _run(self):
+        initializer = uia.UIAutomationInitializerInThread()
+        while True:
+            task = self._queue.get()
+            if task is None:
+                break
+            func, args, kwargs, future = task
+            if future.done():  # 排队时已超时
+                continue
+            try:
+                if not future.set_running_or_notify_cancel():
+                    continue
+            except RuntimeError:  # 刚好在此时超时
+                continue
+            try:
+                with UI_LOCK:
+                    result = func(*args, **kwargs)
+            except Exception as e:
+                wxlog.debug(f'界面操作失败：{func} {e}')
+                result, error = None, e
+            else:
+                error = None
+            try:
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+            except InvalidStateError:  # 执行时已超时，结果丢弃
+                wxlog.debug(f'界面操作完成时已超时：{func}')
+        del initializer
+
+_ui_worker = None
+
+def GetUIActionWorker():
+    """获取共享的界面操作工作线程"""
+    global _ui_worker
+    if _ui_worker is None:
+        _ui_worker = UIActionWorker()
+    return _ui_worker
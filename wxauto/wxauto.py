@@ -8,6 +8,7 @@ from . import uiautomation as uia
 from .languages import *
 from .utils import *
 from .elements import *
+from .msgstore import MessageStore
 from .errors import *
 from .color import *
 import time
@@ -28,15 +29,19 @@ class WeChat(WeChatBase):
     def __init__(
             self, 
             language: Literal['cn', 'cn_t', 'en'] = 'cn', 
-            debug: bool = False
+            debug: bool = False,
+            store: MessageStore = None
         ) -> None:
         """微信UI自动化实例
 
         Args:
             language (str, optional): 微信客户端语言版本, 可选: cn简体中文  cn_t繁体中文  en英文, 默认cn, 即简体中文
+            store (MessageStore, optional): 本地消息库，记录新消息，启动时由其恢复已读消息id
         """
         set_debug(debug)
         self.language = language
+        self.store = store
+        self._listenwakes = set()  # Listener的唤醒事件，监听对象增减时全部置位
         # self._checkversion()
         self._show()
         MainControl1 = [i for i in self.UiaAPI.GetChildren() if not i.ClassName][0]
@@ -64,15 +69,28 @@ class WeChat(WeChatBase):
         
         # 初始化聊天列表，以B开头
         self.B_Search = self.SessionBox.EditControl(Name=self._lang('搜索'))
+        self.sessionindex = SessionIndex(self.SessionBox.ListControl())
         
         # 初始化聊天栏，以C开头
         self.C_MsgList = self.ChatBox.ListControl(Name=self._lang('消息'))
         
         self.nickname = self.A_MyIcon.Name
-        msgs_ = self.GetAllMessage()
-        self.usedmsgid = [i[-1] for i in msgs_]
+        self.processkey = GetProcessKey(self.HWND)  # 消息id只在同一微信进程内有效
+        who = self.CurrentChat()
+        msgids = store.msgids(who, self.processkey, limit=WxParam.MSGID_CACHE_SIZE) if store is not None else []
+        if msgids:
+            self.usedmsgid = MessageIdSet(msgids, maxsize=WxParam.MSGID_CACHE_SIZE)
+        else:
+            msgids = self._getmsgids(self._getmsgitems())
+            self.usedmsgid = MessageIdSet(msgids, maxsize=WxParam.MSGID_CACHE_SIZE)
+            if store is not None and who:
+                store.addids(who, msgids, self.processkey)
         print(f'初始化成功，获取到已登录窗口：{self.nickname}')
     
+    def __del__(self):
+        if hasattr(self, 'sessionindex'):
+            self.sessionindex.Close()
+
     def _checkversion(self):
         self.HWND = FindWindow(classname='WeChatMainWndForPC')
         wxpath = GetPathByHwnd(self.HWND)
@@ -87,7 +105,28 @@ class WeChat(WeChatBase):
         win32gui.ShowWindow(self.HWND, 1)
         win32gui.SetWindowPos(self.HWND, -1, 0, 0, 0, 0, 3)
         win32gui.SetWindowPos(self.HWND, -2, 0, 0, 0, 0, 3)
-        self.UiaAPI.SwitchToThisWindow()
+        uia.SwitchToThisWindow(self.HWND)  # 只用窗口句柄，界面操作线程也可调用
+        time.sleep(uia.OPERATION_WAIT_TIME)
+
+    def _geteditbox(self, who=None):
+        """定位主窗口中要输入消息的编辑框，必要时先切换到该聊天
+
+        Args:
+            who (str, optional): 聊天对象名，为None时为当前聊天页面
+
+        Returns:
+            uia.EditControl: 编辑框控件
+        """
+        if who:
+            try:
+                editbox = self.ChatBox.EditControl(searchDepth=10)
+                if who in self.CurrentChat() and who in editbox.Name:
+                    return editbox
+            except:
+                pass
+            self.ChatWith(who)
+            return self.ChatBox.EditControl(Name=who, searchDepth=10)
+        return self.ChatBox.EditControl(searchDepth=10)
 
     def _refresh(self):
         self.UiaAPI.SendKeys('{Ctrl}{Alt}w')
@@ -97,7 +136,7 @@ class WeChat(WeChatBase):
     def _get_friend_details(self):
         params = ['昵称：', '微信号：', '地区：', '备注', '电话', '标签', '共同群聊', '个性签名', '来源', '朋友权限', '描述', '实名', '企业']
         info = {}
-        controls = GetAllControlList(self.ChatBox)
+        controls = [i for i in self.ChatBox.Snapshot() if i.Name]
         for _, i in enumerate(controls):
             rect = i.BoundingRectangle
             text = i.Name
@@ -125,6 +164,7 @@ class WeChat(WeChatBase):
                 break
             self.SessionBox.WheelDown(wheelTimes=3, interval=0)
 
+    @uilocked
     def GetFriendDetails(self, n=None, timeout=0xFFFFF):
         """获取所有好友详情信息
         
@@ -173,7 +213,7 @@ class WeChat(WeChatBase):
                 amount = int([i for i in SessionItem.GetFirstChildControl().GetChildren() if type(i) == uia.TextControl][0].Name)
             except:
                 pass
-        sessionname = SessionItem.Name if SessionItem.ButtonControl().Name == 'SessionListItem' else SessionItem.ButtonControl().Name
+        sessionname = SessionName(SessionItem.Name, SessionItem.ButtonControl().Name)
         return sessionname, amount
     
     def CheckNewMessage(self):
@@ -181,34 +221,26 @@ class WeChat(WeChatBase):
         self._show()
         return IsRedPixel(self.A_ChatIcon)
     
+    @uilocked
     def GetNextNewMessage(self, savepic=False, savefile=False, savevoice=False, timeout=10):
         """获取下一个新消息"""
-        msgs_ = self.GetAllMessage()
-        msgids = [i[-1] for i in msgs_]
-
         if not self.usedmsgid:
-            self.usedmsgid = msgids
+            self.usedmsgid.update(self._getmsgids(self._getmsgitems()))
         
-        newmsgids = [i for i in msgids if i not in self.usedmsgid]
-        oldmsgids = [i for i in self.usedmsgid if i in msgids]
-        if newmsgids and oldmsgids:
-            MsgItems = self.C_MsgList.GetChildren()
-            msgids = [''.join([str(i) for i in i.GetRuntimeId()]) for i in MsgItems]
-            new = []
-            for i in range(len(msgids)-1, -1, -1):
-                if msgids[i] in self.usedmsgid:
-                    new = msgids[i+1:]
-                    break
-            NewMsgItems = [
-                i for i in MsgItems 
-                if ''.join([str(i) for i in i.GetRuntimeId()]) in new
-                and i.ControlTypeName == 'ListItemControl'
-            ]
+        # 从最后一条消息向前找到已读消息，其后的都是新消息
+        NewMsgItems, msgids, found = self._gettailmsgitems(self.C_MsgList, self.usedmsgid) if self.C_MsgList.Exists(0.2) else ([], [], False)
+        if found:
+            NewMsgItems = [i for i in NewMsgItems if i.ControlTypeName == 'ListItemControl']
             if NewMsgItems:
                 wxlog.debug('获取当前窗口新消息')
                 msgs = self._getmsgs(NewMsgItems, savepic, savefile, savevoice)
-                self.usedmsgid = msgids
-                return {self.CurrentChat(): msgs}
+                self.usedmsgid.update(msgids)
+                who = self.CurrentChat()
+                if self.store is not None and who:
+                    self.store.add(who, msgs, self.processkey)
+                elif self.store is not None:
+                    wxlog.debug('获取不到当前聊天对象名，新消息不写入消息库')
+                return {who: msgs}
 
         if self.CheckNewMessage():
             wxlog.debug('获取其他窗口新消息')
@@ -225,13 +257,17 @@ class WeChat(WeChatBase):
                 self.ChatWith(session)
                 NewMsgItems = self.C_MsgList.GetChildren()[-sessiondict[session]:]
                 msgs = self._getmsgs(NewMsgItems, savepic, savefile, savevoice)
-                msgs_ = self.GetAllMessage()
-                self.usedmsgid = [i[-1] for i in msgs_]
+                msgids = self._getmsgids(self._getmsgitems())
+                self.usedmsgid.update(msgids)
+                if self.store is not None:
+                    self.store.add(session, msgs, self.processkey)
+                    self.store.addids(session, msgids, self.processkey)
                 return {session:msgs}
         else:
             wxlog.debug('没有新消息')
             return {}
     
+    @uilocked
     def GetAllNewMessage(self, max_round=10):
         """获取所有新消息
         
@@ -260,7 +296,7 @@ class WeChat(WeChatBase):
         Returns:
             SessionList (dict): 聊天对象列表，键为聊天对象名，值为新消息条数
         """
-        self.SessionItem = self.SessionBox.ListItemControl()
+        self.SessionItem = self.SessionBox.ListItemControl(cacheRequest=LISTITEM_CACHE_REQUEST)
         if reset:
             self.SessionItemList = []
         SessionList = {}
@@ -274,7 +310,7 @@ class WeChat(WeChatBase):
                     self.SessionItemList.append(name)
                 if name not in SessionList:
                     SessionList[name] = amount
-            self.SessionItem = self.SessionItem.GetNextSiblingControl()
+            self.SessionItem = self.SessionItem.GetNextSiblingControl(LISTITEM_CACHE_REQUEST)
             if not self.SessionItem:
                 break
             
@@ -300,6 +336,7 @@ class WeChat(WeChatBase):
         sessions = self.SessionBox.ListControl()
         return [SessionElement(i) for i in sessions.GetChildren()]
     
+    @uilocked
     def ChatWith(self, who, timeout=2):
         '''打开某个聊天框
         
@@ -311,9 +348,9 @@ class WeChat(WeChatBase):
             chatname ( str ): 匹配值第一个的完整名字
         '''
         self._show()
-        sessiondict = self.GetSessionList(True)
-        if who in list(sessiondict.keys())[:-1]:
-            self.SessionBox.ListItemControl(RegexName=who).Click(simulateMove=False)
+        item = self.sessionindex.Get(who)
+        if item:
+            item.Click(simulateMove=False)
             return who
         else:
             self.UiaAPI.SendKeys('{Ctrl}f', waitTime=1)
@@ -335,6 +372,7 @@ class WeChat(WeChatBase):
                 target_control.Click(simulateMove=False)
                 return chatname
     
+    @uilocked
     def AtAll(self, msg=None, who=None):
         """@所有人
         
@@ -348,22 +386,10 @@ class WeChat(WeChatBase):
             return None
         
         self._show()
-        if who:
-            try:
-                editbox = self.ChatBox.EditControl(searchDepth=10)
-                if who in self.CurrentChat() and who in editbox.Name:
-                    pass
-                else:
-                    self.ChatWith(who)
-                    editbox = self.ChatBox.EditControl(Name=who, searchDepth=10)
-            except:
-                self.ChatWith(who)
-                editbox = self.ChatBox.EditControl(Name=who, searchDepth=10)
-        else:
-            editbox = self.ChatBox.EditControl(searchDepth=10)
+        editbox = self._geteditbox(who)
         editbox.SendKeys('@')
         atwnd = self.UiaAPI.PaneControl(ClassName='ChatContactMenu')
-        if atwnd.Exists(maxSearchSeconds=0.1):
+        if atwnd.Exists(maxSearchSeconds=0.1, waitEvents=WxParam.EVENT_WAIT):
             atwnd.ListItemControl(Name='所有人').Click(simulateMove=False)
             if msg:
                 if not msg.startswith('\n'):
@@ -372,6 +398,7 @@ class WeChat(WeChatBase):
             else:
                 editbox.SendKeys('{Enter}')
 
+    @uilocked
     def SendMsg(self, msg, who=None, clear=True, at=None):
         """发送文本消息
 
@@ -387,47 +414,11 @@ class WeChat(WeChatBase):
             return None
         if not msg and not at:
             return None
-        if who:
-            try:
-                editbox = self.ChatBox.EditControl(searchDepth=10)
-                if who in self.CurrentChat() and who in editbox.Name:
-                    pass
-                else:
-                    self.ChatWith(who)
-                    editbox = self.ChatBox.EditControl(Name=who, searchDepth=10)
-            except:
-                self.ChatWith(who)
-                editbox = self.ChatBox.EditControl(Name=who, searchDepth=10)
-        else:
-            editbox = self.ChatBox.EditControl(searchDepth=10)
-        if clear:
-            editbox.SendKeys('{Ctrl}a', waitTime=0)
+        editbox = self._geteditbox(who)
         self._show()
-        if not editbox.HasKeyboardFocus:
-            editbox.Click(simulateMove=False)
-        
-        if at:
-            if isinstance(at, str):
-                at = [at]
-            for i in at:
-                editbox.SendKeys('@'+i)
-                atwnd = self.UiaAPI.PaneControl(ClassName='ChatContactMenu')
-                if atwnd.Exists(maxSearchSeconds=0.1):
-                    atwnd.SendKeys('{ENTER}')
-                    if msg and not msg.startswith('\n'):
-                        msg = '\n' + msg
-
-        if msg:
-            t0 = time.time()
-            while True:
-                if time.time() - t0 > 10:
-                    raise TimeoutError(f'发送消息超时 --> {editbox.Name} - {msg}')
-                SetClipboardText(msg)
-                editbox.SendKeys('{Ctrl}v')
-                if editbox.GetValuePattern().Value:
-                    break
-        editbox.SendKeys('{Enter}')
+        self._sendtext(editbox, msg, clear, at)
         
+    @uilocked
     def SendFiles(self, filepath, who=None):
         """向当前聊天窗口发送文件
         
@@ -473,21 +464,117 @@ class WeChat(WeChatBase):
             else:
                 editbox = self.ChatBox.EditControl()
             editbox.SendKeys('{Ctrl}a', waitTime=0)
-            t0 = time.time()
-            while True:
-                if time.time() - t0 > 10:
-                    raise TimeoutError(f'发送文件超时 --> {filelist}')
+            def paste():
                 SetClipboardFiles(filelist)
                 time.sleep(0.2)
                 editbox.SendKeys('{Ctrl}v')
-                if editbox.GetValuePattern().Value:
-                    break
+            with CLIPBOARD.preserve(WxParam.CLIPBOARD_RESTORE):
+                ConfirmInput(editbox, paste, error=f'发送文件超时 --> {filelist}')
             editbox.SendKeys('{Enter}')
             return True
         else:
             Warnings.lightred('所有文件都无法成功发送', stacklevel=2)
             return False
-            
+
+    def _searchchat(self, who, timeout=2):
+        """通过搜索框打开完全匹配的聊天，搜索结果出现即点击，不做固定等待
+
+        Args:
+            who (str): 聊天对象名
+            timeout (num, optional): 等待搜索结果的超时时间
+
+        Returns:
+            bool: 是否找到并打开
+        """
+        self.UiaAPI.SendKeys('{Ctrl}f', waitTime=0)
+        self.B_Search.SendKeys('{Ctrl}a', waitTime=0)
+        self.B_Search.SendKeys(who, waitTime=0)
+        target_control = self.SessionBox.TextControl(Name=f"<em>{who}</em>")
+        if target_control.Exists(timeout, waitEvents=WxParam.EVENT_WAIT):
+            target_control.Click(simulateMove=False)
+            return True
+        wxlog.debug(f'未找到搜索结果: {who}')
+        self._refresh()
+        return False
+
+    def Broadcast(self, targets, msg=None, files=None, checkpoint=None, timeout=2):
+        """向多个聊天对象群发同一条消息和/或文件，逐个返回结果
+
+        已单独打开聊天窗口的对象最先发送（直接在该窗口中发送），其次是聊天列表中可见的对象（直接点击），最后才通过搜索框打开；
+        搜索只接受完全匹配的结果，避免发给名字相近的人
+
+        Args:
+            targets (list): 聊天对象名列表，重复的只发送一次
+            msg (str, optional): 要发送的文本消息
+            files (str|list, optional): 要发送的文件路径
+            checkpoint (str, optional): 断点文件路径，每发送成功一个对象记录一行，再次调用时跳过已记录的对象；
+                同时发送文本和文件时，文本发送成功后先记录一行 "聊天对象名\tmsg"，文件失败后再次调用只补发文件
+            timeout (num, optional): 搜索聊天对象的超时时间
+
+        Yields:
+            dict: {'who': 聊天对象名, 'ok': 是否成功, 'error': 失败时的异常, 'open': 打开聊天耗时, 'send': 发送耗时}
+
+        Example:
+            >>> for result in wx.Broadcast(['张三', '李四'], msg='通知', checkpoint='broadcast.txt'):
+            ...     print(result['who'], result['ok'])
+        """
+        done, textdone = set(), set()
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint, encoding='utf-8') as f:
+                for line in f:
+                    name, _, part = line.rstrip('\n').partition('\t')
+                    if name:
+                        (textdone if part == 'msg' else done).add(name)
+
+        def mark(line):
+            if checkpoint:
+                with open(checkpoint, 'a', encoding='utf-8') as f:
+                    f.write(line + '\n')
+
+        targets = [i for i in dict.fromkeys(targets) if i not in done]
+        if not targets:
+            return
+        with UI_LOCK:
+            self._show()
+            sessions = self.sessionindex.Refresh()
+        opened = [i for i in targets if FindWindow(name=i, classname='ChatWnd')]
+        visible = [i for i in targets if i in sessions and i not in opened]
+        searched = [i for i in targets if i not in opened and i not in visible]
+        wxlog.debug(f'群发：已打开 {len(opened)}，列表可见 {len(visible)}，需搜索 {len(searched)}')
+
+        for who in opened + visible + searched:
+            result = {'who': who, 'ok': False, 'error': None, 'open': 0, 'send': 0}
+            t0 = time.time()
+            try:
+                with UI_LOCK:
+                    if who in opened:
+                        chat = self.listen.get(who) or ChatWnd(who, self.language, seed=False)
+                        sendmsg, sendfiles = chat.SendMsg, chat.SendFiles
+                    else:
+                        item = self.sessionindex.Get(who)
+                        if item:
+                            item.Click(simulateMove=False)
+                        elif not self._searchchat(who, timeout):
+                            raise TargetNotFoundError(f'未找到聊天对象：{who}')
+                        sendmsg = lambda text: self.SendMsg(text, who)
+                        sendfiles = lambda paths: self.SendFiles(paths, who)
+                    t1 = time.time()
+                    result['open'] = t1 - t0
+                    if msg and who not in textdone:
+                        sendmsg(msg)
+                        if files:
+                            mark(who + '\tmsg')
+                    if files and sendfiles(files) is False:
+                        raise FileNotFoundError(f'文件发送失败：{files}')
+                    result['send'] = time.time() - t1
+                result['ok'] = True
+            except Exception as e:
+                wxlog.debug(f'群发失败：{who} {e}')
+                result['error'] = e
+            if result['ok']:
+                mark(who)
+            yield result
+
     def GetAllMessage(self, savepic=False, savefile=False, savevoice=False):
         '''获取当前窗口中加载的所有聊天记录
         
@@ -499,10 +586,16 @@ class WeChat(WeChatBase):
         '''
         if not self.C_MsgList.Exists(0.2):
             return []
-        MsgItems = self.C_MsgList.GetChildren()
-        msgs = self._getmsgs(MsgItems, savepic, savefile=savefile, savevoice=savevoice)
+        msgs = self._getallmsgs(self.C_MsgList, savepic, savefile=savefile, savevoice=savevoice)
         return msgs
+
+    def _getmsgitems(self):
+        """获取当前聊天窗口中加载的所有消息控件，未打开聊天时返回空列表"""
+        if not self.C_MsgList.Exists(0.2):
+            return []
+        return self.C_MsgList.GetChildren(cacheRequest=LISTITEM_CACHE_REQUEST)
     
+    @uilocked
     def LoadMoreMessage(self):
         """加载当前聊天页面更多聊天信息
         
@@ -528,15 +621,14 @@ class WeChat(WeChatBase):
     
     def CurrentChat(self):
         '''获取当前聊天对象名'''
-        uia.SetGlobalSearchTimeout(1)
         try:
-            currentname = self.ChatBox.TextControl(searchDepth=15).Name
+            with uia.SearchTimeout(1):
+                currentname = self.ChatBox.TextControl(searchDepth=15).Name
             return currentname
         except:
             return None
-        finally:
-            uia.SetGlobalSearchTimeout(10)
 
+    @uilocked
     def GetNewFriends(self):
         """获取新的好友申请列表
         
@@ -559,6 +651,7 @@ class WeChat(WeChatBase):
         wxlog.debug(f'获取到 {len(AcceptableNewFriendsList)} 条新的好友申请')
         return AcceptableNewFriendsList
     
+    @uilocked
     def AddListenChat(self, who, savepic=False, savefile=False, savevoice=False):
         """添加监听对象
         
@@ -571,11 +664,13 @@ class WeChat(WeChatBase):
         exists = uia.WindowControl(searchDepth=1, ClassName='ChatWnd', Name=who).Exists(maxSearchSeconds=0.1)
         if not exists:
             self.ChatWith(who)
-            self.SessionBox.ListItemControl(RegexName=who).DoubleClick(simulateMove=False)
-        self.listen[who] = ChatWnd(who, self.language)
+            item = self.sessionindex.Get(who) or self.SessionBox.ListItemControl(RegexName=who, traverseStrategy=uia.TraverseStrategy.BreadthFirst)
+            item.DoubleClick(simulateMove=False)
+        self.listen[who] = ChatWnd(who, self.language, self.store)
         self.listen[who].savepic = savepic
         self.listen[who].savefile = savefile
         self.listen[who].savevoice = savevoice
+        self._listenchanged()
 
     def GetListenMessage(self, who=None):
         """获取监听对象的新消息
@@ -585,24 +680,29 @@ class WeChat(WeChatBase):
 
         Returns:
             str|dict: 如果
+        
+        Note:
+            每次调用都轮询所有监听对象；需要按空闲程度自适应轮询间隔时使用Listener
         """
         if who and who in self.listen:
             chat = self.listen[who]
             msg = chat.GetNewMessage(savepic=chat.savepic, savefile=chat.savefile, savevoice=chat.savevoice)
             return msg
         msgs = {}
-        for who in self.listen:
+        for who in list(self.listen):
             chat = self.listen[who]
             msg = chat.GetNewMessage(savepic=chat.savepic, savefile=chat.savefile, savevoice=chat.savevoice)
             if msg:
                 msgs[chat] = msg
         return msgs
 
+    @uilocked
     def SwitchToContact(self):
         """切换到通讯录页面"""
         self._show()
         self.A_ContactsIcon.Click(simulateMove=False)
 
+    @uilocked
     def SwitchToChat(self):
         """切换到聊天页面"""
         self._show()
@@ -622,6 +722,7 @@ class WeChat(WeChatBase):
     #     files.DownloadFiles(who, amount)
     #     files.Close()
 
+    @uilocked
     def GetGroupMembers(self):
         """获取当前聊天群成员
 
@@ -630,29 +731,25 @@ class WeChat(WeChatBase):
         """
         ele = self.ChatBox.PaneControl(searchDepth=7, foundIndex=6).ButtonControl(Name='聊天信息')
         try:
-            uia.SetGlobalSearchTimeout(1)
-            rect = ele.BoundingRectangle
+            with uia.SearchTimeout(1):
+                rect = ele.BoundingRectangle
             Click(rect)
         except:
-            return 
-        finally:
-            uia.SetGlobalSearchTimeout(10)
+            return
         roominfoWnd = self.UiaAPI.Control(ClassName='SessionChatRoomDetailWnd', searchDepth=1)
         more = roominfoWnd.ButtonControl(Name='查看更多', searchDepth=8)
         try:
-            uia.SetGlobalSearchTimeout(1)
-            rect = more.BoundingRectangle
-            Click(rect)
+            if more.Exists(1, waitEvents=WxParam.EVENT_WAIT):
+                Click(more.BoundingRectangle)
         except:
             pass
-        finally:
-            uia.SetGlobalSearchTimeout(10)
         members = [i.Name for i in roominfoWnd.ListControl(Name='聊天成员').GetChildren()]
         while members[-1] in ['添加', '移出']:
             members = members[:-1]
         roominfoWnd.SendKeys('{Esc}')
         return members
 
+    @uilocked
     def GetAllFriends(self, keywords=None):
         """获取所有好友列表
         注：
@@ -680,13 +777,20 @@ class WeChat(WeChatBase):
         """获取所有监听对象"""
         return self.listen
     
+    def _listenchanged(self):
+        """唤醒所有Listener，按新的监听对象重新计算轮询计划"""
+        for event in list(self._listenwakes):
+            event.set()
+
     def RemoveListenChat(self, who):
         """移除监听对象"""
         if who in self.listen:
             del self.listen[who]
+            self._listenchanged()
         else:
             Warnings.lightred(f'未找到监听对象：{who}', stacklevel=2)
 
+    @uilocked
     def AddNewFriend(self, keywords, addmsg=None, remark=None, tags=None):
         """添加新的好友
 
@@ -721,7 +825,7 @@ class WeChat(WeChatBase):
             return False
 
         NewFriendsWnd = self.UiaAPI.WindowControl(ClassName='WeUIDialog')
-        if NewFriendsWnd.Exists(maxSearchSeconds=2):
+        if NewFriendsWnd.Exists(maxSearchSeconds=2, waitEvents=WxParam.EVENT_WAIT):
             if addmsg:
                 msgedit = NewFriendsWnd.TextControl(Name="发送添加朋友申请").GetParentControl().EditControl()
                 msgedit.Click(simulateMove=False)